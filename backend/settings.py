@@ -32,6 +32,11 @@ if DEBUG:
         "http://127.0.0.1:3000",
     ])
 
+# Cabecera de las subidas por partes (core/subidas.py)
+from corsheaders.defaults import default_headers
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset')
+CORS_EXPOSE_HEADERS = ['Upload-Offset']
+
 # Configuración para confiar en el proxy Nginx
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 SECURE_SSL_REDIRECT = True
@@ -57,6 +62,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa; sin INSTRUMENTACION=True se desactiva solo
+    'core.instrumentacion.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -93,6 +100,36 @@ DATABASES = {
     }
 }
 
+# Perfil de producción para SQLite (SQLITE_PERFIL=produccion, por defecto): WAL para que las
+# lecturas no bloqueen a la escritura, espera ante bloqueos en lugar de "database is locked",
+# transacciones IMMEDIATE (toman el bloqueo de escritura al empezar y así respetan busy_timeout),
+# caché de páginas y mmap dimensionados, y conexiones persistentes (CONN_MAX_AGE).
+# CONN_MAX_AGE solo se aprovecha bajo WSGI, en los hilos de EjecutorDB (WebSockets) y en los
+# comandos: bajo ASGI cada petición síncrona corre en un hilo nuevo, así que su conexión se
+# cierra al terminar (cerrar_conexiones_asgi en core/apps.py) y la siguiente vuelve a abrirla
+# y a ejecutar estos pragmas.
+# Con SQLITE_PERFIL=basico se usa la configuración por defecto de Django.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_PRAGMAS_PRODUCCION = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}',
+    # Tamaño negativo = KiB
+    f"PRAGMA cache_size=-{int(os.environ.get('SQLITE_CACHE_KB', '20000'))}",
+    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_BYTES', str(128 * 1024 * 1024)))}",
+    'PRAGMA temp_store=MEMORY',
+]
+if os.environ.get('SQLITE_PERFIL', 'produccion') == 'produccion':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': '; '.join(SQLITE_PRAGMAS_PRODUCCION),
+        },
+    })
+
 AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator', },
     { 'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator', },
@@ -109,16 +146,112 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.Usuario'
 
+# Con JWT_SIN_ESTADO=True el usuario de cada petición se construye con los claims del token
+# (core/autenticacion.py) sin consultarlo en la base de datos. Su estado (activo, rol) se cachea
+# en el proceso JWT_USUARIOS_CACHE_S segundos: es lo que puede tardar en aplicarse una baja o un
+# cambio de rol hecho desde otro proceso. Desactivado por defecto.
+JWT_SIN_ESTADO = os.environ.get('JWT_SIN_ESTADO', 'False') == 'True'
+JWT_USUARIOS_CACHE_S = int(os.environ.get('JWT_USUARIOS_CACHE_S', '30'))
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ('rest_framework_simplejwt.authentication.JWTAuthentication',),
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'core.autenticacion.JWTSinEstadoAuthentication' if JWT_SIN_ESTADO
+        else 'rest_framework_simplejwt.authentication.JWTAuthentication',
+    ),
     'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
 }
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Derivados de las fotos de incidencias (core/fotos.py): procesos del pool de Pillow
+# (0 = procesar en la misma petición), formato ('WEBP' o 'JPEG') y calidad.
+FOTOS_PROCESOS = int(os.environ.get('FOTOS_PROCESOS', '2'))
+FOTOS_FORMATO = os.environ.get('FOTOS_FORMATO', 'WEBP').upper()
+FOTOS_CALIDAD = int(os.environ.get('FOTOS_CALIDAD', '80'))
+
+# Subidas de fotos por partes (core/subidas.py): directorio de los archivos parciales
+# (por defecto MEDIA_ROOT/subidas_parciales), tamaño máximo en bytes y horas hasta
+# que una subida sin terminar se considera abandonada.
+SUBIDAS_DIR = os.environ.get('SUBIDAS_DIR', '')
+SUBIDAS_TAMANO_MAX = int(os.environ.get('SUBIDAS_TAMANO_MAX', str(25 * 1024 * 1024)))
+SUBIDAS_EXPIRACION_HORAS = int(os.environ.get('SUBIDAS_EXPIRACION_HORAS', '24'))
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels.layers.InMemoryChannelLayer"
     }
-}
\ No newline at end of file
+}
+
+# Con CHANNEL_LAYER=sqlite se usa el channel layer multiproceso de core/channel_layer.py,
+# necesario cuando se sirven varios workers ASGI (los grupos se comparten por archivo).
+if os.environ.get('CHANNEL_LAYER') == 'sqlite':
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "core.channel_layer.SQLiteChannelLayer",
+            "CONFIG": {
+                "ruta": os.environ.get('CHANNEL_LAYER_RUTA', BASE_DIR / 'channels.sqlite3'),
+                "capacity": int(os.environ.get('CHANNEL_LAYER_CAPACIDAD', '100')),
+                "group_expiry": int(os.environ.get('CHANNEL_LAYER_EXPIRACION_GRUPOS', '86400')),
+            },
+        }
+    }
+
+# Caché (teselas de clusters del mapa, core/mapa.py). Con CACHE=archivo se comparte entre
+# procesos a través de disco, necesario con varios workers ASGI; si no, memoria del proceso.
+if os.environ.get('CACHE') == 'archivo':
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get('CACHE_RUTA', BASE_DIR / 'cache'),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Segundos que se conserva en caché cada tesela de clusters del mapa.
+MAPA_CACHE_SEGUNDOS = int(os.environ.get('MAPA_CACHE_SEGUNDOS', '300'))
+
+# Máximo de notificaciones que se conservan por usuario (las más antiguas se eliminan).
+# Un valor de 0 desactiva el límite.
+NOTIFICACIONES_MAX_POR_USUARIO = int(os.environ.get('NOTIFICACIONES_MAX_POR_USUARIO', '200'))
+
+# Outbox de efectos secundarios (core/outbox.py): eventos por lote del worker, espera entre
+# sondeos cuando no hay pendientes, reintentos con espera exponencial (base y máximo en
+# segundos) y horas que se conservan los eventos ya procesados.
+OUTBOX_LOTE = int(os.environ.get('OUTBOX_LOTE', '100'))
+OUTBOX_INTERVALO_MS = int(os.environ.get('OUTBOX_INTERVALO_MS', '500'))
+OUTBOX_MAX_INTENTOS = int(os.environ.get('OUTBOX_MAX_INTENTOS', '8'))
+OUTBOX_REINTENTO_BASE_S = float(os.environ.get('OUTBOX_REINTENTO_BASE_S', '2'))
+OUTBOX_REINTENTO_MAX_S = float(os.environ.get('OUTBOX_REINTENTO_MAX_S', '600'))
+OUTBOX_RETENCION_HORAS = int(os.environ.get('OUTBOX_RETENCION_HORAS', '24'))
+
+# Meses desde su resolución tras los que el comando archivar saca una incidencia (con su
+# chat y sus notificaciones) de las tablas calientes. Ver core/archivo.py.
+ARCHIVO_MESES = int(os.environ.get('ARCHIVO_MESES', '12'))
+
+# Escritura diferida de mensajes de chat: si CHAT_BUFFER_MENSAJES > 0, los mensajes se
+# agrupan y se insertan con bulk_create cada N mensajes o cada CHAT_BUFFER_MS milisegundos;
+# cada mensaje llega a la sala cuando se guarda, así que puede retrasarse hasta ese tiempo.
+# Con 0 (por defecto) cada mensaje se guarda en el momento.
+CHAT_BUFFER_MENSAJES = int(os.environ.get('CHAT_BUFFER_MENSAJES', '0'))
+CHAT_BUFFER_MS = int(os.environ.get('CHAT_BUFFER_MS', '200'))
+
+# Lecturas frecuentes servidas con vistas asíncronas (core/vistas_async.py) en lugar de
+# sus vistas de DRF: dashboard, estadísticas, contador de no leídas y detalle de incidencia.
+VISTAS_ASYNC = os.environ.get('VISTAS_ASYNC', 'True') == 'True'
+
+# Instrumentación por petición (core/instrumentacion.py): cabecera Server-Timing, log de las
+# peticiones más lentas que el umbral (ms) y histogramas por ruta de los últimos N minutos.
+INSTRUMENTACION = os.environ.get('INSTRUMENTACION', 'False') == 'True'
+INSTRUMENTACION_UMBRAL_MS = int(os.environ.get('INSTRUMENTACION_UMBRAL_MS', '500'))
+INSTRUMENTACION_VENTANA_MINUTOS = int(os.environ.get('INSTRUMENTACION_VENTANA_MINUTOS', '15'))
+
+# Ejecutor dedicado para el acceso a la base de datos desde los WebSockets (core/ejecutor_db.py):
+# número de hilos y máximo de consultas en vuelo antes de aplicar contrapresión.
+DB_EXECUTOR_HILOS = int(os.environ.get('DB_EXECUTOR_HILOS', '4'))
+DB_EXECUTOR_MAX_PENDIENTES = int(os.environ.get('DB_EXECUTOR_MAX_PENDIENTES', '64'))
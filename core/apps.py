@@ -1,6 +1,39 @@
 from django.apps import AppConfig
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+
+
+def cerrar_conexiones_asgi(sender, **kwargs):
+    """
+    Bajo ASGI cada petición síncrona corre en un hilo propio, que no se reutiliza:
+    su conexión persistente (CONN_MAX_AGE) no la aprovecharía ninguna otra
+    petición y quedaría abierta hasta que el recolector de basura la libere.
+    request_finished se envía en ese mismo hilo, así que se cierra aquí.
+    """
+    if isinstance(sender, type) and issubclass(sender, ASGIHandler):
+        for conexion in connections.all(initialized_only=True):
+            conexion.close()
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.core.signals import request_finished
+        from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+        from . import autenticacion, estadisticas, mapa
+        from .models import Incidencia, Usuario
+
+        # Cualquier cambio en una incidencia invalida las teselas de clusters del mapa
+        post_save.connect(mapa.al_cambiar_incidencia, sender=Incidencia, dispatch_uid='mapa_incidencia_guardada')
+        post_delete.connect(mapa.al_cambiar_incidencia, sender=Incidencia, dispatch_uid='mapa_incidencia_borrada')
+        # Los rollups de estadísticas siguen cualquier alta, cambio o borrado de una incidencia
+        pre_save.connect(estadisticas.antes_de_guardar, sender=Incidencia, dispatch_uid='estadisticas_incidencia_previa')
+        post_save.connect(estadisticas.al_guardar, sender=Incidencia, dispatch_uid='estadisticas_incidencia_guardada')
+        pre_delete.connect(estadisticas.al_borrar, sender=Incidencia, dispatch_uid='estadisticas_incidencia_borrada')
+        # Una baja o un cambio de rol se aplica al momento a los tokens de este proceso
+        post_save.connect(autenticacion.al_cambiar_usuario, sender=Usuario, dispatch_uid='autenticacion_usuario_guardado')
+        post_delete.connect(autenticacion.al_cambiar_usuario, sender=Usuario, dispatch_uid='autenticacion_usuario_borrado')
+        request_finished.connect(cerrar_conexiones_asgi, dispatch_uid='cerrar_conexiones_asgi')
@@ -0,0 +1,167 @@
+# Archivo: core/archivo.py
+"""
+Archivo de incidencias resueltas hace más de ARCHIVO_MESES meses.
+
+archivar() guarda cada incidencia, con sus mensajes de chat y sus notificaciones,
+en una fila de IncidenciaArchivada (JSON comprimido) y la borra de las tablas
+calientes: el borrado en cascada se lleva los mensajes, las notificaciones y sus
+entradas del índice de búsqueda. Los listados, la búsqueda, el dashboard y los
+chats solo recorren así el trabajo vivo; lo archivado se consulta en
+/api/archivo/incidencias/.
+
+Los rollups de estadísticas no se tocan: las incidencias archivadas siguen
+contando en EstadisticasView y estadisticas.reconstruir() también las incluye.
+"""
+import calendar
+import json
+import time
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import estadisticas
+from .models import Incidencia, IncidenciaArchivada, MensajeChat, Notificacion
+from .serializers import IncidenciaListSerializer, formatear_fecha
+
+# Incidencias por lote (y por transacción)
+TAMANO_LOTE = 500
+NIVEL_COMPRESION = 9
+
+
+def restar_meses(fecha, meses):
+    """
+    La misma fecha `meses` meses antes; si ese día no existe, el último del mes.
+    """
+    indice = fecha.year * 12 + fecha.month - 1 - meses
+    anio, mes = divmod(indice, 12)
+    dia = min(fecha.day, calendar.monthrange(anio, mes + 1)[1])
+    return fecha.replace(year=anio, month=mes + 1, day=dia)
+
+
+def candidatas(meses):
+    """
+    Incidencias resueltas antes del límite de `meses` meses.
+    """
+    limite = restar_meses(timezone.now(), meses)
+    return Incidencia.objects.filter(estado=Incidencia.Estado.RESUELTO, fecha_resolucion__lt=limite)
+
+
+def _json(datos):
+    return json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def descomprimir(datos):
+    return json.loads(zlib.decompress(datos))
+
+
+def _preparar(fila):
+    # Fechas con el mismo formato que la API
+    for clave, valor in fila.items():
+        if isinstance(valor, datetime):
+            fila[clave] = formatear_fecha(valor)
+    return fila
+
+
+def _archivar_lote(meses, tamano_lote):
+    """
+    Archiva en una transacción las siguientes `tamano_lote` candidatas. Devuelve
+    (incidencias, mensajes, notificaciones, bytes del JSON, bytes comprimidos).
+    """
+    with transaction.atomic():
+        # Dentro de la transacción: nadie puede reabrir la incidencia ni escribir
+        # en su chat entre la lectura y el borrado
+        ids = list(candidatas(meses).order_by('id').values_list('id', flat=True)[:tamano_lote])
+        if not ids:
+            return 0, 0, 0, 0, 0
+
+        mensajes = {}
+        filas = MensajeChat.objects.filter(incidencia_id__in=ids).order_by('incidencia', 'fecha_envio', 'id').values(
+            'id', 'incidencia', 'autor', 'contenido', 'fecha_envio', autor_username=F('autor__username')
+        )
+        for fila in filas:
+            mensajes.setdefault(fila['incidencia'], []).append(_preparar(fila))
+        notificaciones = {}
+        filas = Notificacion.objects.filter(incidencia_id__in=ids).order_by('fecha_creacion', 'id').values(
+            'id', 'incidencia', 'destinatario', 'mensaje', 'leida', 'fecha_creacion', 'fecha_actualizacion'
+        )
+        for fila in filas:
+            notificaciones.setdefault(fila['incidencia'], []).append(_preparar(fila))
+
+        archivadas = []
+        bytes_json = bytes_comprimidos = 0
+        for fila in IncidenciaListSerializer.proyectar(Incidencia.objects.filter(id__in=ids).order_by('id')):
+            datos = {
+                'incidencia': _preparar(dict(fila)),
+                'mensajes': mensajes.get(fila['id'], []),
+                'notificaciones': notificaciones.get(fila['id'], []),
+            }
+            texto = _json(datos)
+            comprimido = zlib.compress(texto, NIVEL_COMPRESION)
+            bytes_json += len(texto)
+            bytes_comprimidos += len(comprimido)
+            archivadas.append(IncidenciaArchivada(
+                id=fila['id'],
+                descripcion=fila['descripcion'],
+                estado=fila['estado'],
+                fecha_creacion=fila['fecha_creacion'],
+                fecha_resolucion=fila['fecha_resolucion'],
+                agricultor_reporta_id=fila['agricultor_reporta'],
+                fontanero_asignado_id=fila['fontanero_asignado'],
+                mensajes=len(datos['mensajes']),
+                datos=comprimido,
+            ))
+        IncidenciaArchivada.objects.bulk_create(archivadas)
+        with estadisticas.sin_registrar():
+            Incidencia.objects.filter(id__in=ids).delete()
+    return (
+        len(archivadas), sum(len(lista) for lista in mensajes.values()),
+        sum(len(lista) for lista in notificaciones.values()), bytes_json, bytes_comprimidos,
+    )
+
+
+def archivar(meses, tamano_lote=TAMANO_LOTE, al_avanzar=None):
+    """
+    Archiva todas las candidatas, lote a lote. Devuelve un resumen con los totales.
+    """
+    resumen = {'incidencias': 0, 'mensajes': 0, 'notificaciones': 0, 'bytes_json': 0, 'bytes_comprimidos': 0}
+    inicio = time.perf_counter()
+    while True:
+        incidencias, mensajes, notificaciones, bytes_json, bytes_comprimidos = _archivar_lote(meses, tamano_lote)
+        if not incidencias:
+            break
+        resumen['incidencias'] += incidencias
+        resumen['mensajes'] += mensajes
+        resumen['notificaciones'] += notificaciones
+        resumen['bytes_json'] += bytes_json
+        resumen['bytes_comprimidos'] += bytes_comprimidos
+        if al_avanzar:
+            al_avanzar(resumen['incidencias'])
+    resumen['segundos'] = round(time.perf_counter() - inicio, 3)
+    return resumen
+
+
+def contar(meses):
+    """
+    Lo que archivaría archivar(meses) ahora mismo, sin escribir nada.
+    """
+    incidencias = candidatas(meses)
+    return {
+        'incidencias': incidencias.count(),
+        'mensajes': MensajeChat.objects.filter(incidencia__in=incidencias.values('id')).count(),
+        'notificaciones': Notificacion.objects.filter(incidencia__in=incidencias.values('id')).count(),
+    }
+
+
+def detalle(archivada, user):
+    """
+    Contenido completo de una incidencia archivada. Cada usuario ve solo sus
+    propias notificaciones; los administradores, todas.
+    """
+    datos = descomprimir(archivada.datos)
+    if user.rol != 'ADMINISTRADOR':
+        datos['notificaciones'] = [n for n in datos['notificaciones'] if n['destinatario'] == user.id]
+    return datos
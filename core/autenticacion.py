@@ -0,0 +1,113 @@
+# Archivo: core/autenticacion.py
+"""
+Autenticación JWT sin consultar el usuario en cada petición.
+
+MyTokenObtainPairSerializer ya firma user_id, username y rol en el token, así que
+JWTSinEstadoAuthentication construye con ellos un UsuarioToken en lugar de cargar
+el Usuario. Lo que decide permisos y puede cambiar después de emitir el token
+(is_active, rol, is_staff) se lee de una caché del proceso que caduca a los
+JWT_USUARIOS_CACHE_S segundos: una baja o un cambio de rol se aplica, como mucho,
+tras ese tiempo en los demás procesos y al momento en el que guarda el usuario.
+
+El código que necesita el modelo (asignarlo a una clave foránea y serializarlo)
+usa usuario_de(request.user), que lo carga solo entonces.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Usuario
+
+# Entradas a partir de las cuales se descartan las caducadas al insertar
+MAX_ENTRADAS = 10000
+
+# user_id -> (instante en que caduca, {'is_active', 'rol', 'is_staff'}) o None si no existe
+_estados = {}
+_cerrojo = threading.Lock()
+
+
+def estado_usuario(user_id):
+    """
+    is_active, rol e is_staff actuales del usuario, desde la caché mientras no
+    caduque. None si el usuario no existe.
+    """
+    ahora = time.monotonic()
+    entrada = _estados.get(user_id)
+    if entrada is not None and entrada[0] > ahora:
+        return entrada[1]
+
+    estado = Usuario.objects.filter(pk=user_id).values('is_active', 'rol', 'is_staff').first()
+    with _cerrojo:
+        if len(_estados) >= MAX_ENTRADAS:
+            for clave in [clave for clave, entrada in _estados.items() if entrada[0] <= ahora]:
+                del _estados[clave]
+        _estados[user_id] = (ahora + settings.JWT_USUARIOS_CACHE_S, estado)
+    return estado
+
+
+def olvidar(user_id):
+    with _cerrojo:
+        _estados.pop(user_id, None)
+
+
+def al_cambiar_usuario(sender, instance, **kwargs):
+    # Conectado a post_save/post_delete de Usuario en CoreConfig.ready()
+    olvidar(instance.pk)
+
+
+class UsuarioToken(TokenUser):
+    """
+    Usuario autenticado a partir de los claims del token, con el estado actual
+    de la caché. Se compara por id con otros UsuarioToken y con Usuario.
+    """
+    def __init__(self, token, estado):
+        super().__init__(token)
+        self.is_active = estado['is_active']
+        self.rol = estado['rol']
+        self.is_staff = estado['is_staff']
+
+    @cached_property
+    def usuario(self):
+        return Usuario.objects.get(pk=self.id)
+
+    def __eq__(self, other):
+        if isinstance(other, Usuario):
+            return self.id == other.pk
+        return super().__eq__(other)
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def usuario_de(user):
+    """
+    El Usuario del modelo para el usuario autenticado, sea cual sea la clase de
+    autenticación. Con UsuarioToken se carga la primera vez que se pide.
+    """
+    return user.usuario if isinstance(user, UsuarioToken) else user
+
+
+class JWTSinEstadoAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que no carga el Usuario: devuelve un UsuarioToken.
+    Se activa con JWT_SIN_ESTADO=True.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        estado = estado_usuario(user_id)
+        if estado is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not estado['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return UsuarioToken(validated_token, estado)
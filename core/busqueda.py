@@ -0,0 +1,97 @@
+# Archivo: core/busqueda.py
+"""
+Búsqueda de texto completo sobre incidencias con FTS5 de SQLite.
+
+La tabla virtual core_busqueda indexa la descripción y la solución de cada
+incidencia (fila con rowid = -id) y el contenido de cada mensaje de chat
+(rowid = id del mensaje), con la incidencia a la que pertenecen. El tokenizador
+unicode61 con remove_diacritics 2 ignora mayúsculas y tildes ("valvula" encuentra
+"Válvula").
+
+El índice se mantiene con triggers de SQLite (ver la migración 0013), así que
+también cubre bulk_create (mensajes del buffer de chat, sembrar_datos),
+queryset.update() y los borrados en cascada. reconstruir() lo regenera desde cero.
+"""
+import re
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, transaction
+
+from .models import Incidencia, MensajeChat
+
+TABLA = 'core_busqueda'
+# Peso de cada columna en bm25: descripción, solución y mensajes de chat
+PESOS = (10.0, 5.0, 1.0)
+# Términos de la consulta que se tienen en cuenta
+MAX_TERMINOS = 10
+# Filas más relevantes (textos, no incidencias) entre las que se eligen los resultados:
+# acota el coste de agrupar cuando una palabra aparece en casi todo el historial
+MAX_CANDIDATOS = 2000
+
+_PALABRA = re.compile(r'\w+')
+
+
+def reconstruir():
+    """
+    Regenera el índice completo a partir de las incidencias y los mensajes.
+    Devuelve el número de filas indexadas.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA}')
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, descripcion, solucion, contenido, incidencia_id) "
+            f"SELECT -id, descripcion, coalesce(solucion, ''), '', id FROM {Incidencia._meta.db_table}"
+        )
+        filas = cursor.rowcount
+        cursor.execute(
+            f"INSERT INTO {TABLA}(rowid, descripcion, solucion, contenido, incidencia_id) "
+            f"SELECT id, '', '', contenido, incidencia_id FROM {MensajeChat._meta.db_table}"
+        )
+        filas += cursor.rowcount
+        # Fusiona los segmentos del índice en uno solo
+        cursor.execute(f"INSERT INTO {TABLA}({TABLA}) VALUES ('optimize')")
+    return filas
+
+
+def consulta_fts(texto):
+    """
+    Traduce el texto del usuario a una consulta FTS5: cada palabra entre comillas
+    (sin operadores ni sintaxis de FTS5) y como prefijo, para que "tuberia"
+    encuentre también "tuberías". Todas las palabras deben aparecer en el mismo
+    texto (la descripción, la solución o un mensaje).
+    """
+    terminos = _PALABRA.findall(texto)[:MAX_TERMINOS]
+    return ' '.join(f'"{termino}"*' for termino in terminos)
+
+
+def buscar(queryset, texto, limite):
+    """
+    Ids de las incidencias de `queryset` que coinciden con `texto`, de más a menos
+    relevante. Cada incidencia puntúa con su mejor fila (descripción, solución o
+    alguno de sus mensajes).
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+
+    pesos = ', '.join(str(peso) for peso in PESOS)
+    sql = f'SELECT incidencia_id, bm25({TABLA}, {pesos}) AS rango FROM {TABLA} WHERE {TABLA} MATCH %s'
+    params = [consulta]
+    # Sin filtros (administradores) no hace falta restringir las incidencias
+    if queryset.query.where:
+        try:
+            ids_sql, ids_params = queryset.order_by().values('id').query.sql_with_params()
+        except EmptyResultSet:
+            return []
+        sql += f' AND incidencia_id IN ({ids_sql})'
+        params.extend(ids_params)
+    # bm25() no se puede agregar en la misma consulta: se materializan antes las coincidencias
+    sql = (
+        f'WITH coincidencias AS MATERIALIZED ({sql} ORDER BY rango LIMIT %s) '
+        f'SELECT incidencia_id FROM coincidencias GROUP BY incidencia_id ORDER BY min(rango) LIMIT %s'
+    )
+    params.extend([MAX_CANDIDATOS, limite])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [fila[0] for fila in cursor.fetchall()]
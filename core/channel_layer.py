@@ -0,0 +1,300 @@
+# Archivo: core/channel_layer.py
+"""
+Channel layer multiproceso sin Redis, respaldado por un archivo SQLite.
+
+Todos los procesos ASGI de una misma máquina comparten el archivo, así que
+group_send llega a consumidores conectados a cualquier worker. Cada proceso
+tiene un prefijo propio para sus canales (specific.<prefijo>!<id>) y un único
+lector que recoge en lote todos los mensajes de ese prefijo y los reparte a
+colas locales: el coste de sondeo no depende del número de conexiones. Los
+mensajes de un canal cuya cola local está llena se quedan en la tabla, así que
+cuentan para la capacidad y send() responde ChannelFull.
+
+Configuración (CHANNEL_LAYERS['default']['CONFIG']):
+  - ruta: archivo SQLite compartido.
+  - expiry: segundos de vida de un mensaje no leído (60).
+  - group_expiry: segundos de vida de una pertenencia a grupo (86400).
+  - capacity / channel_capacity: máximo de mensajes pendientes por canal.
+  - intervalo_min / intervalo_max: sondeo adaptativo en segundos.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS mensajes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    canal TEXT NOT NULL,
+    prefijo TEXT NOT NULL,
+    contenido TEXT NOT NULL,
+    expira REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS mensajes_prefijo_idx ON mensajes (prefijo, id);
+CREATE INDEX IF NOT EXISTS mensajes_canal_idx ON mensajes (canal, id);
+CREATE TABLE IF NOT EXISTS grupos (
+    grupo TEXT NOT NULL,
+    canal TEXT NOT NULL,
+    expira REAL NOT NULL,
+    PRIMARY KEY (grupo, canal)
+);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    # Cada cuánto se purgan mensajes y pertenencias caducadas (segundos)
+    INTERVALO_LIMPIEZA = 30
+    # Máximo de mensajes recogidos por cada lectura del proceso
+    LOTE_LECTURA = 500
+
+    def __init__(
+        self,
+        ruta='channels.sqlite3',
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        intervalo_min=0.005,
+        intervalo_max=0.05,
+        **kwargs
+    ):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.ruta = str(ruta)
+        self.group_expiry = group_expiry
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.prefijo_proceso = uuid.uuid4().hex[:12]
+
+        # Un hilo propio con su conexión: sqlite3 no comparte conexiones entre hilos
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix='channels-sqlite')
+        self._local = threading.local()
+        self._colas = {}
+        self._lector = None
+        self._loop = None
+        self._ultima_limpieza = 0.0
+
+    # --- Acceso a SQLite (siempre desde el hilo del layer) ---
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = sqlite3.connect(self.ruta, timeout=10, isolation_level=None)
+            conexion.execute('PRAGMA journal_mode=WAL')
+            conexion.execute('PRAGMA synchronous=NORMAL')
+            conexion.executescript(ESQUEMA)
+            self._local.conexion = conexion
+        return conexion
+
+    async def _en_hilo(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._hilo, func, *args)
+
+    def _insertar(self, filas, ahora):
+        """
+        Inserta (canal, contenido) respetando la capacidad de cada canal.
+        Devuelve los canales que estaban llenos.
+        """
+        conexion = self._conexion()
+        llenos = []
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            for canal, contenido in filas:
+                pendientes = conexion.execute(
+                    'SELECT COUNT(*) FROM mensajes WHERE canal = ? AND expira > ?', (canal, ahora)
+                ).fetchone()[0]
+                if pendientes >= self.get_capacity(canal):
+                    llenos.append(canal)
+                    continue
+                conexion.execute(
+                    'INSERT INTO mensajes (canal, prefijo, contenido, expira) VALUES (?, ?, ?, ?)',
+                    (canal, self.non_local_name(canal), contenido, ahora + self.expiry)
+                )
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        return llenos
+
+    def _extraer(self, prefijos, limite, excluidos=(), huecos=None):
+        """
+        Saca (y borra) los mensajes pendientes de unos prefijos o canales, en orden de
+        llegada, salvo los de los canales `excluidos`. Con `huecos` (canal -> mensajes
+        que caben en su cola local, None si no la tiene) solo se sacan los que caben;
+        el resto se queda en la tabla. Los de canales sin cola se descartan.
+        """
+        conexion = self._conexion()
+        ahora = time.time()
+        conexion.execute('BEGIN IMMEDIATE')
+        try:
+            filtro = f'prefijo IN ({",".join("?" * len(prefijos))})'
+            if excluidos:
+                filtro += f' AND canal NOT IN ({",".join("?" * len(excluidos))})'
+            filas = conexion.execute(
+                f'SELECT id, canal, contenido, expira FROM mensajes WHERE {filtro} ORDER BY id LIMIT ?',
+                (*prefijos, *excluidos, limite)
+            ).fetchall()
+            if huecos is not None:
+                filas = self._repartir(filas, huecos)
+            if filas:
+                conexion.execute(
+                    f'DELETE FROM mensajes WHERE id IN ({",".join("?" * len(filas))})',
+                    [fila[0] for fila in filas]
+                )
+            if ahora - self._ultima_limpieza > self.INTERVALO_LIMPIEZA:
+                conexion.execute('DELETE FROM mensajes WHERE expira <= ?', (ahora,))
+                conexion.execute('DELETE FROM grupos WHERE expira <= ?', (ahora,))
+                self._ultima_limpieza = ahora
+            conexion.execute('COMMIT')
+        except BaseException:
+            conexion.execute('ROLLBACK')
+            raise
+        return [(canal, contenido) for _, canal, contenido, expira in filas if expira > ahora and contenido is not None]
+
+    @staticmethod
+    def _repartir(filas, huecos):
+        """
+        Filas que se pueden sacar: las que caben en su cola y, sin contenido, las de
+        canales sin cola (su consumer ya se cerró), que solo se borran.
+        """
+        libres = {}
+        sacadas = []
+        descartadas = 0
+        for fila in filas:
+            canal = fila[1]
+            if canal not in libres:
+                libres[canal] = huecos(canal)
+            if libres[canal] is None:
+                descartadas += 1
+                sacadas.append((fila[0], canal, None, fila[3]))
+            elif libres[canal] > 0:
+                libres[canal] -= 1
+                sacadas.append(fila)
+        if descartadas:
+            logger.debug('Descartados %s mensajes de canales ya cerrados', descartadas)
+        return sacadas
+
+    def _ejecutar(self, sql, parametros=()):
+        conexion = self._conexion()
+        return conexion.execute(sql, parametros).fetchall()
+
+    # --- API de channel layer ---
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        contenido = json.dumps(message)
+        llenos = await self._en_hilo(self._insertar, [(channel, contenido)], time.time())
+        if llenos:
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        if '!' not in channel:
+            # Canal normal: se sondea directamente en la base de datos
+            intervalo = self.intervalo_min
+            while True:
+                filas = await self._en_hilo(self._extraer, [channel], 1)
+                if filas:
+                    return json.loads(filas[0][1])
+                await asyncio.sleep(intervalo)
+                intervalo = min(intervalo * 2, self.intervalo_max)
+
+        # La cola vive mientras el consumer siga escuchando; al cerrarse, Channels
+        # cancela su receive() y la descartamos.
+        cola = self._colas.get(channel)
+        if cola is None:
+            cola = self._colas[channel] = asyncio.Queue(maxsize=self.get_capacity(channel))
+        self._asegurar_lector()
+        try:
+            return await cola.get()
+        except asyncio.CancelledError:
+            self._colas.pop(channel, None)
+            raise
+
+    async def new_channel(self, prefix='specific'):
+        return f'{prefix}.{self.prefijo_proceso}!{uuid.uuid4().hex}'
+
+    def _asegurar_lector(self):
+        loop = asyncio.get_running_loop()
+        if self._lector is None or self._lector.done() or self._loop is not loop:
+            self._loop = loop
+            self._lector = loop.create_task(self._leer())
+
+    async def _leer(self):
+        """
+        Lector único del proceso: reparte los mensajes de sus canales específicos.
+        """
+        intervalo = self.intervalo_min
+        while self._colas:
+            prefijos = list({self.non_local_name(canal) for canal in self._colas})
+            # Los canales con la cola llena ni se leen: sus mensajes esperan en la tabla
+            llenos = [canal for canal, cola in self._colas.items() if cola.full()]
+            filas = await self._en_hilo(self._extraer, prefijos, self.LOTE_LECTURA, llenos, self._huecos)
+            for canal, contenido in filas:
+                cola = self._colas.get(canal)
+                if cola is None or cola.full():
+                    # Solo si el consumer se cerró o su cola se llenó mientras se leía
+                    logger.warning('Mensaje descartado para el canal %s: sin cola local o cola llena', canal)
+                    continue
+                cola.put_nowait(json.loads(contenido))
+            if filas:
+                intervalo = self.intervalo_min
+                continue
+            await asyncio.sleep(intervalo)
+            intervalo = min(intervalo * 2, self.intervalo_max)
+
+    def _huecos(self, canal):
+        # Se llama desde el hilo del layer: las colas solo se vacían mientras tanto
+        cola = self._colas.get(canal)
+        if cola is None:
+            return None
+        return cola.maxsize - cola.qsize()
+
+    # --- Extensión de grupos ---
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._en_hilo(
+            self._ejecutar,
+            'INSERT OR REPLACE INTO grupos (grupo, canal, expira) VALUES (?, ?, ?)',
+            (group, channel, time.time() + self.group_expiry)
+        )
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._en_hilo(
+            self._ejecutar, 'DELETE FROM grupos WHERE grupo = ? AND canal = ?', (group, channel)
+        )
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        ahora = time.time()
+        canales = await self._en_hilo(
+            self._ejecutar, 'SELECT canal FROM grupos WHERE grupo = ? AND expira > ?', (group, ahora)
+        )
+        if canales:
+            contenido = json.dumps(message)
+            # Igual que el resto de layers: los canales llenos pierden el mensaje en silencio
+            await self._en_hilo(self._insertar, [(canal, contenido) for (canal,) in canales], ahora)
+
+    # --- Extensión flush ---
+
+    async def flush(self):
+        await self._en_hilo(self._ejecutar, 'DELETE FROM mensajes')
+        await self._en_hilo(self._ejecutar, 'DELETE FROM grupos')
+        self._colas = {}
@@ -1,14 +1,114 @@
 # Archivo: core/consumers.py
+import asyncio
 import json
+import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from .models import MensajeChat, Incidencia, Usuario
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from .models import MensajeChat
+from .ejecutor_db import db_async
+from .instrumentacion import ConsumerMedido
+from .notificaciones import grupo_usuario
+from .views import CanViewChat
 
-class ChatConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+
+def _guardar_lote(mensajes):
+    """
+    Inserta los mensajes con un solo bulk_create. Si el lote falla (p. ej. una
+    incidencia borrada entre medias) se guardan uno a uno y se descartan, con un
+    error en el log, los que siguen fallando. Devuelve los índices guardados.
+    """
+    try:
+        with transaction.atomic():
+            MensajeChat.objects.bulk_create(mensajes)
+        return set(range(len(mensajes)))
+    except DatabaseError:
+        logger.warning('Falló el volcado de %s mensajes de chat; se guardan uno a uno', len(mensajes), exc_info=True)
+    guardados = set()
+    for indice, mensaje in enumerate(mensajes):
+        try:
+            with transaction.atomic():
+                mensaje.save(force_insert=True)
+            guardados.add(indice)
+        except DatabaseError:
+            logger.exception('Mensaje de chat descartado en la incidencia #%s', mensaje.incidencia_id)
+    return guardados
+
+
+class BufferMensajes:
+    """
+    Buffer de escritura diferida compartido por todos los chats del proceso.
+    Acumula mensajes y los inserta con un solo bulk_create cuando se alcanzan
+    `max_mensajes` o pasan `max_ms` milisegundos desde el primero pendiente.
+    Cada mensaje se difunde a su sala solo después de guardarse. Los mensajes
+    aún no volcados se pierden si el proceso muere.
+    """
+    def __init__(self, max_mensajes, max_ms):
+        self.max_mensajes = max_mensajes
+        self.max_ms = max_ms
+        self.pendientes = []
+        self._temporizador = None
+
+    async def agregar(self, mensaje, grupo, evento):
+        self.pendientes.append((mensaje, grupo, evento))
+        if len(self.pendientes) >= self.max_mensajes:
+            await self.vaciar()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.ensure_future(self._vaciar_tras_espera())
+
+    async def _vaciar_tras_espera(self):
+        await asyncio.sleep(self.max_ms / 1000)
+        self._temporizador = None
+        try:
+            await self.vaciar()
+        except Exception:
+            # Nadie espera a esta tarea: sin esto el error se perdería en silencio
+            logger.exception('No se pudo vaciar el buffer de mensajes de chat')
+
+    async def vaciar(self):
+        lote, self.pendientes = self.pendientes, []
+        if not lote:
+            return
+        guardados = await db_async(_guardar_lote)([mensaje for mensaje, _, _ in lote])
+        capa = get_channel_layer()
+        for indice, (_, grupo, evento) in enumerate(lote):
+            if indice in guardados:
+                await capa.group_send(grupo, evento)
+
+
+_buffer_mensajes = None
+
+
+def get_buffer_mensajes():
+    """
+    Devuelve el buffer del proceso, o None si la escritura diferida está desactivada.
+    """
+    global _buffer_mensajes
+    if settings.CHAT_BUFFER_MENSAJES <= 0:
+        return None
+    if _buffer_mensajes is None:
+        _buffer_mensajes = BufferMensajes(settings.CHAT_BUFFER_MENSAJES, settings.CHAT_BUFFER_MS)
+    return _buffer_mensajes
+
+
+class ChatConsumer(ConsumerMedido, AsyncWebsocketConsumer):
     async def connect(self):
-        self.incidencia_id = self.scope['url_route']['kwargs']['incidencia_id']
+        self.incidencia_id = int(self.scope['url_route']['kwargs']['incidencia_id'])
         self.room_group_name = f'chat_{self.incidencia_id}'
 
+        # La incidencia y el usuario se resuelven y autorizan una sola vez por conexión,
+        # con las mismas reglas que CanViewChat en la API REST.
+        user = self.scope['user']
+        if not user.is_authenticated or not await self.puede_ver_chat(user):
+            await self.close()
+            return
+        self.user_id = user.id
+        self.username = user.username
+
         # Se une a la "sala" o grupo de la incidencia
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -22,26 +122,37 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # No dejamos mensajes de esta conexión esperando en el buffer
+        buffer = get_buffer_mensajes()
+        if buffer is not None:
+            await buffer.vaciar()
 
     # Recibe un mensaje desde el WebSocket (frontend)
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_content = text_data_json['message']
-        user_proxy = self.scope['user']
+        message_content = json.loads(text_data)['message']
 
-        # Guarda el mensaje en la base de datos
-        mensaje_obj = await self.save_message(user_proxy.id, message_content)
+        # Guarda el mensaje usando directamente los ids ya validados en connect
+        mensaje = MensajeChat(
+            incidencia_id=self.incidencia_id,
+            autor_id=self.user_id,
+            contenido=message_content,
+            fecha_envio=timezone.now()
+        )
+        evento = {
+            'type': 'chat_message',
+            'message': message_content,
+            'user': self.username,
+            'fecha': str(mensaje.fecha_envio)
+        }
+        buffer = get_buffer_mensajes()
+        if buffer is not None:
+            # El buffer lo envía a la sala cuando lo guarda
+            await buffer.agregar(mensaje, self.room_group_name, evento)
+            return
 
+        await self.save_message(mensaje)
         # Envía el mensaje a todos en la sala
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'chat_message',
-                'message': message_content,
-                'user': user_proxy.username,
-                'fecha': str(mensaje_obj.fecha_envio)
-            }
-        )
+        await self.channel_layer.group_send(self.room_group_name, evento)
 
     # Manejador para enviar el mensaje a los clientes de la sala
     async def chat_message(self, event):
@@ -51,18 +162,49 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'fecha': event['fecha']
         }))
 
-    @database_sync_to_async
-    def save_message(self, user_id, message_content):
+    @db_async
+    def puede_ver_chat(self, user):
+        return CanViewChat.puede_ver(user, self.incidencia_id)
+
+    @db_async
+    def save_message(self, mensaje):
         """
         Función auxiliar que interactúa con la base de datos de forma segura.
+        Un único INSERT, sin consultar antes el usuario ni la incidencia.
         """
-        # --- CORRECCIÓN AQUÍ ---
-        # Buscamos la instancia real del usuario usando su ID antes de crear el mensaje.
-        user_instance = Usuario.objects.get(id=user_id)
-        incidencia = Incidencia.objects.get(id=self.incidencia_id)
-        
-        return MensajeChat.objects.create(
-            incidencia=incidencia,
-            autor=user_instance,
-            contenido=message_content
-        )
\ No newline at end of file
+        mensaje.save(force_insert=True)
+        return mensaje
+
+
+class NotificacionConsumer(ConsumerMedido, AsyncWebsocketConsumer):
+    """
+    Canal de notificaciones por usuario. Cada conexión se une al grupo
+    user_<id> y recibe las notificaciones en cuanto se crean.
+    """
+    async def connect(self):
+        user = self.scope['user']
+        if not user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_group_name = grupo_usuario(user.id)
+        await self.channel_layer.group_add(
+            self.user_group_name,
+            self.channel_name
+        )
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'user_group_name'):
+            await self.channel_layer.group_discard(
+                self.user_group_name,
+                self.channel_name
+            )
+
+    # Manejador para los eventos enviados desde core.notificaciones
+    async def notificacion_nueva(self, event):
+        await self.send(text_data=json.dumps({
+            'tipo': 'notificacion',
+            'notificacion': event['notificacion'],
+            'no_leidas': event['no_leidas']
+        }))
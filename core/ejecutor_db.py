@@ -0,0 +1,118 @@
+# Archivo: core/ejecutor_db.py
+"""
+Ejecutor dedicado para el acceso a la base de datos desde código asíncrono
+(consumers de Channels y JwtAuthMiddleware).
+
+database_sync_to_async es thread-sensitive por defecto, así que todas las
+consultas de todos los WebSockets acaban en un mismo hilo y una consulta
+lenta en un chat frena a todos los demás. Aquí se usa un pool propio de
+DB_EXECUTOR_HILOS hilos, cada uno con su propia conexión de Django, y como
+máximo DB_EXECUTOR_MAX_PENDIENTES trabajos en vuelo: el resto espera sin
+bloquear el event loop.
+
+Con SQLite sigue siendo seguro: cada hilo abre su conexión y las escrituras
+concurrentes esperan al bloqueo de la base de datos (timeout de sqlite3).
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .instrumentacion import capturar_sql, medicion_actual
+
+
+class EjecutorDB:
+    def __init__(self, hilos, max_pendientes):
+        self.hilos = hilos
+        self.max_pendientes = max_pendientes
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='db')
+        self._semaforo = None
+        self._loop = None
+        self._lock = threading.Lock()
+        # Métricas
+        self._en_cola = 0
+        self._en_ejecucion = 0
+        self._completados = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+        self._ejecucion_total = 0.0
+
+    def _semaforo_del_loop(self):
+        # asyncio.Semaphore queda ligado a un event loop; se recrea si cambia
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaforo = asyncio.Semaphore(self.max_pendientes)
+        return self._semaforo
+
+    def _ejecutar_en_hilo(self, encolado, medicion, func, args, kwargs):
+        inicio = time.monotonic()
+        espera = inicio - encolado
+        with self._lock:
+            self._en_cola -= 1
+            self._en_ejecucion += 1
+            self._espera_total += espera
+            self._espera_max = max(self._espera_max, espera)
+
+        close_old_connections()
+        try:
+            # Las consultas cuentan en la medición del mensaje que las originó (si está activa)
+            with capturar_sql(medicion):
+                return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+            with self._lock:
+                self._en_ejecucion -= 1
+                self._completados += 1
+                self._ejecucion_total += time.monotonic() - inicio
+
+    async def ejecutar(self, func, *args, **kwargs):
+        encolado = time.monotonic()
+        with self._lock:
+            self._en_cola += 1
+        async with self._semaforo_del_loop():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._pool, self._ejecutar_en_hilo, encolado, medicion_actual(), func, args, kwargs
+            )
+
+    def metricas(self):
+        with self._lock:
+            completados = self._completados
+            return {
+                'hilos': self.hilos,
+                'max_pendientes': self.max_pendientes,
+                'en_cola': self._en_cola,
+                'en_ejecucion': self._en_ejecucion,
+                'completados': completados,
+                'espera_media_ms': round(self._espera_total / completados * 1000, 3) if completados else 0,
+                'espera_max_ms': round(self._espera_max * 1000, 3),
+                'ejecucion_media_ms': round(self._ejecucion_total / completados * 1000, 3) if completados else 0,
+            }
+
+
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def get_ejecutor_db():
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = EjecutorDB(settings.DB_EXECUTOR_HILOS, settings.DB_EXECUTOR_MAX_PENDIENTES)
+        return _ejecutor
+
+
+def db_async(func):
+    """
+    Equivalente a database_sync_to_async que ejecuta la función en el EjecutorDB.
+    Sirve tanto para funciones como para métodos.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await get_ejecutor_db().ejecutar(func, *args, **kwargs)
+    return wrapper
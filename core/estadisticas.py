@@ -0,0 +1,211 @@
+# Archivo: core/estadisticas.py
+"""
+Mantenimiento incremental de los rollups de estadísticas.
+
+Las señales de Incidencia (conectadas en CoreConfig.ready()) llaman a estas
+funciones en cada alta, transición y borrado, venga de la API, del admin o del
+borrado en cascada de un usuario, para que EstadisticasView lea contadores ya
+agregados en lugar de recorrer toda la tabla de incidencias. bulk_create no
+envía señales: quien lo usa llama a registrar_creaciones().
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import chain
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Incidencia, IncidenciaArchivada, EstadisticaEstadoDiaria, EstadisticaResolucionDiaria
+
+# Dentro de sin_registrar() las señales no tocan los rollups
+_suspendido = ContextVar('estadisticas_suspendidas', default=False)
+
+
+def _incrementar(modelo, claves, **deltas):
+    """
+    Suma los deltas a la fila del rollup identificada por las claves,
+    creándola si todavía no existe.
+    """
+    incrementos = {campo: F(campo) + valor for campo, valor in deltas.items()}
+    if modelo.objects.filter(**claves).update(**incrementos):
+        return
+    try:
+        with transaction.atomic():
+            modelo.objects.create(**claves, **deltas)
+    except IntegrityError:
+        # Otra petición creó la fila entre medias: basta con actualizarla.
+        modelo.objects.filter(**claves).update(**incrementos)
+
+
+def _sumar_estado(incidencia, estado, delta):
+    _incrementar(
+        EstadisticaEstadoDiaria,
+        {'fecha': timezone.localdate(incidencia.fecha_creacion), 'estado': estado},
+        total=delta,
+    )
+
+
+def _sumar_resolucion(incidencia, fontanero_id, fecha_resolucion, delta):
+    segundos = int((fecha_resolucion - incidencia.fecha_creacion).total_seconds())
+    _incrementar(
+        EstadisticaResolucionDiaria,
+        {'fecha': timezone.localdate(fecha_resolucion), 'fontanero_id': fontanero_id},
+        resueltas=delta,
+        segundos_resolucion=delta * segundos,
+    )
+
+
+def fecha_resolucion_para(estado, previo):
+    """
+    fecha_resolucion que corresponde a una incidencia que pasa al estado dado.
+    """
+    if estado != Incidencia.Estado.RESUELTO:
+        return None
+    if previo['estado'] == Incidencia.Estado.RESUELTO:
+        return previo['fecha_resolucion']
+    return timezone.now()
+
+
+def preparar_transicion(incidencia, previo):
+    """
+    Ajusta fecha_resolucion según el nuevo estado. Debe llamarse antes de save().
+    """
+    incidencia.fecha_resolucion = fecha_resolucion_para(incidencia.estado, previo)
+
+
+def registrar_creacion(incidencia):
+    _sumar_estado(incidencia, incidencia.estado, 1)
+    if incidencia.estado == Incidencia.Estado.RESUELTO and incidencia.fecha_resolucion:
+        _sumar_resolucion(incidencia, incidencia.fontanero_asignado_id, incidencia.fecha_resolucion, 1)
+
+
+def registrar_creaciones(incidencias):
+    """
+    registrar_creacion para un lote (bulk_create no pasa por las vistas):
+    una actualización por cada fila de rollup afectada, no por incidencia.
+    """
+    por_estado = Counter()
+    resueltas = Counter()
+    segundos = Counter()
+    for incidencia in incidencias:
+        por_estado[(timezone.localdate(incidencia.fecha_creacion), incidencia.estado)] += 1
+        if incidencia.estado == Incidencia.Estado.RESUELTO and incidencia.fecha_resolucion:
+            clave = (timezone.localdate(incidencia.fecha_resolucion), incidencia.fontanero_asignado_id)
+            resueltas[clave] += 1
+            segundos[clave] += int((incidencia.fecha_resolucion - incidencia.fecha_creacion).total_seconds())
+    for (fecha, estado), total in por_estado.items():
+        _incrementar(EstadisticaEstadoDiaria, {'fecha': fecha, 'estado': estado}, total=total)
+    for (fecha, fontanero_id), total in resueltas.items():
+        _incrementar(
+            EstadisticaResolucionDiaria,
+            {'fecha': fecha, 'fontanero_id': fontanero_id},
+            resueltas=total,
+            segundos_resolucion=segundos[(fecha, fontanero_id)],
+        )
+
+
+def registrar_eliminacion(incidencia):
+    _sumar_estado(incidencia, incidencia.estado, -1)
+    if incidencia.estado == Incidencia.Estado.RESUELTO and incidencia.fecha_resolucion:
+        _sumar_resolucion(incidencia, incidencia.fontanero_asignado_id, incidencia.fecha_resolucion, -1)
+
+
+def registrar_transicion(incidencia, previo):
+    """
+    Actualiza los rollups tras guardar una incidencia cuyo estado o fontanero
+    pudo haber cambiado respecto a `previo` (leído en antes_de_guardar()).
+    """
+    if previo['estado'] != incidencia.estado:
+        _sumar_estado(incidencia, previo['estado'], -1)
+        _sumar_estado(incidencia, incidencia.estado, 1)
+
+    resolucion_previa = (previo['fontanero_id'], previo['fecha_resolucion']) if previo['estado'] == Incidencia.Estado.RESUELTO else None
+    resolucion_nueva = (incidencia.fontanero_asignado_id, incidencia.fecha_resolucion) if incidencia.estado == Incidencia.Estado.RESUELTO else None
+    if resolucion_previa == resolucion_nueva:
+        return
+    if resolucion_previa and resolucion_previa[1]:
+        _sumar_resolucion(incidencia, resolucion_previa[0], resolucion_previa[1], -1)
+    if resolucion_nueva and resolucion_nueva[1]:
+        _sumar_resolucion(incidencia, resolucion_nueva[0], resolucion_nueva[1], 1)
+
+
+@contextmanager
+def sin_registrar():
+    """
+    Los guardados y borrados hechos dentro no actualizan los rollups (al archivar,
+    las incidencias salen de la tabla pero siguen contando).
+    """
+    token = _suspendido.set(True)
+    try:
+        yield
+    finally:
+        _suspendido.reset(token)
+
+
+def antes_de_guardar(sender, instance, raw=False, **kwargs):
+    """
+    pre_save de Incidencia: lee el estado guardado antes de sobrescribirlo y
+    ajusta fecha_resolucion si el estado cambia.
+    """
+    if raw or _suspendido.get() or instance._state.adding:
+        return
+    previo = Incidencia.objects.filter(pk=instance.pk).values(
+        'estado', 'fecha_resolucion', fontanero_id=F('fontanero_asignado')
+    ).first()
+    if previo is not None and previo['estado'] != instance.estado:
+        preparar_transicion(instance, previo)
+    instance._estadisticas_previo = previo
+
+
+def al_guardar(sender, instance, created, raw=False, **kwargs):
+    # post_save de Incidencia
+    previo = instance.__dict__.pop('_estadisticas_previo', None)
+    if raw or _suspendido.get():
+        return
+    if created:
+        registrar_creacion(instance)
+    elif previo is not None:
+        registrar_transicion(instance, previo)
+
+
+def al_borrar(sender, instance, **kwargs):
+    # pre_delete de Incidencia: también llega en el borrado en cascada de su agricultor
+    if not _suspendido.get():
+        registrar_eliminacion(instance)
+
+
+@transaction.atomic
+def reconstruir():
+    """
+    Recalcula todos los rollups desde cero a partir de las incidencias, archivadas incluidas.
+    Devuelve el número de filas generadas en cada rollup.
+    """
+    por_estado = Counter()
+    resueltas = Counter()
+    segundos = Counter()
+    campos = ('fecha_creacion', 'estado', 'fecha_resolucion', 'fontanero_asignado_id')
+    # Las incidencias archivadas (core/archivo.py) siguen contando en las estadísticas
+    filas = chain(
+        Incidencia.objects.values_list(*campos).iterator(chunk_size=2000),
+        IncidenciaArchivada.objects.values_list(*campos).iterator(chunk_size=2000),
+    )
+    for fecha_creacion, estado, fecha_resolucion, fontanero_id in filas:
+        por_estado[(timezone.localdate(fecha_creacion), estado)] += 1
+        if estado == Incidencia.Estado.RESUELTO and fecha_resolucion:
+            clave = (timezone.localdate(fecha_resolucion), fontanero_id)
+            resueltas[clave] += 1
+            segundos[clave] += int((fecha_resolucion - fecha_creacion).total_seconds())
+
+    EstadisticaEstadoDiaria.objects.all().delete()
+    EstadisticaResolucionDiaria.objects.all().delete()
+    EstadisticaEstadoDiaria.objects.bulk_create([
+        EstadisticaEstadoDiaria(fecha=fecha, estado=estado, total=total)
+        for (fecha, estado), total in por_estado.items()
+    ], batch_size=500)
+    EstadisticaResolucionDiaria.objects.bulk_create([
+        EstadisticaResolucionDiaria(fecha=fecha, fontanero_id=fontanero_id, resueltas=total, segundos_resolucion=segundos[(fecha, fontanero_id)])
+        for (fecha, fontanero_id), total in resueltas.items()
+    ], batch_size=500)
+    return len(por_estado), len(resueltas)
@@ -0,0 +1,129 @@
+# Archivo: core/exportacion.py
+"""
+Exportación en streaming (CSV o NDJSON) de incidencias y transcripciones de chat.
+
+Las filas se leen con values() y aiterator(): el ORM trae lotes de TAMANO_LOTE
+filas del cursor de la base de datos y el cuerpo se envía en bloques de
+~TAMANO_BLOQUE bytes, así que la memoria no depende del tamaño de la exportación.
+El contenido es un generador asíncrono porque bajo ASGI Django acumularía en
+memoria un iterador síncrono entero antes de enviarlo.
+"""
+import csv
+import json
+from datetime import datetime, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import MensajeChat
+from .serializers import formatear_fecha
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+# Filas por lote leído de la base de datos
+TAMANO_LOTE = 2000
+# Bytes aproximados de cada bloque del cuerpo de la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+
+class _Eco:
+    """
+    Pseudo-archivo para csv.writer: devuelve la línea en lugar de escribirla.
+    """
+    def write(self, valor):
+        return valor
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor)
+
+
+def incidencias(queryset, usuarios=False, tiempos=False):
+    """
+    Proyección de las incidencias para exportar. Con `usuarios` añade los
+    usernames (JOIN) y con `tiempos` las horas entre creación y resolución.
+    """
+    campos = [
+        'id', 'estado', 'descripcion', 'solucion', 'latitud', 'longitud',
+        'fecha_creacion', 'fecha_actualizacion', 'fecha_resolucion',
+        'agricultor_reporta', 'fontanero_asignado',
+    ]
+    unidos = {}
+    if usuarios:
+        unidos['agricultor_reporta_username'] = F('agricultor_reporta__username')
+        unidos['fontanero_asignado_username'] = F('fontanero_asignado__username')
+    if tiempos:
+        unidos['tiempo_resolucion'] = ExpressionWrapper(
+            F('fecha_resolucion') - F('fecha_creacion'), output_field=DurationField()
+        )
+    return queryset.values(*campos, **unidos)
+
+
+def mensajes(incidencias_queryset, usuarios=False):
+    """
+    Mensajes de las incidencias dadas, agrupados por incidencia y en orden
+    cronológico (índice chat_incidencia_fecha_idx).
+    """
+    campos = ['id', 'incidencia', 'autor', 'fecha_envio', 'contenido']
+    unidos = {'autor_username': F('autor__username')} if usuarios else {}
+    return MensajeChat.objects.filter(
+        incidencia__in=incidencias_queryset.order_by().values('id')
+    ).order_by('incidencia', 'fecha_envio', 'id').values(*campos, **unidos)
+
+
+def _columnas(nombres):
+    # La duración se exporta en horas, como en las estadísticas
+    return ['tiempo_resolucion_horas' if nombre == 'tiempo_resolucion' else nombre for nombre in nombres]
+
+
+def _preparar(fila):
+    if 'tiempo_resolucion' in fila:
+        duracion = fila.pop('tiempo_resolucion')
+        fila['tiempo_resolucion_horas'] = round(duracion.total_seconds() / 3600, 2) if isinstance(duracion, timedelta) else None
+    # Fechas con el mismo formato que la API
+    for clave, valor in fila.items():
+        if isinstance(valor, datetime):
+            fila[clave] = formatear_fecha(valor)
+    return fila
+
+
+async def _lineas(filas, formato):
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        columnas = _columnas(filas.query.values_select + tuple(filas.query.annotation_select))
+        yield escritor.writerow(columnas)
+    async for fila in filas.aiterator(chunk_size=TAMANO_LOTE):
+        fila = _preparar(fila)
+        if formato == 'ndjson':
+            yield json.dumps(fila, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        else:
+            yield escritor.writerow([_texto(fila[columna]) for columna in columnas])
+
+
+async def _bloques(filas, formato):
+    pendiente = []
+    tamano = 0
+    async for linea in _lineas(filas, formato):
+        pendiente.append(linea)
+        tamano += len(linea)
+        if tamano >= TAMANO_BLOQUE:
+            yield ''.join(pendiente).encode()
+            pendiente = []
+            tamano = 0
+    if pendiente:
+        yield ''.join(pendiente).encode()
+
+
+def respuesta(filas, formato, nombre):
+    """
+    StreamingHttpResponse que descarga `filas` (un queryset de values()) como
+    `nombre`-<fecha>.<formato>.
+    """
+    fecha = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+    response = StreamingHttpResponse(_bloques(filas, formato), content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}-{fecha}.{formato}"'
+    return response
@@ -0,0 +1,57 @@
+# Archivo: core/filtros.py
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from . import geo
+
+
+class FiltroArea(BaseFilterBackend):
+    """
+    Filtros espaciales de incidencias apoyados en el índice geohash:
+      - ?bbox=min_lng,min_lat,max_lng,max_lat
+      - ?near=lat,lng&radius=<metros> (radio por defecto RADIO_DEFECTO_M)
+    Primero se acotan las candidatas por rangos de celdas del índice y después
+    se aplica el filtro exacto (rectángulo o distancia de haversine).
+    """
+    RADIO_DEFECTO_M = 1000
+    RADIO_MAX_M = 500000
+
+    def _numeros(self, parametro, valor, cantidad):
+        try:
+            numeros = [float(parte) for parte in valor.split(',')]
+        except ValueError:
+            numeros = []
+        if len(numeros) != cantidad:
+            raise ValidationError({parametro: f'Se esperan {cantidad} números separados por comas.'})
+        return numeros
+
+    def _en_caja(self, queryset, min_lat, min_lng, max_lat, max_lng):
+        return queryset.filter(
+            geo.q_celdas(geo.celdas(min_lat, min_lng, max_lat, max_lng)),
+            latitud__gte=min_lat, latitud__lte=max_lat,
+            longitud__gte=min_lng, longitud__lte=max_lng,
+        )
+
+    def filter_queryset(self, request, queryset, view):
+        bbox = request.query_params.get('bbox')
+        if bbox:
+            min_lng, min_lat, max_lng, max_lat = self._numeros('bbox', bbox, 4)
+            if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180):
+                raise ValidationError({'bbox': 'Rectángulo fuera de rango o con los extremos invertidos.'})
+            queryset = self._en_caja(queryset, min_lat, min_lng, max_lat, max_lng)
+
+        near = request.query_params.get('near')
+        if near:
+            latitud, longitud = self._numeros('near', near, 2)
+            if not (-90 <= latitud <= 90 and -180 <= longitud <= 180):
+                raise ValidationError({'near': 'Coordenadas fuera de rango.'})
+            try:
+                radio = float(request.query_params.get('radius', self.RADIO_DEFECTO_M))
+            except ValueError:
+                raise ValidationError({'radius': 'Debe ser un número de metros.'})
+            if not 0 < radio <= self.RADIO_MAX_M:
+                raise ValidationError({'radius': f'Debe estar entre 0 y {self.RADIO_MAX_M} metros.'})
+            queryset = self._en_caja(queryset, *geo.caja_alrededor(latitud, longitud, radio))
+            queryset = queryset.alias(distancia=geo.distancia_m(latitud, longitud)).filter(distancia__lte=radio)
+
+        return queryset
@@ -0,0 +1,115 @@
+# Archivo: core/fotos.py
+"""
+Derivados de Incidencia.foto: una miniatura para listados y una versión de
+detalle, en WebP o JPEG, con la orientación EXIF aplicada y sin metadatos.
+
+El redimensionado corre en un pool de procesos (Pillow usa CPU y libera poco
+el GIL) y se lanza cuando la transacción de la subida confirma, así que la
+petición que crea la incidencia no espera al procesado.
+"""
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Lado mayor, en píxeles, de cada derivado
+TAMANOS = {
+    'miniatura': 320,
+    'detalle': 1280,
+}
+
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Se crea desde un worker de daphne con varios hilos: un fork copiaría los cerrojos que
+        # tengan tomados otros hilos y podría bloquear a los hijos. Con spawn arrancan limpios.
+        _pool = ProcessPoolExecutor(max_workers=settings.FOTOS_PROCESOS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def redimensionar(ruta_original, formato='WEBP', calidad=80):
+    """
+    Genera los derivados de una imagen. Se ejecuta en un proceso del pool,
+    así que no toca el ORM: recibe una ruta y devuelve los bytes de cada tamaño.
+    """
+    with Image.open(ruta_original) as imagen:
+        # Aplica la rotación indicada por EXIF antes de descartar los metadatos
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen = imagen.convert('RGB')
+        derivados = {}
+        for nombre, lado in TAMANOS.items():
+            copia = imagen.copy()
+            copia.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            salida = io.BytesIO()
+            # Se guarda sin exif=..., por lo que el derivado no lleva metadatos
+            copia.save(salida, format=formato, quality=calidad, optimize=True)
+            derivados[nombre] = salida.getvalue()
+        return derivados
+
+
+def _nombre_derivado(nombre_original, sufijo, formato):
+    base = os.path.splitext(os.path.basename(nombre_original))[0]
+    extension = 'webp' if formato == 'WEBP' else 'jpg'
+    return f'incidencias_fotos/derivados/{base}_{sufijo}.{extension}'
+
+
+def guardar_derivados(incidencia_id, nombre_original, derivados):
+    """
+    Guarda los bytes generados en el storage y enlaza los derivados a la incidencia.
+    """
+    from .models import Incidencia
+
+    formato = settings.FOTOS_FORMATO
+    campos = {}
+    for sufijo, contenido in derivados.items():
+        nombre = default_storage.save(_nombre_derivado(nombre_original, sufijo, formato), ContentFile(contenido))
+        campos[f'foto_{sufijo}'] = nombre
+    Incidencia.objects.filter(pk=incidencia_id, foto=nombre_original).update(**campos)
+
+
+def procesar(incidencia_id, nombre_original):
+    """
+    Genera y guarda los derivados en el proceso actual (backfill y modo síncrono).
+    """
+    derivados = redimensionar(default_storage.path(nombre_original), settings.FOTOS_FORMATO, settings.FOTOS_CALIDAD)
+    guardar_derivados(incidencia_id, nombre_original, derivados)
+
+
+def programar_derivados(incidencia_id, nombre_original):
+    """
+    Encola la generación de derivados sin bloquear al llamador.
+    Con FOTOS_PROCESOS = 0 se procesan en el momento (útil en pruebas).
+    """
+    if not nombre_original:
+        return None
+    if settings.FOTOS_PROCESOS <= 0:
+        procesar(incidencia_id, nombre_original)
+        return None
+
+    futuro = _get_pool().submit(
+        redimensionar, default_storage.path(nombre_original), settings.FOTOS_FORMATO, settings.FOTOS_CALIDAD
+    )
+
+    def al_terminar(futuro):
+        # Se ejecuta en un hilo interno del pool: usa su propia conexión y la cierra
+        try:
+            guardar_derivados(incidencia_id, nombre_original, futuro.result())
+        except Exception:
+            logger.exception('No se pudieron generar los derivados de la incidencia #%s', incidencia_id)
+        finally:
+            connection.close()
+
+    futuro.add_done_callback(al_terminar)
+    return futuro
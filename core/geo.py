@@ -0,0 +1,108 @@
+# Archivo: core/geo.py
+"""
+Índice espacial sin extensiones GIS: cada incidencia guarda el geohash de su
+ubicación en una columna indexada. Las búsquedas por área (?bbox= y ?near=)
+calculan las celdas que cubren la zona, recorren el índice con un rango por
+celda y después aplican el filtro exacto sobre latitud/longitud.
+"""
+import math
+
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Longitud del geohash guardado (~1 m de precisión)
+PRECISION = 10
+# Máximo de celdas con las que se cubre un área antes de bajar de precisión
+MAX_CELDAS = 16
+RADIO_TIERRA_M = 6371008.8
+
+
+def codificar(latitud, longitud, precision=PRECISION):
+    latitud, longitud = float(latitud), float(longitud)
+    rango_lat, rango_lng = [-90.0, 90.0], [-180.0, 180.0]
+    caracteres = []
+    bits = valor = 0
+    par = True
+    while len(caracteres) < precision:
+        rango, coordenada = (rango_lng, longitud) if par else (rango_lat, latitud)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            caracteres.append(BASE32[valor])
+            bits = valor = 0
+    return ''.join(caracteres)
+
+
+def _tamano_celda(precision):
+    # Los bits se reparten alternando longitud/latitud, empezando por longitud
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def celdas(min_lat, min_lng, max_lat, max_lng):
+    """
+    Prefijos geohash que cubren el rectángulo, con la mayor precisión que no
+    supere MAX_CELDAS.
+    """
+    elegidas = {''}
+    for precision in range(1, PRECISION + 1):
+        alto, ancho = _tamano_celda(precision)
+        filas = range(math.floor((min_lat + 90) / alto), math.floor((max_lat + 90) / alto) + 1)
+        columnas = range(math.floor((min_lng + 180) / ancho), math.floor((max_lng + 180) / ancho) + 1)
+        if len(filas) * len(columnas) > MAX_CELDAS:
+            break
+        elegidas = {
+            codificar(
+                min(fila * alto - 90 + alto / 2, 90.0),
+                min(columna * ancho - 180 + ancho / 2, 180.0),
+                precision,
+            )
+            for fila in filas for columna in columnas
+        }
+    return sorted(elegidas)
+
+
+def q_celdas(prefijos):
+    """
+    Un rango por prefijo (geohash >= p AND geohash < p + '~'), que a diferencia
+    de LIKE sí recorre el índice en SQLite.
+    """
+    condicion = Q()
+    for prefijo in prefijos:
+        if not prefijo:
+            return Q()
+        condicion |= Q(geohash__gte=prefijo, geohash__lt=prefijo + '~')
+    return condicion
+
+
+def caja_alrededor(latitud, longitud, radio_m):
+    """
+    Rectángulo (min_lat, min_lng, max_lat, max_lng) que contiene el círculo.
+    """
+    delta_lat = math.degrees(radio_m / RADIO_TIERRA_M)
+    coseno = math.cos(math.radians(latitud))
+    delta_lng = 180.0 if coseno < 1e-9 else min(math.degrees(radio_m / (RADIO_TIERRA_M * coseno)), 180.0)
+    return (
+        max(latitud - delta_lat, -90.0), max(longitud - delta_lng, -180.0),
+        min(latitud + delta_lat, 90.0), min(longitud + delta_lng, 180.0),
+    )
+
+
+def distancia_m(latitud, longitud):
+    """
+    Expresión de haversine en metros desde un punto hasta (latitud, longitud) de
+    cada fila. Django registra en SQLite las funciones trigonométricas necesarias.
+    """
+    lat = Radians(F('latitud'), output_field=FloatField())
+    d_lat = lat - math.radians(latitud)
+    d_lng = Radians(F('longitud'), output_field=FloatField()) - math.radians(longitud)
+    a = Power(Sin(d_lat / 2), 2) + math.cos(math.radians(latitud)) * Cos(lat) * Power(Sin(d_lng / 2), 2)
+    return 2 * RADIO_TIERRA_M * ASin(Sqrt(a), output_field=FloatField())
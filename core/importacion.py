@@ -0,0 +1,431 @@
+# Archivo: core/importacion.py
+"""
+Importación masiva de usuarios e incidencias históricas desde CSV o NDJSON
+(ver el comando importar_datos).
+
+El archivo se lee fila a fila y se procesa por lotes: cada lote se valida entero
+(con una consulta por lote para los usernames, no una por fila), se inserta con
+bulk_create y se confirma en su propia transacción junto con el progreso en
+Importacion, desde el que se reanuda si la importación se interrumpe.
+
+Las contraseñas se cifran en un pool de procesos antes de abrir la transacción:
+el hasher por defecto (PBKDF2) es lento a propósito y es lo que domina el coste
+de importar usuarios, y con transaction_mode=IMMEDIATE la transacción bloquearía
+las escrituras de la API mientras tanto.
+"""
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time as hora
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import estadisticas, geo, mapa
+from .models import Importacion, Incidencia, Usuario
+
+FORMATOS = ('csv', 'ndjson')
+EXTENSIONES = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'ndjson'}
+# Filas por lote (y por transacción)
+TAMANO_LOTE = 1000
+# Errores que se muestran como máximo al validar
+MAX_ERRORES = 50
+
+
+class ErrorImportacion(Exception):
+    """
+    Filas no válidas: `errores` es una lista de (línea del archivo, mensaje).
+    """
+    def __init__(self, errores):
+        super().__init__(f'{len(errores)} filas no válidas')
+        self.errores = errores
+
+
+def formato_de(ruta):
+    return EXTENSIONES.get(os.path.splitext(ruta)[1].lower())
+
+
+def _limpiar(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+
+def leer(ruta, formato):
+    """
+    Genera (línea del archivo, fila) sin cargar el archivo en memoria. La fila es
+    un dict con los valores vacíos como None, o None si la línea no es un objeto JSON.
+    """
+    # utf-8-sig: las hojas de cálculo suelen guardar el CSV con BOM
+    with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+        if formato == 'csv':
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, {clave.strip(): _limpiar(valor) for clave, valor in fila.items() if clave}
+            return
+        for numero, linea in enumerate(archivo, 1):
+            if not linea.strip():
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                fila = None
+            yield numero, {clave: _limpiar(valor) for clave, valor in fila.items()} if isinstance(fila, dict) else None
+
+
+def _fecha(valor):
+    """
+    Fecha ISO 8601 (o solo el día) como datetime aware; sin zona se toma la local.
+    """
+    texto = str(valor)
+    try:
+        fecha = parse_datetime(texto)
+        if fecha is None:
+            dia = parse_date(texto)
+            fecha = datetime.combine(dia, hora.min) if dia else None
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise ValueError(f"fecha '{texto}' no válida (formato ISO 8601)")
+    return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+
+def _coordenada(valor, nombre, limite):
+    try:
+        numero = Decimal(str(valor))
+    except InvalidOperation:
+        numero = None
+    if numero is None or not numero.is_finite() or abs(numero) > limite:
+        raise ValueError(f"{nombre} '{valor}' no válida")
+    return numero
+
+
+class Importador:
+    """
+    Base de los importadores. validar() convierte un lote de filas en objetos
+    (y errores), preparar() hace el trabajo caro fuera de la transacción y
+    guardar() escribe el lote dentro de ella.
+    """
+    tipo = None
+
+    def validar(self, lote):
+        raise NotImplementedError
+
+    def preparar(self, objetos):
+        pass
+
+    def guardar(self, objetos):
+        raise NotImplementedError
+
+    def cerrar(self):
+        pass
+
+
+def _cifrar(password):
+    return make_password(password)
+
+
+class ImportadorUsuarios(Importador):
+    """
+    Columnas: username, rol y, opcionales, password, email, first_name y last_name.
+    Sin password el usuario queda con una contraseña no utilizable.
+    """
+    tipo = Importacion.Tipo.USUARIOS
+
+    def __init__(self, procesos=None):
+        self.procesos = procesos or os.cpu_count() or 1
+        self._pool = None
+        # Usernames ya vistos en el archivo, para detectar duplicados entre lotes
+        self._vistos = set()
+        self._validador = UnicodeUsernameValidator()
+
+    def validar(self, lote):
+        nombres = {Usuario.normalize_username(str(fila['username'])) for _, fila in lote if fila and fila.get('username')}
+        existentes = set(Usuario.objects.filter(username__in=nombres).values_list('username', flat=True))
+
+        objetos, errores = [], []
+        for numero, fila in lote:
+            if fila is None:
+                errores.append((numero, 'la línea no es un objeto JSON'))
+                continue
+            problemas = []
+            username = Usuario.normalize_username(str(fila.get('username') or ''))
+            if not username:
+                problemas.append('username es obligatorio')
+            else:
+                try:
+                    self._validador(username)
+                except ValidationError as error:
+                    problemas.extend(error.messages)
+                if len(username) > 150:
+                    problemas.append('username tiene más de 150 caracteres')
+                if username in existentes:
+                    problemas.append(f"el usuario '{username}' ya existe")
+                elif username in self._vistos:
+                    problemas.append(f"el usuario '{username}' está repetido en el archivo")
+            rol = str(fila.get('rol') or '').upper()
+            if rol not in Usuario.Rol.values:
+                problemas.append(f"rol '{fila.get('rol') or ''}' no válido ({', '.join(Usuario.Rol.values)})")
+            email = Usuario.objects.normalize_email(fila.get('email') or '')
+            if email:
+                try:
+                    validate_email(email)
+                except ValidationError:
+                    problemas.append(f"email '{email}' no válido")
+            if problemas:
+                errores.append((numero, '; '.join(problemas)))
+                continue
+
+            self._vistos.add(username)
+            usuario = Usuario(
+                username=username,
+                email=email,
+                rol=rol,
+                first_name=str(fila.get('first_name') or '')[:150],
+                last_name=str(fila.get('last_name') or '')[:150],
+                # Igual que sembrar_datos: IsAdminUser comprueba is_staff
+                is_staff=rol == Usuario.Rol.ADMINISTRADOR,
+            )
+            objetos.append((usuario, fila.get('password')))
+        return objetos, errores
+
+    def preparar(self, objetos):
+        passwords = [str(password) for _, password in objetos if password is not None]
+        if self.procesos > 1 and len(passwords) > 1:
+            if self._pool is None:
+                # initializer: con el método spawn los procesos no heredan la configuración
+                self._pool = ProcessPoolExecutor(max_workers=self.procesos, initializer=django.setup)
+            trozo = max(len(passwords) // (self.procesos * 4), 1)
+            cifradas = iter(list(self._pool.map(_cifrar, passwords, chunksize=trozo)))
+        else:
+            cifradas = iter([_cifrar(password) for password in passwords])
+        for usuario, password in objetos:
+            usuario.password = next(cifradas) if password is not None else make_password(None)
+
+    def guardar(self, objetos):
+        Usuario.objects.bulk_create([usuario for usuario, _ in objetos])
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+def _fijar_fechas(incidencias):
+    """
+    Escribe fecha_creacion y fecha_actualizacion de las incidencias ya insertadas.
+    bulk_update generaría un CASE con una rama por fila que SQLite evalúa para cada
+    fila actualizada; un UPDATE ... FROM (VALUES ...) las une por id en una pasada.
+    """
+    tabla = connection.ops.quote_name(Incidencia._meta.db_table)
+    campos = [Incidencia._meta.get_field(nombre) for nombre in ('fecha_creacion', 'fecha_actualizacion')]
+    por_sentencia = connection.features.max_query_params // 3
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(incidencias), por_sentencia):
+            trozo = incidencias[inicio:inicio + por_sentencia]
+            params = []
+            for incidencia in trozo:
+                params.append(incidencia.pk)
+                params.extend(campo.get_db_prep_save(getattr(incidencia, campo.attname), connection) for campo in campos)
+            valores = ', '.join(['(%s, %s, %s)'] * len(trozo))
+            cursor.execute(
+                f'UPDATE {tabla} SET {campos[0].column} = fechas.column2, {campos[1].column} = fechas.column3 '
+                f'FROM (VALUES {valores}) AS fechas WHERE {tabla}.id = fechas.column1',
+                params,
+            )
+
+
+class ImportadorIncidencias(Importador):
+    """
+    Columnas: descripcion, latitud, longitud, agricultor_reporta_username y,
+    opcionales, estado, solucion, fontanero_asignado_username, fecha_creacion,
+    fecha_resolucion y foto (ruta dentro de MEDIA_ROOT). Son los mismos nombres
+    que usa la exportación, así que un archivo exportado se puede volver a importar.
+    """
+    tipo = Importacion.Tipo.INCIDENCIAS
+
+    def __init__(self):
+        # username -> (id, rol); los mismos usuarios se repiten en muchos lotes
+        self._usuarios = {}
+
+    def _buscar_usuarios(self, lote):
+        nombres = set()
+        for _, fila in lote:
+            if fila:
+                nombres.update(fila.get(campo) for campo in ('agricultor_reporta_username', 'fontanero_asignado_username'))
+        nuevos = {str(nombre) for nombre in nombres if nombre} - set(self._usuarios)
+        if nuevos:
+            for username, id_, rol in Usuario.objects.filter(username__in=nuevos).values_list('username', 'id', 'rol'):
+                self._usuarios[username] = (id_, rol)
+
+    def _usuario(self, fila, campo, rol, problemas, obligatorio):
+        username = fila.get(campo)
+        if not username:
+            if obligatorio:
+                problemas.append(f'{campo} es obligatorio')
+            return None
+        encontrado = self._usuarios.get(str(username))
+        if encontrado is None:
+            problemas.append(f"el usuario '{username}' no existe")
+            return None
+        if encontrado[1] != rol:
+            problemas.append(f"el usuario '{username}' no es {rol}")
+            return None
+        return encontrado[0]
+
+    def validar(self, lote):
+        self._buscar_usuarios(lote)
+        ahora = timezone.now()
+
+        objetos, errores = [], []
+        for numero, fila in lote:
+            if fila is None:
+                errores.append((numero, 'la línea no es un objeto JSON'))
+                continue
+            problemas = []
+            descripcion = fila.get('descripcion')
+            if not descripcion:
+                problemas.append('descripcion es obligatoria')
+            latitud = longitud = None
+            try:
+                latitud = _coordenada(fila.get('latitud'), 'latitud', 90)
+                longitud = _coordenada(fila.get('longitud'), 'longitud', 180)
+            except ValueError as error:
+                problemas.append(str(error))
+            estado = str(fila.get('estado') or Incidencia.Estado.PENDIENTE).upper()
+            if estado not in Incidencia.Estado.values:
+                problemas.append(f"estado '{fila.get('estado')}' no válido ({', '.join(Incidencia.Estado.values)})")
+            agricultor_id = self._usuario(fila, 'agricultor_reporta_username', Usuario.Rol.AGRICULTOR, problemas, True)
+            fontanero_id = self._usuario(fila, 'fontanero_asignado_username', Usuario.Rol.FONTANERO, problemas, False)
+            creada = resuelta = None
+            try:
+                creada = _fecha(fila['fecha_creacion']) if fila.get('fecha_creacion') else ahora
+                resuelta = _fecha(fila['fecha_resolucion']) if fila.get('fecha_resolucion') else None
+            except ValueError as error:
+                problemas.append(str(error))
+            if resuelta is not None:
+                if estado != Incidencia.Estado.RESUELTO:
+                    problemas.append('fecha_resolucion solo corresponde a incidencias RESUELTO')
+                elif creada is not None and resuelta < creada:
+                    problemas.append('fecha_resolucion es anterior a fecha_creacion')
+            if problemas:
+                errores.append((numero, '; '.join(problemas)))
+                continue
+
+            incidencia = Incidencia(
+                descripcion=str(descripcion),
+                foto=str(fila.get('foto') or ''),
+                latitud=latitud,
+                longitud=longitud,
+                # bulk_create no llama a save(): el geohash se calcula aquí
+                geohash=geo.codificar(latitud, longitud),
+                estado=estado,
+                solucion=str(fila['solucion']) if fila.get('solucion') else None,
+                fecha_resolucion=resuelta,
+                agricultor_reporta_id=agricultor_id,
+                fontanero_asignado_id=fontanero_id,
+            )
+            objetos.append((incidencia, creada))
+        return objetos, errores
+
+    def guardar(self, objetos):
+        incidencias = [incidencia for incidencia, _ in objetos]
+        Incidencia.objects.bulk_create(incidencias)
+        # bulk_create aplica auto_now_add/auto_now: las fechas históricas se fijan después
+        for incidencia, creada in objetos:
+            incidencia.fecha_creacion = creada
+            incidencia.fecha_actualizacion = incidencia.fecha_resolucion or creada
+        _fijar_fechas(incidencias)
+        estadisticas.registrar_creaciones(incidencias)
+        # Tampoco se envía post_save: las teselas del mapa se invalidan a mano
+        transaction.on_commit(mapa.invalidar)
+
+
+def _lotes(filas, tamano):
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+def importar(importador, ruta, formato, tamano_lote=TAMANO_LOTE, validar=False, al_avanzar=None):
+    """
+    Importa (o con `validar` solo valida) el archivo. Si hay una importación sin
+    terminar del mismo archivo, continúa tras sus filas ya confirmadas.
+
+    Lanza ErrorImportacion con las filas no válidas: al validar, tras recorrer todo
+    el archivo; al importar, en el primer lote con errores (los lotes anteriores
+    quedan confirmados y la siguiente ejecución reanuda desde ese lote).
+    Devuelve un resumen con los tiempos y el rendimiento.
+    """
+    ruta = os.path.abspath(ruta)
+    importacion = Importacion.objects.filter(tipo=importador.tipo, archivo=ruta, completada=False).order_by('-id').first()
+    reanudada_desde = importacion.filas if importacion else 0
+    if importacion is None and not validar:
+        importacion = Importacion.objects.create(tipo=importador.tipo, archivo=ruta)
+
+    filas = leer(ruta, formato)
+    # Las filas ya confirmadas se leen pero no se procesan de nuevo
+    for _ in islice(filas, reanudada_desde):
+        pass
+
+    resumen = {'filas': 0, 'lotes': 0, 'segundos_validacion': 0.0, 'segundos_preparacion': 0.0, 'segundos_escritura': 0.0}
+    errores = []
+    inicio = time.perf_counter()
+    try:
+        for lote in _lotes(filas, tamano_lote):
+            marca = time.perf_counter()
+            objetos, errores_lote = importador.validar(lote)
+            resumen['segundos_validacion'] += time.perf_counter() - marca
+            errores.extend(errores_lote)
+            if validar:
+                resumen['filas'] += len(objetos)
+                resumen['lotes'] += 1
+                continue
+            if errores:
+                raise ErrorImportacion(errores)
+
+            marca = time.perf_counter()
+            importador.preparar(objetos)
+            resumen['segundos_preparacion'] += time.perf_counter() - marca
+
+            marca = time.perf_counter()
+            with transaction.atomic():
+                importador.guardar(objetos)
+                importacion.filas += len(lote)
+                importacion.save(update_fields=['filas', 'fecha_actualizacion'])
+            resumen['segundos_escritura'] += time.perf_counter() - marca
+            resumen['filas'] += len(objetos)
+            resumen['lotes'] += 1
+            if al_avanzar:
+                al_avanzar(importacion.filas)
+    finally:
+        importador.cerrar()
+
+    if errores:
+        raise ErrorImportacion(errores)
+    if not validar:
+        importacion.completada = True
+        importacion.save(update_fields=['completada', 'fecha_actualizacion'])
+
+    segundos = time.perf_counter() - inicio
+    resumen.update({
+        'tipo': importador.tipo,
+        'archivo': ruta,
+        'validacion': validar,
+        'reanudada_desde': reanudada_desde,
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(resumen['filas'] / segundos, 1) if segundos else None,
+    })
+    for clave in ('segundos_validacion', 'segundos_preparacion', 'segundos_escritura'):
+        resumen[clave] = round(resumen[clave], 3)
+    return resumen
@@ -0,0 +1,330 @@
+# Archivo: core/instrumentacion.py
+"""
+Instrumentación por petición, activada con INSTRUMENTACION=True.
+
+Cada petición HTTP (y cada mensaje recibido por un WebSocket) lleva una
+Medicion en un contextvar: número de consultas y tiempo de SQL (capturados con
+execute_wrapper), tiempo de vista, de serialización y de render. Con ella:
+  - se añade la cabecera Server-Timing a la respuesta,
+  - se registran en el log las peticiones que superan INSTRUMENTACION_UMBRAL_MS
+    junto con sus consultas más lentas,
+  - se acumulan histogramas de latencia por ruta en una ventana deslizante de
+    INSTRUMENTACION_VENTANA_MINUTOS, que expone /api/metricas/rutas/.
+Los histogramas son de cada proceso, igual que las métricas del EjecutorDB.
+"""
+import contextlib
+import contextvars
+import heapq
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de las cubetas de los histogramas; la última cubeta es "más de 5000"
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Consultas lentas que se conservan por petición para el log
+MAX_CONSULTAS_LENTAS = 3
+
+_medicion_actual = contextvars.ContextVar('medicion_actual', default=None)
+
+
+class Medicion:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.total = None
+        self.sql_consultas = 0
+        self.sql_segundos = 0.0
+        self.consultas_lentas = []
+        self.tiempos = {}
+        self._activos = set()
+
+    def registrar_sql(self, sql, segundos):
+        self.sql_consultas += 1
+        self.sql_segundos += segundos
+        entrada = (segundos, self.sql_consultas, sql)
+        if len(self.consultas_lentas) < MAX_CONSULTAS_LENTAS:
+            heapq.heappush(self.consultas_lentas, entrada)
+        else:
+            heapq.heappushpop(self.consultas_lentas, entrada)
+
+    @contextlib.contextmanager
+    def medir(self, nombre):
+        # Las llamadas anidadas del mismo tramo (p. ej. serializers dentro de un ListSerializer) no se suman dos veces
+        if nombre in self._activos:
+            yield
+            return
+        self._activos.add(nombre)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._activos.discard(nombre)
+            self.sumar(nombre, time.perf_counter() - inicio)
+
+    def sumar(self, nombre, segundos):
+        self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + segundos
+
+    def terminar(self):
+        self.total = time.perf_counter() - self.inicio
+        return self
+
+    def server_timing(self):
+        partes = [f'sql;dur={self.sql_segundos * 1000:.1f};desc="{self.sql_consultas} consultas"']
+        for nombre in ('vista', 'serializador', 'render'):
+            if nombre in self.tiempos:
+                partes.append(f'{nombre};dur={self.tiempos[nombre] * 1000:.1f}')
+        partes.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(partes)
+
+    def lentas(self):
+        return [
+            {'ms': round(segundos * 1000, 2), 'sql': sql[:500]}
+            for segundos, _, sql in sorted(self.consultas_lentas, reverse=True)
+        ]
+
+
+def medicion_actual():
+    return _medicion_actual.get()
+
+
+@contextlib.contextmanager
+def medir(nombre):
+    """
+    Suma el tiempo del bloque al tramo `nombre` de la medición en curso (si la hay).
+    """
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        yield
+        return
+    with medicion.medir(nombre):
+        yield
+
+
+@contextlib.contextmanager
+def capturar_sql(medicion):
+    """
+    Cuenta y cronometra las consultas de este hilo en `medicion`.
+    """
+    if medicion is None:
+        yield
+        return
+
+    def envoltorio(execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            medicion.registrar_sql(sql, time.perf_counter() - inicio)
+
+    with contextlib.ExitStack() as pila:
+        for conexion in connections.all():
+            pila.enter_context(conexion.execute_wrapper(envoltorio))
+        yield
+
+
+class Acumulado:
+    def __init__(self):
+        self.cubetas = [0] * (len(LIMITES_MS) + 1)
+        self.peticiones = 0
+        self.total_ms = 0.0
+        self.sql_consultas = 0
+        self.sql_ms = 0.0
+
+    def sumar(self, otro):
+        self.cubetas = [a + b for a, b in zip(self.cubetas, otro.cubetas)]
+        self.peticiones += otro.peticiones
+        self.total_ms += otro.total_ms
+        self.sql_consultas += otro.sql_consultas
+        self.sql_ms += otro.sql_ms
+
+    def percentil(self, fraccion):
+        """
+        Límite superior de la cubeta en la que cae el percentil (None si supera el último límite).
+        """
+        objetivo = fraccion * self.peticiones
+        acumuladas = 0
+        for indice, cantidad in enumerate(self.cubetas):
+            acumuladas += cantidad
+            if acumuladas >= objetivo and cantidad:
+                return LIMITES_MS[indice] if indice < len(LIMITES_MS) else None
+        return None
+
+
+class Histogramas:
+    """
+    Histogramas por ruta en cubetas de un minuto; se conservan los últimos
+    `ventana_minutos` minutos y se fusionan al consultarlos.
+    """
+    def __init__(self, ventana_minutos):
+        self.ventana_minutos = ventana_minutos
+        self._minutos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, ruta, medicion):
+        minuto = int(time.time() // 60)
+        total_ms = medicion.total * 1000
+        indice = next((i for i, limite in enumerate(LIMITES_MS) if total_ms <= limite), len(LIMITES_MS))
+        with self._lock:
+            rutas = self._minutos.setdefault(minuto, {})
+            acumulado = rutas.get(ruta)
+            if acumulado is None:
+                acumulado = rutas[ruta] = Acumulado()
+            acumulado.cubetas[indice] += 1
+            acumulado.peticiones += 1
+            acumulado.total_ms += total_ms
+            acumulado.sql_consultas += medicion.sql_consultas
+            acumulado.sql_ms += medicion.sql_segundos * 1000
+            for viejo in [m for m in self._minutos if m <= minuto - self.ventana_minutos]:
+                del self._minutos[viejo]
+
+    def resumen(self):
+        desde = int(time.time() // 60) - self.ventana_minutos
+        fusion = {}
+        with self._lock:
+            for minuto, rutas in self._minutos.items():
+                if minuto <= desde:
+                    continue
+                for ruta, acumulado in rutas.items():
+                    fusion.setdefault(ruta, Acumulado()).sumar(acumulado)
+        return [
+            {
+                'ruta': ruta,
+                'peticiones': acumulado.peticiones,
+                'media_ms': round(acumulado.total_ms / acumulado.peticiones, 2),
+                'p50_ms': acumulado.percentil(0.50),
+                'p95_ms': acumulado.percentil(0.95),
+                'p99_ms': acumulado.percentil(0.99),
+                'sql_consultas_media': round(acumulado.sql_consultas / acumulado.peticiones, 2),
+                'sql_media_ms': round(acumulado.sql_ms / acumulado.peticiones, 2),
+                'histograma': acumulado.cubetas,
+            }
+            for ruta, acumulado in sorted(fusion.items(), key=lambda item: -item[1].total_ms)
+        ]
+
+
+_histogramas = None
+_histogramas_lock = threading.Lock()
+
+
+def get_histogramas():
+    global _histogramas
+    with _histogramas_lock:
+        if _histogramas is None:
+            _histogramas = Histogramas(settings.INSTRUMENTACION_VENTANA_MINUTOS)
+        return _histogramas
+
+
+def finalizar(ruta, medicion, detalle=''):
+    """
+    Registra la medición en los histogramas y la escribe en el log si es lenta.
+    """
+    medicion.terminar()
+    get_histogramas().registrar(ruta, medicion)
+    if medicion.total * 1000 >= settings.INSTRUMENTACION_UMBRAL_MS:
+        logger.warning(
+            'Petición lenta %s%s: %.1f ms, %d consultas (%.1f ms de SQL). Consultas más lentas: %s',
+            ruta, detalle, medicion.total * 1000, medicion.sql_consultas,
+            medicion.sql_segundos * 1000, medicion.lentas()
+        )
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide cada petición HTTP y añade la cabecera Server-Timing.
+    Debe ser el primer middleware para que 'total' incluya a los demás.
+    Admite la cadena síncrona y la asíncrona, para no forzar a Django a pasar
+    las vistas asíncronas (core/vistas_async.py) a un hilo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACION:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            with capturar_sql(medicion):
+                response = self.get_response(request)
+        finally:
+            _medicion_actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        # El ORM asíncrono ejecuta las consultas en el hilo de la petición (sync_to_async
+        # thread-sensitive), con sus propias conexiones: la captura se instala en ese hilo
+        pila = contextlib.ExitStack()
+        await sync_to_async(pila.enter_context)(capturar_sql(medicion))
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+            _medicion_actual.reset(token)
+        return self._terminar(request, response, medicion)
+
+    def _terminar(self, request, response, medicion):
+        # Sin process_template_response (respuestas que no son de DRF) la vista dura hasta aquí
+        if 'vista' not in medicion.tiempos and hasattr(request, '_inicio_vista'):
+            medicion.sumar('vista', time.perf_counter() - request._inicio_vista)
+        elif hasattr(request, '_fin_vista'):
+            medicion.sumar('render', time.perf_counter() - request._fin_vista)
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        ruta = f"{request.method} {coincidencia.view_name if coincidencia else 'sin_ruta'}"
+        finalizar(ruta, medicion, f' ({request.get_full_path()} -> {response.status_code})')
+        response['Server-Timing'] = medicion.server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._inicio_vista = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Las respuestas de DRF se renderizan justo después: aquí termina la vista
+        medicion = _medicion_actual.get()
+        if medicion is not None and hasattr(request, '_inicio_vista'):
+            request._fin_vista = time.perf_counter()
+            medicion.sumar('vista', request._fin_vista - request._inicio_vista)
+        return response
+
+
+class SerializacionMedida:
+    """
+    Mixin para serializers de DRF: suma su to_representation al tramo 'serializador'.
+    """
+    def to_representation(self, instance):
+        with medir('serializador'):
+            return super().to_representation(instance)
+
+
+class ConsumerMedido:
+    """
+    Mixin para consumers de Channels: cada mensaje recibido se mide como una
+    petición (ruta 'WS <Consumer>'), incluidas las consultas que hace a través
+    del EjecutorDB.
+    """
+    async def websocket_receive(self, message):
+        if not settings.INSTRUMENTACION:
+            return await super().websocket_receive(message)
+        medicion = Medicion()
+        token = _medicion_actual.set(medicion)
+        try:
+            with medicion.medir('vista'):
+                return await super().websocket_receive(message)
+        finally:
+            _medicion_actual.reset(token)
+            finalizar(f'WS {type(self).__name__}', medicion)
@@ -0,0 +1,47 @@
+# Archivo: core/management/commands/archivar.py
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        'Archiva las incidencias resueltas hace más de --meses meses junto con sus mensajes de chat y '
+        'sus notificaciones: pasan a IncidenciaArchivada (JSON comprimido) y salen de las tablas '
+        'calientes. Se consultan en /api/archivo/incidencias/.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--meses', type=int, default=settings.ARCHIVO_MESES,
+                            help='Meses desde la resolución (por defecto ARCHIVO_MESES).')
+        parser.add_argument('--lote', type=int, default=archivo.TAMANO_LOTE, help='Incidencias por transacción.')
+        parser.add_argument('--simular', action='store_true', help='Solo cuenta lo que se archivaría.')
+
+    def handle(self, *args, **options):
+        if options['meses'] < 0 or options['lote'] < 1:
+            raise CommandError('--meses no puede ser negativo y --lote debe ser mayor que 0.')
+
+        if options['simular']:
+            conteo = archivo.contar(options['meses'])
+            self.stdout.write(
+                f"Se archivarían {conteo['incidencias']} incidencias, {conteo['mensajes']} mensajes "
+                f"y {conteo['notificaciones']} notificaciones."
+            )
+            return
+
+        def al_avanzar(incidencias):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{incidencias} incidencias archivadas')
+
+        resumen = archivo.archivar(options['meses'], options['lote'], al_avanzar=al_avanzar)
+        compresion = ''
+        if resumen['bytes_comprimidos']:
+            compresion = (
+                f" {resumen['bytes_json']} bytes de JSON guardados en {resumen['bytes_comprimidos']} "
+                f"({resumen['bytes_json'] / resumen['bytes_comprimidos']:.1f}x)."
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivadas {resumen['incidencias']} incidencias, {resumen['mensajes']} mensajes y "
+            f"{resumen['notificaciones']} notificaciones en {resumen['segundos']} s.{compresion}"
+        ))
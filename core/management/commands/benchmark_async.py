@@ -0,0 +1,89 @@
+# Archivo: core/management/commands/benchmark_async.py
+import json
+import time
+
+from core.models import Incidencia
+from core.management.commands import benchmark_carga
+from core.management.commands.benchmark_carga import Escenario
+
+
+class Command(benchmark_carga.Command):
+    help = (
+        'Compara bajo carga las vistas de DRF con sus versiones asíncronas (core/vistas_async.py). '
+        'Arranca daphne con VISTAS_ASYNC=False y con VISTAS_ASYNC=True y mide rps y latencias '
+        'de cada endpoint para varios niveles de concurrencia. Usa los datos de sembrar_datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--puerto', type=int, default=8765, help='Puerto del daphne local.')
+        parser.add_argument('--concurrencias', default='1,8,32,64', help='Niveles de concurrencia, separados por comas.')
+        parser.add_argument('--peticiones', type=int, default=400, help='Peticiones por endpoint y nivel.')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (además de imprimirlo).')
+
+    def handle(self, *args, **options):
+        concurrencias = [int(valor) for valor in options['concurrencias'].split(',')]
+        escenarios = self._escenarios_lectura()
+
+        resultados = []
+        for modo, vistas_async in (('sync', 'False'), ('async', 'True')):
+            servidor = self._arrancar_daphne(options['puerto'], VISTAS_ASYNC=vistas_async)
+            try:
+                for concurrencia in concurrencias:
+                    for escenario in escenarios:
+                        fila = self._cargar('127.0.0.1', options['puerto'], escenario, dict(options, concurrencia=concurrencia), None)
+                        del fila['consultas_sql']
+                        fila.update(modo=modo, concurrencia=concurrencia)
+                        resultados.append(fila)
+                        self.stderr.write(f"{modo} {escenario.nombre} x{concurrencia}: {fila['rps']} rps")
+            finally:
+                servidor.terminate()
+                servidor.wait(timeout=30)
+
+        informe = {
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'parametros': {'concurrencias': concurrencias, 'peticiones': options['peticiones']},
+            'resultados': resultados,
+            'comparativa': self._comparar(resultados),
+        }
+        texto = json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        self.stdout.write(texto)
+
+    def _escenarios_lectura(self):
+        admin = self._usuario('ADMINISTRADOR')
+        fontanero = self._usuario('FONTANERO', incidencias_asignadas__isnull=False)
+        agricultor = self._usuario('AGRICULTOR', incidencias_reportadas__isnull=False)
+        token_admin, token_fontanero, token_agricultor = (self._token(u) for u in (admin, fontanero, agricultor))
+        ids = list(Incidencia.objects.values_list('id', flat=True)[:5000])
+
+        return [
+            Escenario('dashboard_admin', lambda n: '/api/dashboard-summary/', token_admin),
+            Escenario('dashboard_fontanero', lambda n: '/api/dashboard-summary/', token_fontanero),
+            Escenario('estadisticas', lambda n: '/api/estadisticas/', token_admin),
+            Escenario('notificaciones_no_leidas', lambda n: '/api/notificaciones/no_leidas/', token_agricultor),
+            Escenario('incidencias_detalle', lambda n: f'/api/incidencias/{ids[n % len(ids)]}/', token_admin),
+        ]
+
+    @staticmethod
+    def _comparar(resultados):
+        """
+        rps y p95 de ambos modos por endpoint y concurrencia; 'mejora_rps' es async/sync.
+        """
+        filas = {(r['endpoint'], r['concurrencia'], r['modo']): r for r in resultados}
+        comparativa = []
+        for (endpoint, concurrencia, modo), sync in sorted(filas.items()):
+            if modo != 'sync' or (endpoint, concurrencia, 'async') not in filas:
+                continue
+            asincrona = filas[(endpoint, concurrencia, 'async')]
+            comparativa.append({
+                'endpoint': endpoint,
+                'concurrencia': concurrencia,
+                'rps_sync': sync['rps'],
+                'rps_async': asincrona['rps'],
+                'p95_ms_sync': sync['p95_ms'],
+                'p95_ms_async': asincrona['p95_ms'],
+                'mejora_rps': round(asincrona['rps'] / sync['rps'], 2) if sync['rps'] and asincrona['rps'] else None,
+            })
+        return comparativa
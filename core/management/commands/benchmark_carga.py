@@ -0,0 +1,344 @@
+# Archivo: core/management/commands/benchmark_carga.py
+import asyncio
+import base64
+import http.client
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Usuario, Incidencia
+from core.serializers import MyTokenObtainPairSerializer
+
+# Cabeceras de un cliente detrás del proxy: evitan la redirección a HTTPS
+CABECERAS_BASE = {'Host': 'localhost', 'X-Forwarded-Proto': 'https'}
+
+
+def percentil(valores, fraccion):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fraccion * len(ordenados)))]
+
+
+def resumen(nombre, latencias, errores, segundos, consultas=None):
+    return {
+        'endpoint': nombre,
+        'peticiones': len(latencias),
+        'errores': errores,
+        'rps': round(len(latencias) / segundos, 1) if segundos else None,
+        'p50_ms': round(percentil(latencias, 0.50) * 1000, 2) if latencias else None,
+        'p95_ms': round(percentil(latencias, 0.95) * 1000, 2) if latencias else None,
+        'p99_ms': round(percentil(latencias, 0.99) * 1000, 2) if latencias else None,
+        'consultas_sql': consultas,
+    }
+
+
+class Escenario:
+    """
+    Un endpoint a medir. `ruta` recibe el número de petición y devuelve la URL,
+    para repartir la carga entre distintas incidencias.
+    """
+    def __init__(self, nombre, ruta, token=None, metodo='GET', cuerpo=None, peticiones=None):
+        self.nombre = nombre
+        self.ruta = ruta
+        self.token = token
+        self.metodo = metodo
+        self.cuerpo = cuerpo
+        self.peticiones = peticiones
+
+    def cabeceras(self):
+        cabeceras = dict(CABECERAS_BASE)
+        if self.token:
+            cabeceras['Authorization'] = f'Bearer {self.token}'
+        if self.cuerpo is not None:
+            cabeceras['Content-Type'] = 'application/json'
+        return cabeceras
+
+
+# --- Cliente WebSocket mínimo (RFC 6455) para no depender de librerías externas ---
+
+async def ws_conectar(host, puerto, ruta):
+    reader, writer = await asyncio.open_connection(host, puerto)
+    clave = base64.b64encode(os.urandom(16)).decode()
+    writer.write((
+        f'GET {ruta} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+        f'Sec-WebSocket-Key: {clave}\r\nSec-WebSocket-Version: 13\r\nX-Forwarded-Proto: https\r\n\r\n'
+    ).encode())
+    cabecera = await reader.readuntil(b'\r\n\r\n')
+    if b' 101 ' not in cabecera.split(b'\r\n', 1)[0]:
+        writer.close()
+        raise ConnectionError(cabecera.split(b'\r\n', 1)[0].decode())
+    return reader, writer
+
+
+def ws_trama(texto, opcode=0x1):
+    datos = texto.encode()
+    mascara = os.urandom(4)
+    longitud = len(datos)
+    if longitud < 126:
+        cabecera = struct.pack('!BB', 0x80 | opcode, 0x80 | longitud)
+    elif longitud < 65536:
+        cabecera = struct.pack('!BBH', 0x80 | opcode, 0x80 | 126, longitud)
+    else:
+        cabecera = struct.pack('!BBQ', 0x80 | opcode, 0x80 | 127, longitud)
+    return cabecera + mascara + bytes(b ^ mascara[i % 4] for i, b in enumerate(datos))
+
+
+async def ws_leer(reader):
+    """
+    Devuelve el texto de la siguiente trama de datos (los mensajes del servidor no van enmascarados).
+    """
+    while True:
+        primero, segundo = await reader.readexactly(2)
+        opcode = primero & 0x0F
+        longitud = segundo & 0x7F
+        if longitud == 126:
+            longitud = struct.unpack('!H', await reader.readexactly(2))[0]
+        elif longitud == 127:
+            longitud = struct.unpack('!Q', await reader.readexactly(8))[0]
+        datos = await reader.readexactly(longitud)
+        if opcode == 0x8:
+            raise ConnectionError('El servidor cerró el WebSocket.')
+        if opcode in (0x1, 0x2):
+            return datos.decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de la API REST y de los WebSockets de chat sobre los datos de sembrar_datos. '
+        'Mide throughput, latencias p50/p95/p99 y consultas SQL por endpoint y emite JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Servidor ya en marcha (ej. http://127.0.0.1:8000). Si se omite, se arranca daphne.')
+        parser.add_argument('--puerto', type=int, default=8765, help='Puerto del daphne local.')
+        parser.add_argument('--concurrencia', type=int, default=8, help='Clientes HTTP simultáneos.')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por endpoint.')
+        parser.add_argument('--peticiones-token', type=int, default=20, help='Peticiones a /api/token/ (hash de contraseña costoso).')
+        parser.add_argument('--ws-sesiones', type=int, default=50, help='Sesiones de chat simultáneas.')
+        parser.add_argument('--ws-mensajes', type=int, default=20, help='Mensajes enviados por sesión.')
+        parser.add_argument('--password', default='benchmark', help='Contraseña de los usuarios bench_*.')
+        parser.add_argument('--salida', help='Archivo donde guardar el JSON (además de imprimirlo).')
+        parser.add_argument('--semilla', type=int, default=42)
+
+    def handle(self, *args, **options):
+        escenarios = self._escenarios(options)
+
+        servidor = None
+        if options['url']:
+            destino = urlsplit(options['url'])
+            host, puerto = destino.hostname, destino.port or 80
+        else:
+            host, puerto = '127.0.0.1', options['puerto']
+            servidor = self._arrancar_daphne(puerto)
+
+        try:
+            resultados = []
+            for escenario in escenarios:
+                consultas = self._contar_consultas(escenario)
+                resultados.append(self._cargar(host, puerto, escenario, options, consultas))
+                self.stderr.write(f"{escenario.nombre}: {resultados[-1]['rps']} rps")
+            if options['ws_sesiones']:
+                resultados.extend(asyncio.run(self._cargar_chat(host, puerto, options)))
+        finally:
+            if servidor is not None:
+                servidor.terminate()
+                servidor.wait(timeout=30)
+
+        informe = {
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_datos': connection.vendor,
+                'incidencias': Incidencia.objects.count(),
+                'usuarios': Usuario.objects.count(),
+            },
+            'parametros': {
+                clave: options[clave] for clave in (
+                    'concurrencia', 'peticiones', 'peticiones_token', 'ws_sesiones', 'ws_mensajes', 'semilla'
+                )
+            },
+            'resultados': resultados,
+        }
+        texto = json.dumps(informe, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        self.stdout.write(texto)
+
+    # --- Preparación ---
+
+    def _usuario(self, rol, **filtros):
+        usuario = Usuario.objects.filter(username__startswith='bench_', rol=rol, **filtros).order_by('id').first()
+        if usuario is None:
+            raise CommandError(f'No hay usuarios bench_* con rol {rol}: ejecuta antes "manage.py sembrar_datos".')
+        return usuario
+
+    def _token(self, usuario):
+        return str(MyTokenObtainPairSerializer.get_token(usuario).access_token)
+
+    def _escenarios(self, options):
+        admin = self._usuario('ADMINISTRADOR')
+        fontanero = self._usuario('FONTANERO', incidencias_asignadas__isnull=False)
+        agricultor = self._usuario('AGRICULTOR', incidencias_reportadas__isnull=False)
+        token_admin, token_fontanero, token_agricultor = (self._token(u) for u in (admin, fontanero, agricultor))
+
+        ids = list(Incidencia.objects.values_list('id', flat=True)[:5000])
+        self.ids_incidencias = ids
+        self.token_admin = token_admin
+
+        def incidencia(n):
+            return ids[n % len(ids)]
+
+        return [
+            Escenario('token', lambda n: '/api/token/', metodo='POST',
+                      cuerpo={'username': admin.username, 'password': options['password']},
+                      peticiones=options['peticiones_token']),
+            Escenario('incidencias_lista_admin', lambda n: '/api/incidencias/?page_size=25', token_admin),
+            Escenario('incidencias_lista_fontanero', lambda n: '/api/incidencias/?page_size=25', token_fontanero),
+            Escenario('incidencias_lista_agricultor', lambda n: '/api/incidencias/?page_size=25', token_agricultor),
+            Escenario('incidencias_detalle', lambda n: f'/api/incidencias/{incidencia(n)}/', token_admin),
+            Escenario('dashboard_admin', lambda n: '/api/dashboard-summary/', token_admin),
+            Escenario('dashboard_fontanero', lambda n: '/api/dashboard-summary/', token_fontanero),
+            Escenario('estadisticas', lambda n: '/api/estadisticas/', token_admin),
+            Escenario('notificaciones', lambda n: '/api/notificaciones/', token_agricultor),
+            Escenario('notificaciones_no_leidas', lambda n: '/api/notificaciones/no_leidas/', token_agricultor),
+            Escenario('chat_historial', lambda n: f'/api/incidencias/{incidencia(n)}/mensajes/?limit=50', token_admin),
+        ]
+
+    def _arrancar_daphne(self, puerto, **variables):
+        entorno = dict(os.environ, DJANGO_DEBUG='False', **variables)
+        proceso = subprocess.Popen(
+            [sys.executable, '-m', 'daphne', '-b', '127.0.0.1', '-p', str(puerto), 'backend.asgi:application'],
+            env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            try:
+                conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=1)
+                conexion.request('GET', '/api/salud/', headers=CABECERAS_BASE)
+                if conexion.getresponse().status == 200:
+                    return proceso
+            except OSError:
+                time.sleep(0.2)
+        proceso.kill()
+        raise CommandError(f'daphne no respondió en el puerto {puerto}.')
+
+    # --- Medición ---
+
+    def _contar_consultas(self, escenario):
+        """
+        Consultas SQL de una petición, ejecutada en este proceso con el cliente de pruebas.
+        """
+        cliente = Client()
+        cabeceras = {
+            'HTTP_HOST': 'localhost',
+            'HTTP_X_FORWARDED_PROTO': 'https',
+        }
+        if escenario.token:
+            cabeceras['HTTP_AUTHORIZATION'] = f'Bearer {escenario.token}'
+        with CaptureQueriesContext(connection) as consultas:
+            if escenario.metodo == 'POST':
+                cliente.post(escenario.ruta(0), escenario.cuerpo, content_type='application/json', **cabeceras)
+            else:
+                cliente.get(escenario.ruta(0), **cabeceras)
+        return len(consultas.captured_queries)
+
+    def _cargar(self, host, puerto, escenario, options, consultas):
+        total = escenario.peticiones or options['peticiones']
+        siguiente = iter(range(total))
+        candado = threading.Lock()
+        latencias = []
+        errores = [0]
+        cuerpo = json.dumps(escenario.cuerpo) if escenario.cuerpo is not None else None
+
+        def cliente():
+            # Una conexión keep-alive por cliente, como un navegador
+            conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+            propias = []
+            fallos = 0
+            while True:
+                with candado:
+                    numero = next(siguiente, None)
+                if numero is None:
+                    break
+                inicio = time.perf_counter()
+                try:
+                    conexion.request(escenario.metodo, escenario.ruta(numero), body=cuerpo, headers=escenario.cabeceras())
+                    respuesta = conexion.getresponse()
+                    respuesta.read()
+                    if respuesta.status >= 400:
+                        fallos += 1
+                        continue
+                except (OSError, http.client.HTTPException):
+                    fallos += 1
+                    conexion.close()
+                    conexion = http.client.HTTPConnection(host, puerto, timeout=60)
+                    continue
+                propias.append(time.perf_counter() - inicio)
+            conexion.close()
+            with candado:
+                latencias.extend(propias)
+                errores[0] += fallos
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as ejecutor:
+            for _ in range(options['concurrencia']):
+                ejecutor.submit(cliente)
+        return resumen(escenario.nombre, latencias, errores[0], time.perf_counter() - inicio, consultas)
+
+    async def _cargar_chat(self, host, puerto, options):
+        """
+        Sesiones de ws/chat/<id>/ simultáneas, de cinco en cinco por sala. Cada
+        sesión envía sus mensajes de uno en uno y mide hasta recibir su propio eco.
+        """
+        sesiones = options['ws_sesiones']
+        salas = self.ids_incidencias[:max(sesiones // 5, 1)]
+        conexiones, mensajes = [], []
+        errores = {'conexion': 0, 'mensajes': 0}
+
+        async def sesion(numero):
+            ruta = f'/ws/chat/{salas[numero % len(salas)]}/?token={self.token_admin}'
+            inicio = time.perf_counter()
+            try:
+                reader, writer = await ws_conectar(host, puerto, ruta)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                errores['conexion'] += 1
+                return
+            conexiones.append(time.perf_counter() - inicio)
+            try:
+                for indice in range(options['ws_mensajes']):
+                    texto = f'benchmark {numero}-{indice}'
+                    inicio = time.perf_counter()
+                    writer.write(ws_trama(json.dumps({'message': texto})))
+                    await writer.drain()
+                    # Llegan también los mensajes del resto de la sala
+                    while json.loads(await asyncio.wait_for(ws_leer(reader), 30)).get('message') != texto:
+                        pass
+                    mensajes.append(time.perf_counter() - inicio)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errores['mensajes'] += 1
+            finally:
+                writer.close()
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(sesion(numero) for numero in range(sesiones)))
+        segundos = time.perf_counter() - inicio
+        return [
+            resumen('ws_chat_conexion', conexiones, errores['conexion'], segundos),
+            resumen('ws_chat_mensaje', mensajes, errores['mensajes'], segundos),
+        ]
@@ -0,0 +1,120 @@
+# Archivo: core/management/commands/benchmark_channel_layer.py
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from channels.layers import InMemoryChannelLayer
+from django.core.management.base import BaseCommand
+
+from core.channel_layer import SQLiteChannelLayer
+
+
+GRUPO = 'benchmark'
+
+
+async def _recibir(layer, canal, total):
+    for _ in range(total):
+        await layer.receive(canal)
+
+
+async def _medir_en_proceso(layer, mensajes, receptores):
+    """
+    group_send de `mensajes` mensajes a `receptores` canales del mismo proceso.
+    Devuelve los segundos hasta que todos los receptores los han recibido.
+    """
+    canales = [await layer.new_channel() for _ in range(receptores)]
+    for canal in canales:
+        await layer.group_add(GRUPO, canal)
+    tareas = [asyncio.ensure_future(_recibir(layer, canal, mensajes)) for canal in canales]
+    await asyncio.sleep(0)
+
+    inicio = time.perf_counter()
+    for i in range(mensajes):
+        await layer.group_send(GRUPO, {'type': 'chat.message', 'n': i})
+    await asyncio.gather(*tareas)
+    return time.perf_counter() - inicio
+
+
+def _proceso_receptor(ruta, mensajes, receptores, listos, terminados):
+    async def main():
+        layer = SQLiteChannelLayer(ruta=ruta, capacity=mensajes + 1)
+        canales = [await layer.new_channel() for _ in range(receptores)]
+        for canal in canales:
+            await layer.group_add(GRUPO, canal)
+        tareas = [asyncio.ensure_future(_recibir(layer, canal, mensajes)) for canal in canales]
+        await asyncio.sleep(0)
+        listos.put(os.getpid())
+        await asyncio.gather(*tareas)
+        terminados.put(time.time())
+    asyncio.run(main())
+
+
+def _medir_multiproceso(ruta, mensajes, receptores, procesos):
+    """
+    Receptores repartidos en `procesos` procesos hijos; el padre hace los group_send.
+    """
+    contexto = multiprocessing.get_context('spawn')
+    listos, terminados = contexto.Queue(), contexto.Queue()
+    por_proceso = max(receptores // procesos, 1)
+    hijos = [
+        contexto.Process(target=_proceso_receptor, args=(ruta, mensajes, por_proceso, listos, terminados))
+        for _ in range(procesos)
+    ]
+    for hijo in hijos:
+        hijo.start()
+    for _ in hijos:
+        listos.get(timeout=60)
+
+    async def enviar():
+        layer = SQLiteChannelLayer(ruta=ruta, capacity=mensajes + 1)
+        for i in range(mensajes):
+            await layer.group_send(GRUPO, {'type': 'chat.message', 'n': i})
+
+    inicio = time.time()
+    asyncio.run(enviar())
+    fin = max(terminados.get(timeout=300) for _ in hijos)
+    for hijo in hijos:
+        hijo.join()
+    return fin - inicio, por_proceso * procesos
+
+
+class Command(BaseCommand):
+    help = 'Compara el throughput del channel layer SQLite multiproceso con InMemoryChannelLayer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mensajes', type=int, default=1000, help='Mensajes enviados al grupo.')
+        parser.add_argument('--receptores', type=int, default=10, help='Canales suscritos al grupo.')
+        parser.add_argument('--procesos', type=int, default=2, help='Procesos receptores para la prueba multiproceso (0 la omite).')
+
+    def handle(self, *args, **options):
+        mensajes = options['mensajes']
+        receptores = options['receptores']
+        resultados = []
+
+        def registrar(layer, segundos, canales):
+            entregas = mensajes * canales
+            resultados.append({
+                'layer': layer,
+                'mensajes': mensajes,
+                'receptores': canales,
+                'segundos': round(segundos, 3),
+                'entregas_por_segundo': round(entregas / segundos, 1),
+            })
+
+        memoria = InMemoryChannelLayer(capacity=mensajes + 1)
+        registrar('memoria', asyncio.run(_medir_en_proceso(memoria, mensajes, receptores)), receptores)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            sqlite = SQLiteChannelLayer(ruta=os.path.join(directorio, 'bench.sqlite3'), capacity=mensajes + 1)
+            registrar('sqlite', asyncio.run(_medir_en_proceso(sqlite, mensajes, receptores)), receptores)
+
+            if options['procesos']:
+                ruta = os.path.join(directorio, 'bench_multiproceso.sqlite3')
+                segundos, canales = _medir_multiproceso(ruta, mensajes, receptores, options['procesos'])
+                registrar(f"sqlite_{options['procesos']}_procesos", segundos, canales)
+
+        for resultado in resultados:
+            self.stdout.write(json.dumps(resultado))
@@ -0,0 +1,172 @@
+# Archivo: core/management/commands/benchmark_sqlite.py
+import json
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Esquema reducido de core_incidencia y core_mensajechat con sus índices
+ESQUEMA = """
+CREATE TABLE incidencia (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    estado TEXT NOT NULL,
+    fecha_actualizacion REAL NOT NULL
+);
+CREATE TABLE mensaje (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    incidencia_id INTEGER NOT NULL,
+    autor_id INTEGER NOT NULL,
+    contenido TEXT NOT NULL,
+    fecha_envio REAL NOT NULL
+);
+CREATE INDEX mensaje_incidencia_fecha ON mensaje (incidencia_id, fecha_envio, id);
+"""
+INCIDENCIAS = 200
+
+# produccion_por_peticion: los pragmas de producción con una conexión nueva por operación, como
+# las peticiones REST servidas por daphne (ver cerrar_conexiones_asgi en core/apps.py);
+# produccion: la conexión persistente que aprovechan WSGI y los hilos de EjecutorDB.
+PERFILES = ('basico', 'produccion_por_peticion', 'produccion')
+
+
+def _conectar(ruta, perfil):
+    if perfil != 'basico':
+        conexion = sqlite3.connect(ruta, timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        for pragma in settings.SQLITE_PRAGMAS_PRODUCCION:
+            conexion.execute(pragma)
+    else:
+        # Valores por defecto de Django: journal en modo rollback y transacciones DEFERRED
+        conexion = sqlite3.connect(ruta, timeout=5, isolation_level=None)
+    return conexion
+
+
+def _transaccion(conexion, perfil, operaciones):
+    conexion.execute('BEGIN' if perfil == 'basico' else 'BEGIN IMMEDIATE')
+    try:
+        operaciones(conexion)
+        conexion.execute('COMMIT')
+    except BaseException:
+        conexion.execute('ROLLBACK')
+        raise
+
+
+def _mensaje(numero):
+    def operaciones(conexion):
+        conexion.execute(
+            'INSERT INTO mensaje (incidencia_id, autor_id, contenido, fecha_envio) VALUES (?, ?, ?, ?)',
+            (numero % INCIDENCIAS + 1, 1, f'mensaje {numero}', time.time())
+        )
+    return operaciones
+
+
+def _cambio_estado(numero):
+    # Como update_status: lee la incidencia y la actualiza en la misma transacción
+    def operaciones(conexion):
+        incidencia_id = numero % INCIDENCIAS + 1
+        conexion.execute('SELECT estado FROM incidencia WHERE id = ?', (incidencia_id,)).fetchone()
+        conexion.execute(
+            'UPDATE incidencia SET estado = ?, fecha_actualizacion = ? WHERE id = ?',
+            (('PENDIENTE', 'EN_PROCESO', 'RESUELTO')[numero % 3], time.time(), incidencia_id)
+        )
+    return operaciones
+
+
+def _lectura(numero):
+    def operaciones(conexion):
+        conexion.execute(
+            'SELECT id, contenido FROM mensaje WHERE incidencia_id = ? ORDER BY fecha_envio DESC, id DESC LIMIT 50',
+            (numero % INCIDENCIAS + 1,)
+        ).fetchall()
+    return operaciones
+
+
+TIPOS = {'chat': _mensaje, 'estado': _cambio_estado, 'lectura': _lectura}
+
+
+def _trabajador(ruta, perfil, tipo, segundos, resultados):
+    """
+    Repite un tipo de operación durante `segundos`. Solo el perfil de producción
+    reutiliza su conexión; los demás abren una por operación.
+    """
+    ok = bloqueos = 0
+    conexion = _conectar(ruta, perfil) if perfil == 'produccion' else None
+    fin = time.time() + segundos
+    numero = os.getpid()
+    while time.time() < fin:
+        numero += 1
+        actual = conexion or _conectar(ruta, perfil)
+        try:
+            if tipo == 'lectura':
+                _lectura(numero)(actual)
+            else:
+                _transaccion(actual, perfil, TIPOS[tipo](numero))
+            ok += 1
+        except sqlite3.OperationalError as error:
+            if 'locked' not in str(error) and 'busy' not in str(error):
+                raise
+            bloqueos += 1
+        finally:
+            if conexion is None:
+                actual.close()
+    resultados.put((tipo, ok, bloqueos))
+
+
+def _medir(ruta, perfil, trabajadores, segundos):
+    conexion = _conectar(ruta, perfil)
+    conexion.executescript(ESQUEMA)
+    conexion.executemany(
+        'INSERT INTO incidencia (estado, fecha_actualizacion) VALUES (?, ?)',
+        [('PENDIENTE', time.time())] * INCIDENCIAS
+    )
+    conexion.close()
+
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    procesos = [
+        contexto.Process(target=_trabajador, args=(ruta, perfil, tipo, segundos, resultados))
+        for tipo, cantidad in trabajadores.items() for _ in range(cantidad)
+    ]
+    for proceso in procesos:
+        proceso.start()
+    totales = {tipo: {'ok': 0, 'bloqueos': 0} for tipo in trabajadores}
+    for _ in procesos:
+        tipo, ok, bloqueos = resultados.get(timeout=segundos + 120)
+        totales[tipo]['ok'] += ok
+        totales[tipo]['bloqueos'] += bloqueos
+    for proceso in procesos:
+        proceso.join()
+    return totales
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el throughput concurrente de SQLite con la configuración por defecto, con el '
+        'perfil de producción (WAL, pragmas, IMMEDIATE) abriendo una conexión por petición como '
+        'en las peticiones REST servidas por daphne, y con el perfil de producción y conexiones persistentes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=5, help='Duración de cada medición.')
+        parser.add_argument('--chat', type=int, default=4, help='Procesos insertando mensajes de chat.')
+        parser.add_argument('--estado', type=int, default=2, help='Procesos cambiando el estado de incidencias.')
+        parser.add_argument('--lectura', type=int, default=4, help='Procesos leyendo historiales de chat.')
+
+    def handle(self, *args, **options):
+        trabajadores = {tipo: options[tipo] for tipo in TIPOS if options[tipo]}
+        with tempfile.TemporaryDirectory() as directorio:
+            for perfil in PERFILES:
+                ruta = os.path.join(directorio, f'{perfil}.sqlite3')
+                totales = _medir(ruta, perfil, trabajadores, options['segundos'])
+                for tipo, total in totales.items():
+                    self.stdout.write(json.dumps({
+                        'perfil': perfil,
+                        'operacion': tipo,
+                        'procesos': trabajadores[tipo],
+                        'operaciones_por_segundo': round(total['ok'] / options['segundos'], 1),
+                        'bloqueos': total['bloqueos'],
+                    }))
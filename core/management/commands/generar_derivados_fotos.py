@@ -0,0 +1,35 @@
+# Archivo: core/management/commands/generar_derivados_fotos.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core import fotos
+from core.models import Incidencia
+
+
+class Command(BaseCommand):
+    help = 'Genera la miniatura y la versión de detalle de las fotos de incidencias que aún no las tienen.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help='Regenera los derivados de todas las fotos, aunque ya existan.')
+
+    def handle(self, *args, **options):
+        incidencias = Incidencia.objects.exclude(foto='')
+        if not options['todas']:
+            incidencias = incidencias.filter(
+                Q(foto_miniatura__isnull=True) | Q(foto_miniatura='') |
+                Q(foto_detalle__isnull=True) | Q(foto_detalle='')
+            )
+
+        procesadas = fallidas = 0
+        for incidencia_id, foto in incidencias.order_by('id').values_list('id', 'foto').iterator():
+            try:
+                fotos.procesar(incidencia_id, foto)
+                procesadas += 1
+            except Exception as error:
+                fallidas += 1
+                self.stderr.write(f'Incidencia #{incidencia_id}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivados generados: {procesadas} incidencias, {fallidas} con error.'
+        ))
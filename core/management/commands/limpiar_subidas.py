@@ -0,0 +1,12 @@
+# Archivo: core/management/commands/limpiar_subidas.py
+from django.core.management.base import BaseCommand
+
+from core import subidas
+
+
+class Command(BaseCommand):
+    help = 'Borra las subidas de fotos por partes abandonadas (más antiguas que SUBIDAS_EXPIRACION_HORAS).'
+
+    def handle(self, *args, **options):
+        borradas = subidas.limpiar_abandonadas()
+        self.stdout.write(self.style.SUCCESS(f'Subidas abandonadas eliminadas: {borradas}.'))
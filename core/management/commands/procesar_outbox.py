@@ -0,0 +1,63 @@
+# Archivo: core/management/commands/procesar_outbox.py
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import outbox
+
+# Vueltas del bucle entre dos purgas de eventos procesados
+VUELTAS_POR_PURGA = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker del outbox (core/outbox.py): ejecuta por lotes los efectos secundarios encolados por '
+        'las vistas, con reintentos y espera exponencial. SIGTERM termina tras el lote en curso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=settings.OUTBOX_LOTE, help='Eventos por transacción.')
+        parser.add_argument('--intervalo-ms', type=int, default=settings.OUTBOX_INTERVALO_MS,
+                            help='Espera entre sondeos cuando no hay eventos pendientes.')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los eventos pendientes que ya tocan y termina.')
+
+    def handle(self, *args, **options):
+        self.parar = False
+        if not options['una_vez']:
+            signal.signal(signal.SIGTERM, self._al_parar)
+            signal.signal(signal.SIGINT, self._al_parar)
+
+        total_procesados = total_fallidos = 0
+        vueltas = 0
+        while not self.parar:
+            # Como al final de cada petición: descarta conexiones caducadas o rotas
+            close_old_connections()
+            procesados, fallidos = outbox.procesar_lote(options['lote'])
+            total_procesados += procesados
+            total_fallidos += fallidos
+            if procesados or fallidos:
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{procesados} eventos procesados, {fallidos} fallidos')
+            elif options['una_vez']:
+                break
+            else:
+                self._dormir(options['intervalo_ms'] / 1000)
+
+            vueltas += 1
+            if vueltas % VUELTAS_POR_PURGA == 0:
+                outbox.purgar()
+
+        self.stdout.write(f'Outbox: {total_procesados} eventos procesados, {total_fallidos} intentos fallidos.')
+
+    def _al_parar(self, signum, frame):
+        self.parar = True
+
+    def _dormir(self, segundos):
+        # En tramos cortos para atender SIGTERM sin esperar el intervalo entero
+        limite = time.monotonic() + segundos
+        while not self.parar and time.monotonic() < limite:
+            time.sleep(min(0.1, segundos))
@@ -0,0 +1,12 @@
+# Archivo: core/management/commands/reconstruir_busqueda.py
+from django.core.management.base import BaseCommand
+
+from core import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Regenera desde cero el índice de búsqueda de texto completo (FTS5) de incidencias y mensajes.'
+
+    def handle(self, *args, **options):
+        filas = busqueda.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f'Índice de búsqueda reconstruido: {filas} textos indexados.'))
@@ -0,0 +1,14 @@
+# Archivo: core/management/commands/reconstruir_estadisticas.py
+from django.core.management.base import BaseCommand
+
+from core import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Recalcula desde cero los rollups de estadísticas a partir de las incidencias.'
+
+    def handle(self, *args, **options):
+        filas_estado, filas_resolucion = estadisticas.reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rollups reconstruidos: {filas_estado} filas por estado, {filas_resolucion} filas de resolución.'
+        ))
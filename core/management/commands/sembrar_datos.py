@@ -0,0 +1,171 @@
+# Archivo: core/management/commands/sembrar_datos.py
+import io
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from core import estadisticas, geo, mapa
+from core.models import Usuario, Incidencia, MensajeChat, Notificacion
+
+PREFIJO = 'bench_'
+FOTO = 'incidencias_fotos/benchmark.jpg'
+# Guatemala, aproximadamente
+LATITUDES = (13.8, 17.8)
+LONGITUDES = (-92.2, -88.2)
+LOTE = 2000
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un conjunto de datos realista para pruebas de carga: usuarios bench_*, '
+        'incidencias repartidas por zonas, mensajes de chat y notificaciones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=1000)
+        parser.add_argument('--incidencias', type=int, default=10000)
+        parser.add_argument('--mensajes', type=int, default=100000)
+        parser.add_argument('--notificaciones', type=int, default=20000)
+        parser.add_argument('--dias', type=int, default=365, help='Antigüedad máxima de las incidencias.')
+        parser.add_argument('--password', default='benchmark', help='Contraseña de todos los usuarios bench_*.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--limpiar', action='store_true', help='Borra antes los datos bench_* existentes.')
+
+    def handle(self, *args, **options):
+        aleatorio = random.Random(options['semilla'])
+        with transaction.atomic():
+            if options['limpiar']:
+                borrados, _ = Usuario.objects.filter(username__startswith=PREFIJO).delete()
+                self.stdout.write(f'Eliminados {borrados} registros bench_* previos.')
+
+            admins, fontaneros, agricultores = self._usuarios(options)
+            incidencias = self._incidencias(aleatorio, options, fontaneros, agricultores)
+            mensajes = self._mensajes(aleatorio, options, incidencias, admins)
+            notificaciones = self._notificaciones(aleatorio, options, incidencias)
+            estadisticas.reconstruir()
+        mapa.invalidar()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Sembrados {len(admins) + len(fontaneros) + len(agricultores)} usuarios, {len(incidencias)} incidencias, '
+            f'{mensajes} mensajes y {notificaciones} notificaciones. '
+            f"Usuarios {PREFIJO}<rol>_<n> con contraseña '{options['password']}'."
+        ))
+
+    def _foto(self):
+        if not default_storage.exists(FOTO):
+            salida = io.BytesIO()
+            Image.new('RGB', (640, 480), (40, 120, 60)).save(salida, format='JPEG')
+            default_storage.save(FOTO, ContentFile(salida.getvalue()))
+        return FOTO
+
+    def _usuarios(self, options):
+        total = max(options['usuarios'], 3)
+        # Un 1 % de administradores y un 10 % de fontaneros, al menos uno de cada
+        num_admins = max(total // 100, 1)
+        num_fontaneros = max(total // 10, 1)
+        password = make_password(options['password'])
+        inicio = Usuario.objects.filter(username__startswith=PREFIJO).count()
+
+        usuarios = []
+        for i in range(total):
+            numero = inicio + i
+            if i < num_admins:
+                usuarios.append(Usuario(username=f'{PREFIJO}admin_{numero}', rol='ADMINISTRADOR', is_staff=True, password=password))
+            elif i < num_admins + num_fontaneros:
+                usuarios.append(Usuario(username=f'{PREFIJO}fontanero_{numero}', rol='FONTANERO', password=password))
+            else:
+                usuarios.append(Usuario(username=f'{PREFIJO}agricultor_{numero}', rol='AGRICULTOR', password=password))
+        # En SQLite bulk_create devuelve los ids de las filas creadas
+        Usuario.objects.bulk_create(usuarios, batch_size=LOTE)
+        return (
+            [u for u in usuarios if u.rol == 'ADMINISTRADOR'],
+            [u for u in usuarios if u.rol == 'FONTANERO'],
+            [u for u in usuarios if u.rol == 'AGRICULTOR'],
+        )
+
+    def _incidencias(self, aleatorio, options, fontaneros, agricultores):
+        foto = self._foto()
+        ahora = timezone.now()
+        # Las incidencias se concentran alrededor de unas cuantas zonas de riego
+        zonas = [(aleatorio.uniform(*LATITUDES), aleatorio.uniform(*LONGITUDES)) for _ in range(50)]
+        estados = [Incidencia.Estado.PENDIENTE, Incidencia.Estado.EN_PROCESO, Incidencia.Estado.RESUELTO]
+
+        incidencias = []
+        fechas = []
+        for _ in range(options['incidencias']):
+            centro_lat, centro_lng = aleatorio.choice(zonas)
+            latitud = round(aleatorio.gauss(centro_lat, 0.05), 7)
+            longitud = round(aleatorio.gauss(centro_lng, 0.05), 7)
+            estado = aleatorio.choices(estados, weights=(40, 30, 30))[0]
+            creada = ahora - timedelta(seconds=aleatorio.uniform(0, options['dias'] * 86400))
+            resuelta = None
+            if estado == Incidencia.Estado.RESUELTO:
+                resuelta = min(creada + timedelta(hours=aleatorio.expovariate(1 / 48)), ahora)
+            incidencias.append(Incidencia(
+                descripcion=f'Incidencia de prueba en la zona ({centro_lat:.2f}, {centro_lng:.2f})',
+                foto=foto,
+                latitud=latitud,
+                longitud=longitud,
+                geohash=geo.codificar(latitud, longitud),
+                estado=estado,
+                solucion='Reparación de prueba' if resuelta else None,
+                fecha_resolucion=resuelta,
+                agricultor_reporta=aleatorio.choice(agricultores),
+                fontanero_asignado=aleatorio.choice(fontaneros) if estado != Incidencia.Estado.PENDIENTE else None,
+            ))
+            fechas.append((creada, resuelta or creada))
+
+        Incidencia.objects.bulk_create(incidencias, batch_size=LOTE)
+        # bulk_create aplica auto_now_add/auto_now: las fechas repartidas se fijan con bulk_update
+        for incidencia, (creada, actualizada) in zip(incidencias, fechas):
+            incidencia.fecha_creacion, incidencia.fecha_actualizacion = creada, actualizada
+        Incidencia.objects.bulk_update(incidencias, ['fecha_creacion', 'fecha_actualizacion'], batch_size=500)
+        return incidencias
+
+    def _mensajes(self, aleatorio, options, incidencias, admins):
+        if not incidencias:
+            return 0
+        # Pocas incidencias concentran la mayor parte de la conversación
+        pesos = [1 / (posicion + 1) for posicion in range(len(incidencias))]
+        orden = incidencias[:]
+        aleatorio.shuffle(orden)
+        elegidas = aleatorio.choices(orden, weights=pesos, k=options['mensajes'])
+
+        lote = []
+        for numero, incidencia in enumerate(elegidas):
+            autores = [incidencia.agricultor_reporta_id, incidencia.fontanero_asignado_id, aleatorio.choice(admins).id]
+            lote.append(MensajeChat(
+                incidencia_id=incidencia.id,
+                autor_id=aleatorio.choice([autor for autor in autores if autor]),
+                contenido=f'Mensaje de prueba {numero}',
+            ))
+            if len(lote) >= LOTE:
+                MensajeChat.objects.bulk_create(lote)
+                lote = []
+        MensajeChat.objects.bulk_create(lote)
+        return len(elegidas)
+
+    def _notificaciones(self, aleatorio, options, incidencias):
+        if not incidencias:
+            return 0
+        lote = []
+        for _ in range(options['notificaciones']):
+            incidencia = aleatorio.choice(incidencias)
+            lote.append(Notificacion(
+                destinatario_id=incidencia.agricultor_reporta_id,
+                mensaje=f'El estado de tu incidencia #{incidencia.id} ha sido actualizado a {incidencia.estado}.',
+                leida=aleatorio.random() < 0.7,
+                incidencia_id=incidencia.id,
+            ))
+            if len(lote) >= LOTE:
+                Notificacion.objects.bulk_create(lote)
+                lote = []
+        Notificacion.objects.bulk_create(lote)
+        return options['notificaciones']
@@ -0,0 +1,190 @@
+# Archivo: core/management/commands/servir.py
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Worker:
+    """
+    Un proceso daphne que acepta conexiones del socket compartido y expone
+    /api/salud/ en su propio puerto privado de 127.0.0.1.
+    """
+    def __init__(self, numero, puerto_salud, proceso):
+        self.numero = numero
+        self.puerto_salud = puerto_salud
+        self.proceso = proceso
+        self.inicio = time.monotonic()
+        self.fallos_salud = 0
+
+    def sano(self, timeout=2):
+        peticion = urllib.request.Request(
+            f'http://127.0.0.1:{self.puerto_salud}/api/salud/',
+            # Host permitido por ALLOWED_HOSTS y cabecera del proxy para evitar la redirección a HTTPS
+            headers={'Host': 'localhost', 'X-Forwarded-Proto': 'https'}
+        )
+        try:
+            with urllib.request.urlopen(peticion, timeout=timeout) as respuesta:
+                return respuesta.status == 200
+        except Exception:
+            return False
+
+
+class Command(BaseCommand):
+    help = (
+        'Sirve backend.asgi con N workers daphne sobre un mismo puerto, más el worker del outbox '
+        '(procesar_outbox). SIGHUP reinicia los workers de uno en uno sin cortar el servicio; SIGTERM los detiene.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=int(os.environ.get('WEB_CONCURRENCY', '0')),
+                            help='Número de workers (por defecto WEB_CONCURRENCY o el número de CPUs).')
+        parser.add_argument('--bind', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument('--puerto-salud', type=int, default=int(os.environ.get('SALUD_PUERTO_BASE', '8100')),
+                            help='Primer puerto privado para /api/salud/ de cada worker.')
+        parser.add_argument('--timeout-parada', type=float, default=30,
+                            help='Segundos para que un worker cierre sus conexiones antes de matarlo.')
+        parser.add_argument('--intervalo-salud', type=float, default=10,
+                            help='Segundos entre comprobaciones de salud (0 las desactiva).')
+        parser.add_argument('--sin-outbox', action='store_true',
+                            help='No lanza el worker del outbox (por ejemplo, si corre en otro contenedor).')
+
+    def handle(self, *args, **options):
+        self.opciones = options
+        num_workers = options['workers'] or os.cpu_count() or 1
+
+        # Socket compartido: se crea una vez y lo heredan todos los workers
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((options['bind'], options['port']))
+        self.socket.listen(1024)
+        self.socket.set_inheritable(True)
+
+        # Varios procesos necesitan un channel layer y una caché compartidos entre ellos;
+        # el worker del outbox también envía notificaciones por WebSocket desde su proceso
+        self.entorno = os.environ.copy()
+        if num_workers > 1 or not options['sin_outbox']:
+            self.entorno.setdefault('CHANNEL_LAYER', 'sqlite')
+            self.entorno.setdefault('CACHE', 'archivo')
+
+        self.parar = False
+        self.reiniciar = False
+        signal.signal(signal.SIGTERM, self._al_parar)
+        signal.signal(signal.SIGINT, self._al_parar)
+        signal.signal(signal.SIGHUP, self._al_reiniciar)
+
+        self.workers = [self._lanzar(numero) for numero in range(num_workers)]
+        self.outbox = None if options['sin_outbox'] else self._lanzar_outbox()
+        self.stdout.write(f"Sirviendo en {options['bind']}:{options['port']} con {num_workers} workers.")
+
+        ultima_comprobacion = time.monotonic()
+        while not self.parar:
+            time.sleep(0.5)
+            if self.reiniciar:
+                self.reiniciar = False
+                self._reinicio_gradual()
+            self._reemplazar_caidos()
+            if options['intervalo_salud'] and time.monotonic() - ultima_comprobacion >= options['intervalo_salud']:
+                ultima_comprobacion = time.monotonic()
+                self._comprobar_salud()
+
+        self.stdout.write('Deteniendo workers...')
+        procesos = [worker.proceso for worker in self.workers] + ([self.outbox] if self.outbox else [])
+        for proceso in procesos:
+            if proceso.poll() is None:
+                proceso.send_signal(signal.SIGTERM)
+        for proceso in procesos:
+            self._esperar_proceso(proceso)
+
+    def _al_parar(self, signum, frame):
+        self.parar = True
+
+    def _al_reiniciar(self, signum, frame):
+        self.reiniciar = True
+
+    def _lanzar(self, numero):
+        puerto_salud = self.opciones['puerto_salud'] + numero
+        entorno = dict(self.entorno, WORKER_ID=str(numero))
+        proceso = subprocess.Popen(
+            [
+                sys.executable, '-m', 'daphne',
+                '--fd', str(self.socket.fileno()),
+                '-e', f'tcp:port={puerto_salud}:interface=127.0.0.1',
+                'backend.asgi:application',
+            ],
+            env=entorno,
+            pass_fds=(self.socket.fileno(),),
+        )
+        return Worker(numero, puerto_salud, proceso)
+
+    def _lanzar_outbox(self):
+        return subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'procesar_outbox'],
+            env=dict(self.entorno, WORKER_ID='outbox'),
+        )
+
+    def _detener(self, worker, esperar=True):
+        if worker.proceso.poll() is None:
+            worker.proceso.send_signal(signal.SIGTERM)
+        if esperar:
+            self._esperar(worker)
+
+    def _esperar(self, worker):
+        self._esperar_proceso(worker.proceso)
+
+    def _esperar_proceso(self, proceso):
+        try:
+            proceso.wait(timeout=self.opciones['timeout_parada'])
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            proceso.wait()
+
+    def _reemplazar_caidos(self):
+        for indice, worker in enumerate(self.workers):
+            codigo = worker.proceso.poll()
+            if codigo is not None and not self.parar:
+                self.stderr.write(f'Worker {worker.numero} terminó con código {codigo}; relanzando.')
+                self.workers[indice] = self._lanzar(worker.numero)
+        if self.outbox and self.outbox.poll() is not None and not self.parar:
+            self.stderr.write(f'El worker del outbox terminó con código {self.outbox.returncode}; relanzando.')
+            self.outbox = self._lanzar_outbox()
+
+    def _comprobar_salud(self):
+        for indice, worker in enumerate(self.workers):
+            # Se da margen de arranque antes de exigir que responda
+            if time.monotonic() - worker.inicio < self.opciones['intervalo_salud']:
+                continue
+            if worker.sano():
+                worker.fallos_salud = 0
+                continue
+            worker.fallos_salud += 1
+            if worker.fallos_salud >= 3:
+                self.stderr.write(f'Worker {worker.numero} no responde a /api/salud/; reiniciando.')
+                self._detener(worker)
+                self.workers[indice] = self._lanzar(worker.numero)
+
+    def _reinicio_gradual(self):
+        """
+        Reinicia los workers de uno en uno: el resto sigue aceptando conexiones
+        del socket compartido mientras el reemplazo arranca.
+        """
+        self.stdout.write('Reinicio gradual de workers...')
+        for indice, worker in enumerate(self.workers):
+            self._detener(worker)
+            nuevo = self._lanzar(worker.numero)
+            self.workers[indice] = nuevo
+            limite = time.monotonic() + 60
+            while not nuevo.sano(timeout=1) and time.monotonic() < limite and not self.parar:
+                time.sleep(0.5)
+        # El worker del outbox no atiende peticiones: basta con relanzarlo
+        if self.outbox:
+            self.outbox.send_signal(signal.SIGTERM)
+            self._esperar_proceso(self.outbox)
+            self.outbox = self._lanzar_outbox()
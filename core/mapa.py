@@ -0,0 +1,158 @@
+# Archivo: core/mapa.py
+"""
+Clusters de incidencias para los mapas.
+
+Las incidencias se agregan en SQL sobre una rejilla alineada con las teselas
+del mapa (Web Mercator): cada tesela z/x/y se divide en CELDAS_POR_LADO x
+CELDAS_POR_LADO celdas y cada celda con incidencias es un cluster con su
+total, centroide y desglose por estado. Los clusters se guardan en caché por
+tesela y alcance (rol) bajo una versión que cambia con cada alta, cambio o
+baja de una incidencia.
+"""
+import math
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Q
+from django.db.models.functions import Cos, Floor, Ln, Radians, Tan
+
+from . import geo
+
+# 2^3 = 8 celdas por lado: clusters de unos 32 px en teselas de 256 px
+BITS_CELDA = 3
+CELDAS_POR_LADO = 2 ** BITS_CELDA
+ZOOM_MAX = 20
+MAX_TESELAS = 64
+# Latitud máxima representable en Web Mercator
+LATITUD_MAX = 85.05112878
+
+CLAVE_VERSION = 'mapa:version'
+
+
+def version():
+    valor = cache.get(CLAVE_VERSION)
+    if valor is None:
+        valor = uuid.uuid4().hex
+        cache.add(CLAVE_VERSION, valor, None)
+        valor = cache.get(CLAVE_VERSION, valor)
+    return valor
+
+
+def invalidar():
+    """
+    Cambia la versión de las teselas: las anteriores dejan de leerse y caducan solas.
+    Un valor nuevo (y no un contador) evita carreras entre procesos al invalidar.
+    """
+    cache.set(CLAVE_VERSION, uuid.uuid4().hex, None)
+
+
+def al_cambiar_incidencia(sender, **kwargs):
+    # Tras el commit, para que nadie cachee datos anteriores con la versión nueva
+    transaction.on_commit(invalidar)
+
+
+def _x_tesela(longitud, zoom):
+    return (longitud + 180.0) / 360.0 * 2 ** zoom
+
+
+def _y_tesela(latitud, zoom):
+    latitud = math.radians(max(min(latitud, LATITUD_MAX), -LATITUD_MAX))
+    return (1.0 - math.log(math.tan(latitud) + 1.0 / math.cos(latitud)) / math.pi) / 2.0 * 2 ** zoom
+
+
+def _longitud(x, zoom):
+    return x / 2 ** zoom * 360.0 - 180.0
+
+
+def _latitud(y, zoom):
+    return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * y / 2 ** zoom))))
+
+
+def teselas(min_lat, min_lng, max_lat, max_lng, zoom):
+    """
+    Teselas (x, y) que cubren el rectángulo en el zoom dado.
+    """
+    limite = 2 ** zoom - 1
+    x1, x2 = (min(int(_x_tesela(lng, zoom)), limite) for lng in (min_lng, max_lng))
+    # En Web Mercator la y crece hacia el sur
+    y1, y2 = (min(int(_y_tesela(lat, zoom)), limite) for lat in (max_lat, min_lat))
+    return [(x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1)]
+
+
+def _limites(teselas_, zoom):
+    xs = [x for x, _ in teselas_]
+    ys = [y for _, y in teselas_]
+    return (
+        _latitud(max(ys) + 1, zoom), _longitud(min(xs), zoom),
+        _latitud(min(ys), zoom), _longitud(max(xs) + 1, zoom),
+    )
+
+
+def _agregar(queryset, teselas_, zoom):
+    """
+    Una consulta: agrupa las incidencias del área de las teselas por celda de la rejilla.
+    """
+    from .models import Incidencia
+
+    celdas = 2 ** (zoom + BITS_CELDA)
+    min_lat, min_lng, max_lat, max_lng = _limites(teselas_, zoom)
+    latitud = Radians('latitud', output_field=FloatField())
+    celda_x = Floor((F('longitud') + 180.0) / 360.0 * celdas, output_field=FloatField())
+    celda_y = Floor(
+        (1.0 - Ln(Tan(latitud) + 1.0 / Cos(latitud)) / math.pi) / 2.0 * celdas,
+        output_field=FloatField()
+    )
+    por_estado = {
+        f'total_{estado}': Count('id', filter=Q(estado=estado)) for estado in Incidencia.Estado.values
+    }
+    filas = (
+        queryset.filter(
+            geo.q_celdas(geo.celdas(min_lat, min_lng, max_lat, max_lng)),
+            latitud__gte=max(min_lat, -LATITUD_MAX), latitud__lte=min(max_lat, LATITUD_MAX),
+            longitud__gte=min_lng, longitud__lte=max_lng,
+        )
+        .order_by()
+        .annotate(celda_x=celda_x, celda_y=celda_y)
+        .values('celda_x', 'celda_y')
+        .annotate(total=Count('id'), centro_lat=Avg('latitud'), centro_lng=Avg('longitud'), **por_estado)
+    )
+
+    resultado = {tesela: [] for tesela in teselas_}
+    for fila in filas:
+        tesela = (int(fila['celda_x']) >> BITS_CELDA, int(fila['celda_y']) >> BITS_CELDA)
+        if tesela not in resultado:
+            continue
+        resultado[tesela].append({
+            'total': fila['total'],
+            'latitud': round(float(fila['centro_lat']), 7),
+            'longitud': round(float(fila['centro_lng']), 7),
+            'por_estado': {estado: fila[f'total_{estado}'] for estado in Incidencia.Estado.values},
+        })
+    return resultado
+
+
+def clusters(queryset, alcance, min_lat, min_lng, max_lat, max_lng, zoom):
+    """
+    Clusters del rectángulo en el zoom dado. `queryset` ya viene acotado por el
+    rol del usuario y `alcance` identifica ese acotamiento en la caché.
+    Devuelve (clusters, teselas servidas desde la caché).
+    """
+    teselas_ = teselas(min_lat, min_lng, max_lat, max_lng, zoom)
+    if len(teselas_) > MAX_TESELAS:
+        raise ValueError(f'El área cubre más de {MAX_TESELAS} teselas en el zoom {zoom}.')
+
+    prefijo = f'mapa:{version()}:{alcance}:{zoom}'
+    claves = {tesela: f'{prefijo}:{tesela[0]}:{tesela[1]}' for tesela in teselas_}
+    en_cache = cache.get_many(claves.values())
+    faltan = [tesela for tesela, clave in claves.items() if clave not in en_cache]
+
+    calculadas = _agregar(queryset, faltan, zoom) if faltan else {}
+    if calculadas:
+        cache.set_many({claves[tesela]: grupos for tesela, grupos in calculadas.items()}, settings.MAPA_CACHE_SEGUNDOS)
+
+    resultado = []
+    for tesela, clave in claves.items():
+        resultado.extend(en_cache[clave] if clave in en_cache else calculadas[tesela])
+    return resultado, len(teselas_) - len(faltan)
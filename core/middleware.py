@@ -1,12 +1,12 @@
 # Archivo: core/middleware.py
 
 from urllib.parse import parse_qs
-from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.tokens import AccessToken
 from django.contrib.auth.models import AnonymousUser
+from .ejecutor_db import db_async
 
-@database_sync_to_async
+@db_async
 def get_user(token_key):
     try:
         token = AccessToken(token_key)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_incidencia_solucion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['agricultor_reporta', 'fecha_creacion'], name='inc_agricultor_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['fontanero_asignado', 'fecha_creacion'], name='inc_fontanero_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['estado', 'fecha_creacion'], name='inc_estado_fecha_idx'),
+        ),
+    ]
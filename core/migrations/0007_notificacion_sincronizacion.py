@@ -0,0 +1,28 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_incidencia_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'leida', 'fecha_creacion'], name='notif_dest_leida_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['destinatario', 'fecha_actualizacion'], name='notif_dest_actualiz_idx'),
+        ),
+    ]
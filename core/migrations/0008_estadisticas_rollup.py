@@ -0,0 +1,80 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:23
+
+import django.db.models.deletion
+from django.conf import settings
+from collections import Counter
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def poblar_estadisticas(apps, schema_editor):
+    """
+    Rellena fecha_resolucion de las incidencias ya resueltas y construye los
+    rollups iniciales a partir del histórico.
+    """
+    Incidencia = apps.get_model('core', 'Incidencia')
+    EstadisticaEstadoDiaria = apps.get_model('core', 'EstadisticaEstadoDiaria')
+    EstadisticaResolucionDiaria = apps.get_model('core', 'EstadisticaResolucionDiaria')
+
+    Incidencia.objects.filter(estado='RESUELTO').update(fecha_resolucion=models.F('fecha_actualizacion'))
+
+    por_estado = Counter()
+    resueltas = Counter()
+    segundos = Counter()
+    filas = Incidencia.objects.values_list('fecha_creacion', 'estado', 'fecha_resolucion', 'fontanero_asignado_id')
+    for fecha_creacion, estado, fecha_resolucion, fontanero_id in filas.iterator():
+        por_estado[(timezone.localdate(fecha_creacion), estado)] += 1
+        if estado == 'RESUELTO':
+            clave = (timezone.localdate(fecha_resolucion), fontanero_id)
+            resueltas[clave] += 1
+            segundos[clave] += int((fecha_resolucion - fecha_creacion).total_seconds())
+
+    EstadisticaEstadoDiaria.objects.bulk_create([
+        EstadisticaEstadoDiaria(fecha=fecha, estado=estado, total=total)
+        for (fecha, estado), total in por_estado.items()
+    ])
+    EstadisticaResolucionDiaria.objects.bulk_create([
+        EstadisticaResolucionDiaria(fecha=fecha, fontanero_id=fontanero_id, resueltas=total, segundos_resolucion=segundos[(fecha, fontanero_id)])
+        for (fecha, fontanero_id), total in resueltas.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_notificacion_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidencia',
+            name='fecha_resolucion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EstadisticaEstadoDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('RESUELTO', 'Resuelto')], max_length=50)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'estado'), name='estadistica_estado_unica')],
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadisticaResolucionDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('resueltas', models.IntegerField(default=0)),
+                ('segundos_resolucion', models.BigIntegerField(default=0)),
+                ('fontanero', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'fontanero'), name='estadistica_resolucion_unica')],
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_estadisticas_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mensajechat',
+            index=models.Index(fields=['incidencia', 'fecha_envio', 'id'], name='chat_incidencia_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_mensajechat_indice_historial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidencia',
+            name='foto_detalle',
+            field=models.ImageField(blank=True, null=True, upload_to='incidencias_fotos/derivados/'),
+        ),
+        migrations.AddField(
+            model_name='incidencia',
+            name='foto_miniatura',
+            field=models.ImageField(blank=True, null=True, upload_to='incidencias_fotos/derivados/'),
+        ),
+    ]
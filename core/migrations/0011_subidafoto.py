@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:31
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_incidencia_foto_derivados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaFoto',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255)),
+                ('tamano', models.BigIntegerField()),
+                ('sha256', models.CharField(max_length=64)),
+                ('recibidos', models.BigIntegerField(default=0)),
+                ('completada', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas_foto', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
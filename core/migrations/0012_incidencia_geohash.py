@@ -0,0 +1,41 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+from core import geo
+
+
+def poblar_geohash(apps, schema_editor):
+    """
+    Calcula el geohash de las incidencias existentes.
+    """
+    Incidencia = apps.get_model('core', 'Incidencia')
+    lote = []
+    for incidencia in Incidencia.objects.only('id', 'latitud', 'longitud').iterator(chunk_size=1000):
+        incidencia.geohash = geo.codificar(incidencia.latitud, incidencia.longitud)
+        lote.append(incidencia)
+        if len(lote) >= 1000:
+            Incidencia.objects.bulk_update(lote, ['geohash'])
+            lote = []
+    if lote:
+        Incidencia.objects.bulk_update(lote, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_subidafoto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidencia',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['geohash'], name='inc_geohash_idx'),
+        ),
+        migrations.RunPython(poblar_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.2 on 2026-10-18 12:10
+
+from django.db import migrations
+
+# El DDL y el llenado inicial se copian aquí tal cual: la migración no debe
+# depender de core/busqueda.py, que puede cambiar después.
+CREAR = [
+    """
+    CREATE VIRTUAL TABLE core_busqueda USING fts5(
+        descripcion, solucion, contenido, incidencia_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER core_busqueda_incidencia_ai AFTER INSERT ON core_incidencia BEGIN
+        INSERT INTO core_busqueda(rowid, descripcion, solucion, contenido, incidencia_id)
+        VALUES (-new.id, new.descripcion, coalesce(new.solucion, ''), '', new.id);
+    END
+    """,
+    # save() escribe todas las columnas: solo se reindexa si el texto cambió de verdad
+    """
+    CREATE TRIGGER core_busqueda_incidencia_au AFTER UPDATE OF descripcion, solucion ON core_incidencia
+    WHEN old.descripcion IS NOT new.descripcion OR old.solucion IS NOT new.solucion BEGIN
+        UPDATE core_busqueda SET descripcion = new.descripcion, solucion = coalesce(new.solucion, '')
+        WHERE rowid = -new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_busqueda_incidencia_ad AFTER DELETE ON core_incidencia BEGIN
+        DELETE FROM core_busqueda WHERE rowid = -old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_busqueda_mensaje_ai AFTER INSERT ON core_mensajechat BEGIN
+        INSERT INTO core_busqueda(rowid, descripcion, solucion, contenido, incidencia_id)
+        VALUES (new.id, '', '', new.contenido, new.incidencia_id);
+    END
+    """,
+    """
+    CREATE TRIGGER core_busqueda_mensaje_au AFTER UPDATE OF contenido ON core_mensajechat
+    WHEN old.contenido IS NOT new.contenido BEGIN
+        UPDATE core_busqueda SET contenido = new.contenido WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER core_busqueda_mensaje_ad AFTER DELETE ON core_mensajechat BEGIN
+        DELETE FROM core_busqueda WHERE rowid = old.id;
+    END
+    """,
+]
+
+BORRAR = [
+    'DROP TRIGGER IF EXISTS core_busqueda_incidencia_ai',
+    'DROP TRIGGER IF EXISTS core_busqueda_incidencia_au',
+    'DROP TRIGGER IF EXISTS core_busqueda_incidencia_ad',
+    'DROP TRIGGER IF EXISTS core_busqueda_mensaje_ai',
+    'DROP TRIGGER IF EXISTS core_busqueda_mensaje_au',
+    'DROP TRIGGER IF EXISTS core_busqueda_mensaje_ad',
+    'DROP TABLE IF EXISTS core_busqueda',
+]
+
+# Indexa las incidencias y mensajes existentes
+POBLAR = [
+    "INSERT INTO core_busqueda(rowid, descripcion, solucion, contenido, incidencia_id) "
+    "SELECT -id, descripcion, coalesce(solucion, ''), '', id FROM core_incidencia",
+    "INSERT INTO core_busqueda(rowid, descripcion, solucion, contenido, incidencia_id) "
+    "SELECT id, '', '', contenido, incidencia_id FROM core_mensajechat",
+    "INSERT INTO core_busqueda(core_busqueda) VALUES ('optimize')",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_incidencia_geohash'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREAR, BORRAR),
+        migrations.RunSQL(POBLAR, migrations.RunSQL.noop),
+    ]
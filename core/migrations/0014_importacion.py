@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Importacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('usuarios', 'Usuarios'), ('incidencias', 'Incidencias')], max_length=20)),
+                ('archivo', models.CharField(max_length=1024)),
+                ('filas', models.BigIntegerField(default=0)),
+                ('completada', models.BooleanField(default=False)),
+                ('fecha_inicio', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IncidenciaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('descripcion', models.TextField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('EN_PROCESO', 'En Proceso'), ('RESUELTO', 'Resuelto')], max_length=50)),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_resolucion', models.DateTimeField()),
+                ('mensajes', models.IntegerField(default=0)),
+                ('datos', models.BinaryField()),
+                ('fecha_archivado', models.DateTimeField(auto_now_add=True)),
+                ('agricultor_reporta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('fontanero_asignado', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agricultor_reporta', 'fecha_resolucion'], name='arch_agricultor_fecha_idx'), models.Index(fields=['fontanero_asignado', 'fecha_resolucion'], name='arch_fontanero_fecha_idx'), models.Index(fields=['fecha_resolucion'], name='arch_fecha_idx')],
+            },
+        ),
+    ]
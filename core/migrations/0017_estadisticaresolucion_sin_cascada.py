@@ -0,0 +1,20 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_eventooutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='estadisticaresoluciondiaria',
+            name='fontanero',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
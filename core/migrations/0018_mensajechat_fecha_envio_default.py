@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_estadisticaresolucion_sin_cascada'),
+    ]
+
+    operations = [
+        # La columna no cambia (el valor por defecto lo pone Django). Solo se actualiza el estado:
+        # en SQLite un AlterField reconstruye la tabla y borraría los triggers del índice de búsqueda.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='mensajechat',
+                    name='fecha_envio',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_mensajechat_fecha_envio_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incidencia',
+            index=models.Index(fields=['fecha_creacion'], name='inc_fecha_idx'),
+        ),
+    ]
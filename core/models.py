@@ -1,8 +1,13 @@
 # Este código iría en el archivo models.py de una app de Django (ej. 'core/models.py')
 
+import uuid
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser
 
+from . import geo
+
 # Tarea 2.1: Definir el Modelo de Usuario con Roles
 class Usuario(AbstractUser):
     """
@@ -29,10 +34,15 @@ class Incidencia(models.Model):
     # Campos basados en los requisitos funcionales:
     descripcion = models.TextField(help_text="Descripción detallada del problema") # 
     foto = models.ImageField(upload_to='incidencias_fotos/', help_text="Fotografía relacionada a la incidencia") # 
+    # Derivados redimensionados de la foto, generados en segundo plano (ver core/fotos.py)
+    foto_miniatura = models.ImageField(upload_to='incidencias_fotos/derivados/', blank=True, null=True)
+    foto_detalle = models.ImageField(upload_to='incidencias_fotos/derivados/', blank=True, null=True)
     
     # Ubicación precisa del problema 
     latitud = models.DecimalField(max_digits=22, decimal_places=16)
     longitud = models.DecimalField(max_digits=22, decimal_places=16)
+    # Geohash de la ubicación, recalculado en save(): clave del índice espacial (ver core/geo.py)
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
     
     # Estado del reporte para consulta 
     estado = models.CharField(max_length=50, choices=Estado.choices, default=Estado.PENDIENTE)
@@ -41,6 +51,8 @@ class Incidencia(models.Model):
     fecha_actualizacion = models.DateTimeField(auto_now=True)
 
     solucion = models.TextField(help_text="Descripción de la solución aplicada por el fontanero", blank=True, null=True)
+    # Momento en que pasó a RESUELTO (base del tiempo de resolución en las estadísticas)
+    fecha_resolucion = models.DateTimeField(null=True, blank=True)
 
     # Relaciones entre entidades 
     # Un agricultor crea la incidencia 
@@ -50,8 +62,29 @@ class Incidencia(models.Model):
 
     def __str__(self):
         return f"Incidencia #{self.id} - {self.estado} - Reportada por {self.agricultor_reporta.username}"
+
+    def save(self, *args, **kwargs):
+        self.geohash = geo.codificar(self.latitud, self.longitud)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitud', 'longitud'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+    class Meta:
+        # Índices compuestos para cada rama de IncidenciaViewSet.get_queryset:
+        # el filtro por rol/estado más el orden por fecha se sirven desde el índice.
+        indexes = [
+            models.Index(fields=['agricultor_reporta', 'fecha_creacion'], name='inc_agricultor_fecha_idx'),
+            models.Index(fields=['fontanero_asignado', 'fecha_creacion'], name='inc_fontanero_fecha_idx'),
+            models.Index(fields=['estado', 'fecha_creacion'], name='inc_estado_fecha_idx'),
+            # Listado sin filtros del administrador; el desempate por id lo da el rowid
+            models.Index(fields=['fecha_creacion'], name='inc_fecha_idx'),
+            # Búsquedas por área: rangos de prefijos geohash
+            models.Index(fields=['geohash'], name='inc_geohash_idx'),
+        ]
     
 
+
 class Notificacion(models.Model):
     """
     Modelo para gestionar notificaciones para los usuarios.
@@ -60,6 +93,8 @@ class Notificacion(models.Model):
     mensaje = models.CharField(max_length=255)
     leida = models.BooleanField(default=False)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Marca de cambio para la sincronización incremental (?since=)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
     # Enlace opcional a una incidencia para redirigir al usuario
     incidencia = models.ForeignKey(Incidencia, on_delete=models.CASCADE, null=True, blank=True)
 
@@ -68,6 +103,122 @@ class Notificacion(models.Model):
     
     class Meta:
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Contador de no leídas y listado por usuario
+            models.Index(fields=['destinatario', 'leida', 'fecha_creacion'], name='notif_dest_leida_fecha_idx'),
+            # Sincronización incremental por usuario
+            models.Index(fields=['destinatario', 'fecha_actualizacion'], name='notif_dest_actualiz_idx'),
+        ]
+
+
+class SubidaFoto(models.Model):
+    """
+    Subida de una foto por partes. Los bytes se escriben en un archivo parcial
+    (ver core/subidas.py) y 'recibidos' es el offset confirmado desde el que se
+    reanuda. Al completarse se adjunta a una nueva Incidencia por su id.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='subidas_foto')
+    nombre = models.CharField(max_length=255)
+    tamano = models.BigIntegerField()
+    # SHA-256 en hexadecimal del archivo completo, declarado por el cliente
+    sha256 = models.CharField(max_length=64)
+    recibidos = models.BigIntegerField(default=0)
+    completada = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Subida {self.id} de {self.usuario_id}: {self.recibidos}/{self.tamano}"
+
+
+class EventoOutbox(models.Model):
+    """
+    Efecto secundario pendiente de una petición (outbox transaccional, ver
+    core/outbox.py). Se guarda en la misma transacción que el cambio de estado que
+    lo provoca y lo ejecuta después el worker de procesar_outbox.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        PROCESADO = 'PROCESADO', 'Procesado'
+        FALLIDO = 'FALLIDO', 'Fallido'
+
+    tipo = models.CharField(max_length=50)
+    datos = models.JSONField(default=dict)
+    # Clave opcional de idempotencia: un mismo evento no se encola dos veces
+    clave = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.IntegerField(default=0)
+    proximo_intento = models.DateTimeField(auto_now_add=True)
+    ultimo_error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_procesado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Evento #{self.id} {self.tipo} - {self.estado}"
+
+    class Meta:
+        indexes = [
+            # Cola del worker: solo los pendientes, por orden de reintento
+            models.Index(
+                fields=['proximo_intento', 'id'], name='outbox_pendientes_idx',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+            # Purga de los ya procesados
+            models.Index(fields=['estado', 'fecha_procesado'], name='outbox_estado_fecha_idx'),
+        ]
+
+
+class IncidenciaArchivada(models.Model):
+    """
+    Incidencia resuelta hace tiempo, sacada de las tablas calientes por el
+    comando archivar (ver core/archivo.py). Conserva su id y, como columnas, lo
+    necesario para listar y filtrar por rol; la incidencia completa, sus mensajes
+    de chat y sus notificaciones van en 'datos' como JSON comprimido con zlib.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    descripcion = models.TextField()
+    estado = models.CharField(max_length=50, choices=Incidencia.Estado.choices)
+    fecha_creacion = models.DateTimeField()
+    fecha_resolucion = models.DateTimeField()
+    agricultor_reporta = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='+')
+    fontanero_asignado = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    mensajes = models.IntegerField(default=0)
+    datos = models.BinaryField()
+    fecha_archivado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Incidencia archivada #{self.id} - resuelta el {self.fecha_resolucion:%Y-%m-%d}"
+
+    class Meta:
+        # Mismo reparto por rol que Incidencia, con el orden del listado (fecha_resolucion, id)
+        indexes = [
+            models.Index(fields=['agricultor_reporta', 'fecha_resolucion'], name='arch_agricultor_fecha_idx'),
+            models.Index(fields=['fontanero_asignado', 'fecha_resolucion'], name='arch_fontanero_fecha_idx'),
+            models.Index(fields=['fecha_resolucion'], name='arch_fecha_idx'),
+        ]
+
+
+class Importacion(models.Model):
+    """
+    Progreso de una importación masiva (ver core/importacion.py). 'filas' cuenta
+    las filas del archivo ya confirmadas y se actualiza en la misma transacción
+    que cada lote, así que una importación interrumpida se reanuda sin repetir
+    ni perder filas.
+    """
+    class Tipo(models.TextChoices):
+        USUARIOS = 'usuarios', 'Usuarios'
+        INCIDENCIAS = 'incidencias', 'Incidencias'
+
+    tipo = models.CharField(max_length=20, choices=Tipo.choices)
+    # Ruta absoluta del archivo importado
+    archivo = models.CharField(max_length=1024)
+    filas = models.BigIntegerField(default=0)
+    completada = models.BooleanField(default=False)
+    fecha_inicio = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Importación de {self.tipo} desde {self.archivo}: {self.filas} filas"
 
 
 class MensajeChat(models.Model):
@@ -78,10 +229,55 @@ class MensajeChat(models.Model):
     incidencia = models.ForeignKey(Incidencia, on_delete=models.CASCADE, related_name='mensajes_chat')
     autor = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='mensajes_enviados')
     contenido = models.TextField()
-    fecha_envio = models.DateTimeField(auto_now_add=True)
+    # Se fija al crear el mensaje y no al insertarlo: el buffer de chat lo difunde con esta fecha
+    fecha_envio = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"Mensaje de {self.autor.username} en Incidencia #{self.incidencia.id}"
     
     class Meta: 
-        ordering = ['fecha_envio']
\ No newline at end of file
+        ordering = ['fecha_envio']
+        indexes = [
+            # Historial por incidencia paginado con ?before=<id>
+            models.Index(fields=['incidencia', 'fecha_envio', 'id'], name='chat_incidencia_fecha_idx'),
+        ]
+
+
+class EstadisticaEstadoDiaria(models.Model):
+    """
+    Rollup de estadísticas: número de incidencias creadas en un día que se
+    encuentran actualmente en un estado. Se mantiene en cada transición.
+    """
+    fecha = models.DateField()
+    estado = models.CharField(max_length=50, choices=Incidencia.Estado.choices)
+    total = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha} - {self.estado}: {self.total}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='estadistica_estado_unica'),
+        ]
+
+
+class EstadisticaResolucionDiaria(models.Model):
+    """
+    Rollup de estadísticas: incidencias resueltas en un día por cada fontanero,
+    con la suma de sus tiempos de resolución en segundos.
+    """
+    fecha = models.DateField()
+    # Sin restricción ni cascada: borrar un fontanero no borra su histórico de resoluciones
+    fontanero = models.ForeignKey(
+        Usuario, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    resueltas = models.IntegerField(default=0)
+    segundos_resolucion = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.fecha} - {self.fontanero_id}: {self.resueltas}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'fontanero'], name='estadistica_resolucion_unica'),
+        ]
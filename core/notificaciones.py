@@ -0,0 +1,74 @@
+# Archivo: core/notificaciones.py
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .models import Notificacion
+from .serializers import NotificacionSerializer
+
+
+def grupo_usuario(user_id):
+    """
+    Nombre del grupo de Channels al que se une cada usuario conectado.
+    """
+    return f'user_{user_id}'
+
+
+def _no_leidas(destinatario_id):
+    return Notificacion.objects.filter(destinatario_id=destinatario_id, leida=False)
+
+
+def contar_no_leidas(destinatario_id):
+    return _no_leidas(destinatario_id).count()
+
+
+async def acontar_no_leidas(destinatario_id):
+    return await _no_leidas(destinatario_id).acount()
+
+
+def aplicar_retencion(destinatario_id):
+    """
+    Elimina las notificaciones más antiguas del usuario por encima de
+    NOTIFICACIONES_MAX_POR_USUARIO, en una sola sentencia DELETE.
+    """
+    limite = settings.NOTIFICACIONES_MAX_POR_USUARIO
+    if not limite:
+        return 0
+    sobrantes = Notificacion.objects.filter(
+        destinatario_id=destinatario_id
+    ).order_by('-fecha_creacion', '-id').values('id')[limite:]
+    borradas, _ = Notificacion.objects.filter(id__in=sobrantes).delete()
+    return borradas
+
+
+def enviar_notificacion(notificacion):
+    """
+    Empuja una notificación ya guardada al grupo de su destinatario,
+    junto con su contador de no leídas.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    async_to_sync(channel_layer.group_send)(
+        grupo_usuario(notificacion.destinatario_id),
+        {
+            'type': 'notificacion_nueva',
+            'notificacion': dict(NotificacionSerializer(notificacion).data),
+            'no_leidas': contar_no_leidas(notificacion.destinatario_id),
+        }
+    )
+
+
+def notificar(destinatario, mensaje, incidencia=None):
+    """
+    Crea una notificación y la envía por WebSocket cuando la transacción confirma.
+    """
+    notificacion = Notificacion.objects.create(
+        destinatario=destinatario,
+        mensaje=mensaje,
+        incidencia=incidencia
+    )
+    aplicar_retencion(destinatario.id)
+    transaction.on_commit(lambda: enviar_notificacion(notificacion))
+    return notificacion
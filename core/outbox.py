@@ -0,0 +1,136 @@
+# Archivo: core/outbox.py
+"""
+Outbox transaccional para los efectos secundarios de las peticiones.
+
+Una vista que cambia el estado de algo llama a encolar() dentro de su transacción:
+el evento solo existe si el cambio se confirma, y la respuesta no espera a que se
+ejecute. El worker (manage.py procesar_outbox, que servir lanza junto a daphne)
+recoge los pendientes por lotes y ejecuta el manejador registrado para su tipo.
+
+Cada lote se procesa en una transacción con un savepoint por evento: lo que el
+manejador escribe en la base de datos se confirma junto con la marca de procesado,
+así que no se aplica dos veces aunque el worker se caiga a mitad de un lote. Lo
+que no es base de datos (el envío por WebSocket) va en transaction.on_commit y se
+ejecuta tras confirmar el lote. Un evento que falla se reintenta con espera
+exponencial y, tras OUTBOX_MAX_INTENTOS intentos, queda FALLIDO con su último error.
+
+Con SQLite la transacción IMMEDIATE del lote serializa a los workers, así que
+dos procesos nunca recogen el mismo evento.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EventoOutbox, Incidencia, Usuario
+from .notificaciones import notificar
+
+logger = logging.getLogger(__name__)
+
+# tipo de evento -> función que lo ejecuta con sus datos como argumentos
+MANEJADORES = {}
+
+
+def manejador(tipo):
+    def registrar(funcion):
+        MANEJADORES[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def encolar(tipo, clave=None, **datos):
+    """
+    Guarda un evento en la transacción en curso. Con `clave`, si ya existe un
+    evento con la misma clave no se crea otro.
+    """
+    evento = EventoOutbox(tipo=tipo, datos=datos, clave=clave)
+    if clave is None:
+        evento.save()
+    else:
+        EventoOutbox.objects.bulk_create([evento], ignore_conflicts=True)
+    return evento
+
+
+def espera(intentos):
+    """
+    Segundos hasta el siguiente intento tras `intentos` fallos: se duplica desde
+    OUTBOX_REINTENTO_BASE_S hasta OUTBOX_REINTENTO_MAX_S, con un ±10 % aleatorio
+    para que los eventos que fallaron juntos no se reintenten a la vez.
+    """
+    segundos = min(settings.OUTBOX_REINTENTO_BASE_S * 2 ** (intentos - 1), settings.OUTBOX_REINTENTO_MAX_S)
+    return segundos * random.uniform(0.9, 1.1)
+
+
+def procesar_lote(limite=None):
+    """
+    Ejecuta hasta `limite` (OUTBOX_LOTE) eventos pendientes cuyo intento ya toca.
+    Devuelve (procesados, fallidos).
+    """
+    limite = limite or settings.OUTBOX_LOTE
+    ahora = timezone.now()
+    listos = EventoOutbox.objects.filter(estado=EventoOutbox.Estado.PENDIENTE, proximo_intento__lte=ahora)
+    # Lectura sin transacción: con transacciones IMMEDIATE, abrir la del lote toma el
+    # bloqueo de escritura, y el sondeo en vacío no debe competir con las peticiones
+    if not listos.exists():
+        return 0, 0
+    with transaction.atomic():
+        eventos = list(listos.order_by('proximo_intento', 'id')[:limite])
+
+        procesados = []
+        fallidos = 0
+        for evento in eventos:
+            try:
+                # Si el manejador falla se deshace solo lo suyo, no el resto del lote
+                with transaction.atomic():
+                    funcion = MANEJADORES.get(evento.tipo)
+                    if funcion is None:
+                        raise LookupError(f"No hay manejador para el tipo '{evento.tipo}'.")
+                    funcion(**evento.datos)
+            except Exception as error:
+                fallidos += 1
+                evento.intentos += 1
+                evento.ultimo_error = ''.join(traceback.format_exception_only(error)).strip()
+                if evento.intentos >= settings.OUTBOX_MAX_INTENTOS:
+                    evento.estado = EventoOutbox.Estado.FALLIDO
+                    logger.error('Evento #%s (%s) descartado tras %s intentos: %s',
+                                 evento.id, evento.tipo, evento.intentos, evento.ultimo_error)
+                else:
+                    evento.proximo_intento = ahora + timedelta(seconds=espera(evento.intentos))
+                    logger.warning('Evento #%s (%s) falló (intento %s): %s',
+                                   evento.id, evento.tipo, evento.intentos, evento.ultimo_error)
+                evento.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+            else:
+                procesados.append(evento.id)
+
+        EventoOutbox.objects.filter(id__in=procesados).update(
+            estado=EventoOutbox.Estado.PROCESADO, intentos=F('intentos') + 1, fecha_procesado=ahora
+        )
+    return len(procesados), fallidos
+
+
+def purgar():
+    """
+    Borra los eventos procesados hace más de OUTBOX_RETENCION_HORAS horas. Los
+    fallidos se conservan para poder revisarlos.
+    """
+    limite = timezone.now() - timedelta(hours=settings.OUTBOX_RETENCION_HORAS)
+    borrados, _ = EventoOutbox.objects.filter(
+        estado=EventoOutbox.Estado.PROCESADO, fecha_procesado__lt=limite
+    ).delete()
+    return borrados
+
+
+@manejador('notificacion')
+def _notificacion(destinatario_id, mensaje, incidencia_id=None):
+    destinatario = Usuario.objects.filter(pk=destinatario_id).first()
+    if destinatario is None:
+        # El usuario se eliminó desde que se encoló el evento: no hay a quién avisar
+        return
+    # La incidencia pudo archivarse o eliminarse entre medias: se avisa sin enlace
+    incidencia = Incidencia.objects.filter(pk=incidencia_id).first() if incidencia_id else None
+    notificar(destinatario, mensaje, incidencia=incidencia)
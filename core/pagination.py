@@ -0,0 +1,72 @@
+# Archivo: core/pagination.py
+from django.db.models import Subquery
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+
+class IncidenciaCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para el listado de incidencias.
+
+    Ordena por (fecha_creacion, id) de forma descendente, de modo que cada
+    página se resuelve con un rango sobre los índices compuestos de
+    Incidencia en lugar de un OFFSET, y su coste no crece con la tabla.
+    Ej: /api/incidencias/?page_size=50&cursor=<cursor>
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-fecha_creacion', '-id')
+
+
+class IncidenciaArchivadaCursorPagination(IncidenciaCursorPagination):
+    """
+    Igual que IncidenciaCursorPagination, por (fecha_resolucion, id): los índices
+    de IncidenciaArchivada están ordenados por la fecha de resolución.
+    """
+    ordering = ('-fecha_resolucion', '-id')
+
+
+class MensajeChatPagination(BasePagination):
+    """
+    Historial de chat paginado hacia atrás: sin parámetros devuelve los últimos
+    `limit` mensajes en orden cronológico; con ?before=<id> los anteriores a ese
+    mensaje. La respuesta incluye 'before' con el id para pedir la página previa
+    (o null si no hay más). Se resuelve con el índice (incidencia, fecha_envio, id).
+    Ej: /api/incidencias/5/mensajes/?before=120&limit=50
+    """
+    page_size = 50
+    max_page_size = 200
+
+    def _limite(self, request):
+        try:
+            limite = int(request.query_params.get('limit', self.page_size))
+        except ValueError:
+            raise ValidationError({'limit': 'Debe ser un número entero.'})
+        return max(1, min(limite, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        limite = self._limite(request)
+
+        before = request.query_params.get('before')
+        if before is not None:
+            if not before.isdigit():
+                raise ValidationError({'before': 'Debe ser el id de un mensaje.'})
+            # Posición (fecha_envio, id) del mensaje de referencia, dentro de la misma consulta
+            fecha_referencia = Subquery(
+                queryset.model.objects.filter(pk=before).values('fecha_envio')[:1]
+            )
+            queryset = queryset.filter(fecha_envio__lte=fecha_referencia).exclude(
+                fecha_envio=fecha_referencia, id__gte=before
+            )
+
+        mensajes = list(queryset.order_by('-fecha_envio', '-id')[:limite + 1])
+        hay_mas = len(mensajes) > limite
+        mensajes = mensajes[:limite]
+        mensajes.reverse()
+        self.before = mensajes[0].id if hay_mas else None
+        return mensajes
+
+    def get_paginated_response(self, data):
+        return Response({'results': data, 'before': self.before})
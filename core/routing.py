@@ -4,4 +4,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<incidencia_id>\d+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/notificaciones/$', consumers.NotificacionConsumer.as_asgi()),
 ]
\ No newline at end of file
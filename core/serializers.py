@@ -1,9 +1,19 @@
 # Archivo: core/serializers.py
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Usuario, Incidencia, Notificacion, MensajeChat
+from .models import Usuario, Incidencia, IncidenciaArchivada, Notificacion, MensajeChat, SubidaFoto
+from . import subidas
+from .instrumentacion import SerializacionMedida, medir
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-class UsuarioSerializer(serializers.ModelSerializer):
+class UsuarioSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = ['id', 'username', 'email', 'rol', 'password']
@@ -21,18 +31,139 @@ class UsuarioSerializer(serializers.ModelSerializer):
         return user
 
 
-class IncidenciaSerializer(serializers.ModelSerializer):
+class IncidenciaSerializer(SerializacionMedida, serializers.ModelSerializer):
     # Para mostrar el nombre del agricultor en lugar de solo su ID
     agricultor_reporta_username = serializers.ReadOnlyField(source='agricultor_reporta.username')
     fontanero_asignado_username = serializers.ReadOnlyField(source='fontanero_asignado.username')
-
+    # Alternativa a enviar 'foto': id de una subida por partes ya completada
+    subida = serializers.PrimaryKeyRelatedField(
+        queryset=SubidaFoto.objects.filter(completada=True), write_only=True, required=False
+    )
 
     class Meta:
         model = Incidencia
         # Incluimos todos los campos del modelo
         fields = '__all__'
         # El agricultor que reporta no se debe establecer manualmente, se tomará del usuario autenticado
-        read_only_fields = ('agricultor_reporta',)
+        read_only_fields = ('agricultor_reporta', 'fecha_resolucion', 'foto_miniatura', 'foto_detalle')
+        extra_kwargs = {'foto': {'required': False}}
+
+    def validate(self, attrs):
+        subida = attrs.get('subida')
+        if subida is not None:
+            request = self.context.get('request')
+            if request is None or subida.usuario_id != request.user.id:
+                raise serializers.ValidationError({'subida': 'La subida no pertenece al usuario.'})
+            if 'foto' in attrs:
+                raise serializers.ValidationError({'subida': "Envía 'foto' o 'subida', no ambas."})
+        elif self.instance is None and not attrs.get('foto'):
+            raise serializers.ValidationError({'foto': 'Se requiere una foto o el id de una subida completada.'})
+        return attrs
+
+    def create(self, validated_data):
+        subida = validated_data.pop('subida', None)
+        if subida is None:
+            return super().create(validated_data)
+
+        # El storage copia el archivo parcial por bloques al guardar la incidencia
+        archivo = subidas.como_archivo(subida)
+        try:
+            validated_data['foto'] = archivo
+            incidencia = super().create(validated_data)
+        finally:
+            archivo.close()
+        subida_id = subida.id
+        subida.delete()
+        transaction.on_commit(lambda: subidas.borrar_parcial(subida_id))
+        return incidencia
+
+    def update(self, instance, validated_data):
+        validated_data.pop('subida', None)
+        return super().update(instance, validated_data)
+
+
+def formatear_fecha(valor):
+    """
+    Fecha con el mismo formato que DateTimeField de DRF: ISO 8601 en la zona
+    local, con 'Z' para UTC. None si no hay fecha.
+    """
+    if valor is None:
+        return None
+    texto = timezone.localtime(valor).isoformat()
+    if texto.endswith('+00:00'):
+        texto = texto[:-6] + 'Z'
+    return texto
+
+
+def url_foto(request, nombre):
+    """
+    URL de una foto guardada por nombre en el almacenamiento, absoluta si hay
+    request. None si no hay foto.
+    """
+    if not nombre:
+        return None
+    url = default_storage.url(nombre)
+    return request.build_absolute_uri(url) if request else url
+
+
+class IncidenciaListSerializer:
+    """
+    Representación ligera para el listado de incidencias.
+
+    Trabaja sobre una proyección values() con los usernames ya unidos por JOIN,
+    así que no instancia modelos ni campos de DRF por fila. Devuelve las mismas
+    claves que IncidenciaSerializer, que se sigue usando para el detalle.
+    """
+    campos = (
+        'id', 'descripcion', 'foto', 'foto_miniatura', 'foto_detalle', 'latitud', 'longitud', 'geohash', 'estado',
+        'fecha_creacion', 'fecha_actualizacion', 'fecha_resolucion', 'solucion',
+        'agricultor_reporta', 'fontanero_asignado',
+    )
+    campos_unidos = {
+        'agricultor_reporta_username': F('agricultor_reporta__username'),
+        'fontanero_asignado_username': F('fontanero_asignado__username'),
+    }
+
+    def __init__(self, filas, request=None):
+        self.filas = filas
+        self.request = request
+
+    @classmethod
+    def proyectar(cls, queryset):
+        """
+        Convierte un queryset de Incidencia en la proyección que espera este serializer.
+        """
+        return queryset.values(*cls.campos, **cls.campos_unidos)
+
+    def to_representation(self, fila):
+        representacion = dict(fila)
+        representacion['foto'] = url_foto(self.request, fila['foto'])
+        representacion['foto_miniatura'] = url_foto(self.request, fila['foto_miniatura'])
+        representacion['foto_detalle'] = url_foto(self.request, fila['foto_detalle'])
+        representacion['latitud'] = f"{fila['latitud']:f}"
+        representacion['longitud'] = f"{fila['longitud']:f}"
+        representacion['fecha_creacion'] = formatear_fecha(fila['fecha_creacion'])
+        representacion['fecha_actualizacion'] = formatear_fecha(fila['fecha_actualizacion'])
+        representacion['fecha_resolucion'] = formatear_fecha(fila['fecha_resolucion'])
+        return representacion
+
+    @property
+    def data(self):
+        with medir('serializador'):
+            return [self.to_representation(fila) for fila in self.filas]
+
+
+class IncidenciaArchivadaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    """
+    Fila del listado de incidencias archivadas: solo las columnas, sin descomprimir 'datos'.
+    """
+    agricultor_reporta_username = serializers.ReadOnlyField(source='agricultor_reporta.username')
+    fontanero_asignado_username = serializers.ReadOnlyField(source='fontanero_asignado.username')
+
+    class Meta:
+        model = IncidenciaArchivada
+        exclude = ('datos',)
+
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
@@ -49,13 +180,42 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return token
     
 
-class NotificacionSerializer(serializers.ModelSerializer):
+class SubidaFotoSerializer(SerializacionMedida, serializers.ModelSerializer):
+    """
+    Estado de una subida por partes. Al crearla se declaran nombre, tamaño y
+    SHA-256; 'recibidos' indica el offset desde el que continuar.
+    """
+    class Meta:
+        model = SubidaFoto
+        fields = ['id', 'nombre', 'tamano', 'sha256', 'recibidos', 'completada', 'fecha_creacion']
+        read_only_fields = ('recibidos', 'completada', 'fecha_creacion')
+
+    def validate_nombre(self, value):
+        # Solo el nombre del archivo: la ruta final la decide Incidencia.foto
+        nombre = os.path.basename(value.replace('\\', '/'))
+        if not nombre:
+            raise serializers.ValidationError('Nombre de archivo no válido.')
+        return nombre
+
+    def validate_tamano(self, value):
+        if value <= 0 or value > settings.SUBIDAS_TAMANO_MAX:
+            raise serializers.ValidationError(f'El tamaño debe estar entre 1 y {settings.SUBIDAS_TAMANO_MAX} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('Debe ser un SHA-256 en hexadecimal.')
+        return value
+
+
+class NotificacionSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Notificacion
         fields = '__all__'
         
 
-class MensajeChatSerializer(serializers.ModelSerializer):
+class MensajeChatSerializer(SerializacionMedida, serializers.ModelSerializer):
     """
     Serializer para los mensajes de chat.
     """
@@ -0,0 +1,136 @@
+# Archivo: core/subidas.py
+"""
+Subidas de fotos por partes y reanudables.
+
+Cada parte llega como cuerpo crudo de un PATCH con la cabecera Upload-Offset
+y se copia al archivo parcial en bloques, sin cargarla entera en memoria.
+Solo se confirma el offset después de sincronizar el archivo a disco, así que
+tras un corte el cliente pregunta por 'recibidos' y continúa desde ahí.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.http import UnreadablePostError
+from django.utils import timezone
+from PIL import Image
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+class OffsetInvalido(Exception):
+    """
+    El offset de la parte no coincide con el último confirmado.
+    """
+
+
+def directorio():
+    return settings.SUBIDAS_DIR or os.path.join(settings.MEDIA_ROOT, 'subidas_parciales')
+
+
+def ruta_parcial(subida):
+    return os.path.join(directorio(), f'{subida.id}.part')
+
+
+def iniciar(subida):
+    os.makedirs(directorio(), exist_ok=True)
+    open(ruta_parcial(subida), 'wb').close()
+
+
+def escribir_parte(subida, offset, flujo):
+    """
+    Copia el flujo al archivo parcial a partir de `offset` y confirma el nuevo
+    offset. Si la conexión se corta a mitad de parte se conservan los bytes que
+    llegaron. Devuelve el número de bytes confirmados en total.
+    """
+    from .models import SubidaFoto
+
+    if offset != subida.recibidos:
+        raise OffsetInvalido(subida.recibidos)
+
+    restantes = subida.tamano - offset
+    escritos = 0
+    with open(ruta_parcial(subida), 'r+b') as archivo:
+        archivo.seek(offset)
+        try:
+            while True:
+                # Se lee un byte de más para detectar partes que exceden el tamaño declarado
+                bloque = flujo.read(min(TAMANO_BLOQUE, restantes - escritos + 1))
+                if not bloque:
+                    break
+                if escritos + len(bloque) > restantes:
+                    raise ValueError('La parte excede el tamaño declarado de la subida.')
+                archivo.write(bloque)
+                escritos += len(bloque)
+        except UnreadablePostError:
+            pass
+        finally:
+            # Descarta lo que quedara de un intento anterior y asegura los bytes en disco
+            archivo.truncate(offset + escritos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+    # Actualización condicional: si otra petición confirmó antes, el offset ya no vale
+    if not SubidaFoto.objects.filter(pk=subida.pk, recibidos=offset).update(recibidos=offset + escritos):
+        subida.refresh_from_db(fields=['recibidos'])
+        raise OffsetInvalido(subida.recibidos)
+    subida.recibidos = offset + escritos
+    return subida.recibidos
+
+
+def sha256(subida):
+    resumen = hashlib.sha256()
+    with open(ruta_parcial(subida), 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(TAMANO_BLOQUE), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def es_imagen(subida):
+    try:
+        with Image.open(ruta_parcial(subida)) as imagen:
+            imagen.verify()
+        return True
+    except Exception:
+        return False
+
+
+def reiniciar(subida):
+    """
+    Descarta los bytes recibidos para que el cliente vuelva a empezar.
+    """
+    open(ruta_parcial(subida), 'wb').close()
+    subida.recibidos = 0
+    subida.save(update_fields=['recibidos'])
+
+
+def como_archivo(subida):
+    """
+    File de Django sobre el archivo parcial: al asignarlo a Incidencia.foto el
+    storage lo copia por bloques.
+    """
+    return File(open(ruta_parcial(subida), 'rb'), name=subida.nombre)
+
+
+def borrar_parcial(subida_id):
+    try:
+        os.remove(os.path.join(directorio(), f'{subida_id}.part'))
+    except FileNotFoundError:
+        pass
+
+
+def limpiar_abandonadas():
+    """
+    Elimina las subidas (completadas o no) que nadie adjuntó a tiempo.
+    Devuelve cuántas se borraron.
+    """
+    from .models import SubidaFoto
+
+    limite = timezone.now() - timedelta(hours=settings.SUBIDAS_EXPIRACION_HORAS)
+    ids = list(SubidaFoto.objects.filter(fecha_creacion__lt=limite).values_list('id', flat=True))
+    for subida_id in ids:
+        borrar_parcial(subida_id)
+    SubidaFoto.objects.filter(id__in=ids).delete()
+    return len(ids)
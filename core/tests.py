@@ -1,3 +1,1338 @@
-from django.test import TestCase
+# Archivo: core/tests.py
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.exceptions import ChannelFull
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import CommandError, call_command
+from django.core.signals import request_finished
+from django.db import connection, connections, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView, exception_handler
+
+from .channel_layer import SQLiteChannelLayer
+from . import autenticacion, consumers, estadisticas, exportacion, geo, instrumentacion, outbox
+from .ejecutor_db import EjecutorDB
+from .filtros import FiltroArea
+from .models import EventoOutbox, Importacion, Usuario, Incidencia, IncidenciaArchivada, MensajeChat, Notificacion, SubidaFoto, EstadisticaResolucionDiaria
+from .notificaciones import grupo_usuario, notificar
+from .routing import websocket_urlpatterns
+from .serializers import IncidenciaListSerializer, MyTokenObtainPairSerializer
+from .views import DashboardSummaryView, EstadisticasView, IncidenciaViewSet, NotificacionViewSet, incidencias_visibles
+
+# GIF transparente de 1x1 px para las pruebas de subida de fotos
+GIF_1PX = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00'
+    b'\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    FOTOS_PROCESOS=0,
+)
+class BaseAPITestCase(APITestCase):
+    """
+    Crea un usuario por rol y utilidades comunes para las pruebas de la API.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Las fotos subidas en las pruebas van a un directorio temporal
+        cls._media_root = tempfile.mkdtemp()
+        cls._media_override = override_settings(MEDIA_ROOT=cls._media_root)
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', password='x', rol='ADMINISTRADOR', is_staff=True)
+        self.fontanero = Usuario.objects.create_user(username='fontanero', password='x', rol='FONTANERO')
+        self.agricultor = Usuario.objects.create_user(username='agricultor', password='x', rol='AGRICULTOR')
+
+    def autenticar(self, usuario):
+        # Con un token real: las vistas asíncronas solo autentican con las clases configuradas
+        token = MyTokenObtainPairSerializer.get_token(usuario).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def crear_incidencia(self, **kwargs):
+        datos = {
+            'descripcion': 'Fuga en la tubería principal',
+            'foto': 'incidencias_fotos/prueba.jpg',
+            'latitud': '14.6349000000000000',
+            'longitud': '-90.5069000000000000',
+            'agricultor_reporta': self.agricultor,
+        }
+        datos.update(kwargs)
+        return Incidencia.objects.create(**datos)
+
+
+class IncidenciaPaginacionTests(BaseAPITestCase):
+    def test_listado_paginado_por_cursor(self):
+        for _ in range(5):
+            self.crear_incidencia()
+        self.autenticar(self.admin)
+
+        response = self.client.get('/api/incidencias/', {'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        vistos = [inc['id'] for inc in response.data['results']]
+        siguiente = response.data['next']
+        while siguiente:
+            response = self.client.get(siguiente)
+            vistos += [inc['id'] for inc in response.data['results']]
+            siguiente = response.data['next']
+
+        esperados = list(Incidencia.objects.order_by('-fecha_creacion', '-id').values_list('id', flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_pagina_del_administrador_usa_el_indice(self):
+        # Sin filtros, la página sale del índice por fecha sin ordenar toda la tabla
+        filas = IncidenciaListSerializer.proyectar(incidencias_visibles(self.admin))
+        plan = filas[:26].explain()
+        self.assertIn('inc_fecha_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_agricultor_solo_ve_sus_incidencias(self):
+        otro = Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR')
+        propia = self.crear_incidencia()
+        self.crear_incidencia(agricultor_reporta=otro)
+        self.autenticar(self.agricultor)
+
+        response = self.client.get('/api/incidencias/')
+        self.assertEqual([inc['id'] for inc in response.data['results']], [propia.id])
+
+
+class IncidenciaListadoConsultasTests(BaseAPITestCase):
+    def _assert_consultas_constantes(self, cantidad):
+        Incidencia.objects.all().delete()
+        for _ in range(cantidad):
+            self.crear_incidencia(fontanero_asignado=self.fontanero)
+        self.client.force_authenticate(self.admin)
+
+        # Una única consulta (con JOIN a los usuarios) sin importar el número de filas
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/incidencias/', {'page_size': 100})
+        self.assertEqual(len(response.data['results']), cantidad)
+
+    def test_listado_con_numero_de_consultas_constante(self):
+        self._assert_consultas_constantes(1)
+        self._assert_consultas_constantes(30)
+
+    def test_listado_y_detalle_devuelven_las_mismas_claves(self):
+        incidencia = self.crear_incidencia(fontanero_asignado=self.fontanero)
+        self.autenticar(self.admin)
+
+        listado = self.client.get('/api/incidencias/').data['results'][0]
+        detalle = self.client.get(f'/api/incidencias/{incidencia.id}/').data
+        self.assertEqual(dict(listado), dict(detalle))
+        self.assertEqual(listado['fontanero_asignado_username'], 'fontanero')
+
+
+class NotificacionPushTests(BaseAPITestCase):
+    def test_assign_empuja_la_notificacion_al_fontanero(self):
+        incidencia = self.crear_incidencia()
+        layer = get_channel_layer()
+        canal = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(grupo_usuario(self.fontanero.id), canal)
+        self.autenticar(self.admin)
+
+        response = self.client.patch(f'/api/incidencias/{incidencia.id}/assign/', {'fontanero_id': self.fontanero.id})
+        self.assertEqual(response.status_code, 200)
+        # La petición solo deja el evento en el outbox: la notificación la crea el worker
+        self.assertFalse(Notificacion.objects.exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(outbox.procesar_lote(), (1, 0))
+
+        evento = async_to_sync(layer.receive)(canal)
+        self.assertEqual(evento['type'], 'notificacion_nueva')
+        self.assertEqual(evento['notificacion']['incidencia'], incidencia.id)
+        self.assertEqual(evento['no_leidas'], 1)
+
+
+class OutboxTests(BaseAPITestCase):
+    def test_sondeo_en_vacio_sin_transaccion(self):
+        outbox.encolar('notificacion', destinatario_id=self.agricultor.id, mensaje='Más tarde')
+        EventoOutbox.objects.update(proximo_intento=timezone.now() + timedelta(hours=1))
+        # Solo la comprobación de pendientes: ni transacción ni savepoint
+        with self.assertNumQueries(1):
+            self.assertEqual(outbox.procesar_lote(), (0, 0))
+
+    def test_update_status_encola_y_el_worker_notifica(self):
+        incidencia = self.crear_incidencia(fontanero_asignado=self.fontanero, estado='EN_PROCESO')
+        self.autenticar(self.fontanero)
+        response = self.client.patch(
+            f'/api/incidencias/{incidencia.id}/update_status/', {'estado': 'RESUELTO', 'solucion': 'Cambio de válvula'}
+        )
+        self.assertEqual(response.status_code, 200)
+        evento = EventoOutbox.objects.get()
+        self.assertEqual(evento.datos['destinatario_id'], self.agricultor.id)
+
+        salida = StringIO()
+        call_command('procesar_outbox', una_vez=True, stdout=salida)
+        self.assertIn('1 eventos procesados', salida.getvalue())
+        notificacion = Notificacion.objects.get()
+        self.assertEqual((notificacion.destinatario, notificacion.incidencia), (self.agricultor, incidencia))
+        evento.refresh_from_db()
+        self.assertEqual((evento.estado, evento.intentos), (EventoOutbox.Estado.PROCESADO, 1))
+        # Procesar de nuevo no duplica la notificación
+        self.assertEqual(outbox.procesar_lote(), (0, 0))
+        self.assertEqual(Notificacion.objects.count(), 1)
+
+    def test_solo_se_encola_si_se_confirma_el_cambio(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            outbox.encolar('notificacion', destinatario_id=self.agricultor.id, mensaje='Perdida')
+            raise RuntimeError
+        self.assertFalse(EventoOutbox.objects.exists())
+        # Con clave, el mismo evento no se encola dos veces
+        for _ in range(2):
+            outbox.encolar('notificacion', clave='aviso-1', destinatario_id=self.agricultor.id, mensaje='Aviso')
+        self.assertEqual(EventoOutbox.objects.count(), 1)
+
+    @override_settings(OUTBOX_MAX_INTENTOS=2, OUTBOX_REINTENTO_BASE_S=60)
+    def test_reintentos_con_espera_exponencial(self):
+        def falla(mensaje):
+            # Lo que escribe un manejador que falla se deshace
+            notificar(self.agricultor, mensaje)
+            raise ConnectionError('servicio caído')
+
+        with mock.patch.dict(outbox.MANEJADORES, {'falla': falla}):
+            fallido = outbox.encolar('falla', mensaje='Nunca')
+            outbox.encolar('notificacion', destinatario_id=self.fontanero.id, mensaje='Correcta')
+            with self.assertLogs('core.outbox', 'WARNING'):
+                self.assertEqual(outbox.procesar_lote(), (1, 1))
+            self.assertEqual(list(Notificacion.objects.values_list('mensaje', flat=True)), ['Correcta'])
+
+            fallido.refresh_from_db()
+            self.assertEqual((fallido.estado, fallido.intentos), (EventoOutbox.Estado.PENDIENTE, 1))
+            self.assertEqual(fallido.ultimo_error, 'ConnectionError: servicio caído')
+            espera = (fallido.proximo_intento - timezone.now()).total_seconds()
+            self.assertTrue(50 < espera <= 66)
+            # Hasta que no pasa la espera no se reintenta
+            self.assertEqual(outbox.procesar_lote(), (0, 0))
+
+            EventoOutbox.objects.filter(pk=fallido.pk).update(proximo_intento=timezone.now())
+            with self.assertLogs('core.outbox', 'ERROR'):
+                self.assertEqual(outbox.procesar_lote(), (0, 1))
+            fallido.refresh_from_db()
+            self.assertEqual((fallido.estado, fallido.intentos), (EventoOutbox.Estado.FALLIDO, 2))
+        self.assertTrue(108 <= outbox.espera(2) <= 132)
+
+    @override_settings(OUTBOX_RETENCION_HORAS=1)
+    def test_purga_de_procesados(self):
+        viejo = outbox.encolar('notificacion', destinatario_id=self.agricultor.id, mensaje='Vieja')
+        outbox.encolar('notificacion', destinatario_id=self.agricultor.id, mensaje='Nueva')
+        outbox.procesar_lote()
+        EventoOutbox.objects.filter(pk=viejo.pk).update(fecha_procesado=timezone.now() - timedelta(hours=2))
+        self.assertEqual(outbox.purgar(), 1)
+        self.assertEqual(EventoOutbox.objects.count(), 1)
+
+
+class NotificacionSincronizacionTests(BaseAPITestCase):
+    def test_since_devuelve_solo_los_cambios(self):
+        vieja = notificar(self.agricultor, 'Primera')
+        self.autenticar(self.agricultor)
+        cursor = self.client.get('/api/notificaciones/', {'since': '2000-01-01T00:00:00Z'}).data['cursor']
+
+        nueva = notificar(self.agricultor, 'Segunda')
+        response = self.client.get('/api/notificaciones/', {'since': cursor})
+        self.assertEqual([n['id'] for n in response.data['results']], [nueva.id])
+        self.assertEqual(response.data['no_leidas'], 2)
+
+        # Marcar como leída también cuenta como cambio
+        self.client.patch(f'/api/notificaciones/{vieja.id}/marcar_leida/')
+        response = self.client.get('/api/notificaciones/', {'since': response.data['cursor']})
+        self.assertEqual([n['id'] for n in response.data['results']], [vieja.id])
+
+    def test_marcar_todas_leidas_en_un_solo_update(self):
+        for i in range(3):
+            notificar(self.agricultor, f'Aviso {i}')
+        otra = notificar(self.fontanero, 'Ajena')
+        self.client.force_authenticate(self.agricultor)
+
+        with self.assertNumQueries(2):  # UPDATE + contador
+            response = self.client.patch('/api/notificaciones/marcar_todas_leidas/', {}, format='json')
+        self.assertEqual(response.data, {'actualizadas': 3, 'no_leidas': 0})
+        otra.refresh_from_db()
+        self.assertFalse(otra.leida)
+
+    @override_settings(NOTIFICACIONES_MAX_POR_USUARIO=3)
+    def test_retencion_por_usuario(self):
+        for i in range(5):
+            notificar(self.agricultor, f'Aviso {i}')
+        self.assertEqual(
+            list(self.agricultor.notificaciones.values_list('mensaje', flat=True)),
+            ['Aviso 4', 'Aviso 3', 'Aviso 2']
+        )
+
+
+class DashboardSummaryTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.crear_incidencia()
+        self.crear_incidencia(fontanero_asignado=self.fontanero, estado='EN_PROCESO')
+        self.crear_incidencia(fontanero_asignado=self.fontanero, estado='RESUELTO')
+
+    def _resumen(self, usuario):
+        self.autenticar(usuario)
+        # La carga del usuario del token y una sola consulta de resumen, sin importar el rol
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/dashboard-summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['summary']
+
+    def test_resumen_administrador(self):
+        resumen = self._resumen(self.admin)
+        self.assertEqual(resumen['total_incidencias'], 3)
+        self.assertEqual(resumen['pendientes_de_asignar'], 1)
+        self.assertEqual(resumen['total_usuarios'], 3)
+        self.assertEqual(resumen['por_estado'], {'PENDIENTE': 1, 'EN_PROCESO': 1, 'RESUELTO': 1})
+
+    def test_resumen_fontanero(self):
+        resumen = self._resumen(self.fontanero)
+        self.assertEqual(resumen['total_asignadas'], 2)
+        self.assertEqual(resumen['pendientes_de_atender'], 1)
+        self.assertEqual(resumen['por_estado'], {'PENDIENTE': 0, 'EN_PROCESO': 1, 'RESUELTO': 1})
+
+    def test_resumen_agricultor(self):
+        resumen = self._resumen(self.agricultor)
+        self.assertEqual(resumen['total_reportadas'], 3)
+        self.assertEqual(resumen['pendientes'], 1)
+        self.assertEqual(resumen['en_proceso'], 1)
+
+
+class EstadisticasRollupTests(BaseAPITestCase):
+    def _estadisticas(self, **params):
+        self.autenticar(self.admin)
+        response = self.client.get('/api/estadisticas/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_rollup_incremental_coincide_con_la_reconstruccion(self):
+        self.autenticar(self.agricultor)
+        for _ in range(3):
+            response = self.client.post('/api/incidencias/', {
+                'descripcion': 'Válvula rota',
+                'foto': SimpleUploadedFile('foto.gif', GIF_1PX, content_type='image/gif'),
+                'latitud': '14.6', 'longitud': '-90.5',
+            })
+            self.assertEqual(response.status_code, 201)
+        ids = list(Incidencia.objects.values_list('id', flat=True))
+
+        self.autenticar(self.admin)
+        for incidencia_id in ids:
+            self.client.patch(f'/api/incidencias/{incidencia_id}/assign/', {'fontanero_id': self.fontanero.id})
+        self.autenticar(self.fontanero)
+        self.client.patch(f'/api/incidencias/{ids[0]}/update_status/', {'estado': 'RESUELTO', 'solucion': 'Cambio de válvula'})
+        self.client.patch(f'/api/incidencias/{ids[1]}/update_status/', {'estado': 'RESUELTO', 'solucion': 'Cambio de válvula'})
+        # Reapertura: la resolución debe descontarse
+        self.client.patch(f'/api/incidencias/{ids[1]}/update_status/', {'estado': 'EN_PROCESO'})
+
+        incremental = self._estadisticas()
+        self.assertEqual(incremental['total_incidencias'], 3)
+        self.assertEqual(
+            {f['estado']: f['total'] for f in incremental['incidencias_por_estado']},
+            {'EN_PROCESO': 2, 'RESUELTO': 1}
+        )
+        self.assertEqual(incremental['top_fontaneros'], [{'username': 'fontanero', 'incidencias_resueltas': 1}])
+
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        self.assertEqual(self._estadisticas(), incremental)
+
+    def test_escrituras_fuera_de_la_api_y_borrados_de_usuarios(self):
+        # Como desde el admin: save() y delete() directos sobre el modelo
+        resuelta = self.crear_incidencia(fontanero_asignado=self.fontanero)
+        resuelta.estado = 'RESUELTO'
+        resuelta.save()
+        self.assertIsNotNone(resuelta.fecha_resolucion)
+        self.crear_incidencia().delete()
+        otro = Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR')
+        self.crear_incidencia(agricultor_reporta=otro)
+
+        # El borrado en cascada de las incidencias de un agricultor también descuenta
+        otro.delete()
+        datos = self._estadisticas()
+        self.assertEqual(datos['total_incidencias'], 1)
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        self.assertEqual(self._estadisticas(), datos)
+
+        # Borrar al fontanero no borra sus resoluciones pasadas
+        self.fontanero.delete()
+        datos = self._estadisticas()
+        self.assertEqual(sum(fila['resueltas'] for fila in datos['serie_temporal']), 1)
+        self.assertEqual(EstadisticaResolucionDiaria.objects.get().resueltas, 1)
+
+    def test_rango_y_serie_semanal(self):
+        self.crear_incidencia()
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+        hoy = timezone.localdate()
+
+        datos = self._estadisticas(desde=hoy.isoformat(), agrupacion='semana')
+        lunes = hoy - timedelta(days=hoy.weekday())
+        self.assertEqual(datos['serie_temporal'], [{'periodo': lunes.isoformat(), 'creadas': 1, 'resueltas': 0}])
+
+        datos = self._estadisticas(hasta=(hoy - timedelta(days=1)).isoformat())
+        self.assertEqual(datos['total_incidencias'], 0)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.agricultor = Usuario.objects.create_user(username='agricultor', password='x', rol='AGRICULTOR')
+        self.ajeno = Usuario.objects.create_user(username='ajeno', password='x', rol='AGRICULTOR')
+        self.incidencia = Incidencia.objects.create(
+            descripcion='Fuga', foto='incidencias_fotos/prueba.jpg', latitud='14.6', longitud='-90.5',
+            agricultor_reporta=self.agricultor
+        )
+
+    def _communicator(self, usuario):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/chat/{self.incidencia.id}/')
+        communicator.scope['user'] = usuario
+        return communicator
+
+    def test_rechaza_usuarios_sin_acceso(self):
+        async def conectar():
+            communicator = self._communicator(self.ajeno)
+            conectado, _ = await communicator.connect()
+            await communicator.disconnect()
+            return conectado
+        self.assertFalse(async_to_sync(conectar)())
+
+    def _enviar(self, mensajes):
+        async def conversar():
+            communicator = self._communicator(self.agricultor)
+            conectado, _ = await communicator.connect()
+            self.assertTrue(conectado)
+            for mensaje in mensajes:
+                await communicator.send_json_to({'message': mensaje})
+                recibido = await communicator.receive_json_from()
+                self.assertEqual(recibido['user'], 'agricultor')
+            await communicator.disconnect()
+        async_to_sync(conversar)()
+        return list(MensajeChat.objects.filter(incidencia=self.incidencia).values_list('contenido', flat=True))
+
+    def test_guarda_cada_mensaje(self):
+        self.assertEqual(self._enviar(['Hola', 'Sigue la fuga']), ['Hola', 'Sigue la fuga'])
+
+    @override_settings(CHAT_BUFFER_MENSAJES=2, CHAT_BUFFER_MS=50)
+    def test_escritura_diferida_difunde_tras_guardar(self):
+        consumers._buffer_mensajes = None
+        self.addCleanup(setattr, consumers, '_buffer_mensajes', None)
+
+        async def conversar():
+            communicator = self._communicator(self.agricultor)
+            await communicator.connect()
+            await communicator.send_json_to({'message': 'Uno'})
+            # Nada se difunde hasta que el lote se guarda
+            self.assertTrue(await communicator.receive_nothing(timeout=0.02))
+            await communicator.send_json_to({'message': 'Dos'})
+            recibidos = [await communicator.receive_json_from() for _ in range(2)]
+            # El tercero se vuelca por tiempo
+            await communicator.send_json_to({'message': 'Tres'})
+            recibidos.append(await communicator.receive_json_from(timeout=2))
+            await communicator.disconnect()
+            return recibidos
+        recibidos = async_to_sync(conversar)()
+
+        guardados = list(MensajeChat.objects.filter(incidencia=self.incidencia).order_by('id'))
+        self.assertEqual([m.contenido for m in guardados], ['Uno', 'Dos', 'Tres'])
+        # La fecha difundida es la guardada
+        self.assertEqual([r['fecha'] for r in recibidos], [str(m.fecha_envio) for m in guardados])
+
+    @override_settings(CHAT_BUFFER_MENSAJES=2, CHAT_BUFFER_MS=10000)
+    def test_lote_fallido_guarda_los_mensajes_validos(self):
+        consumers._buffer_mensajes = None
+        self.addCleanup(setattr, consumers, '_buffer_mensajes', None)
+        buffer = consumers.get_buffer_mensajes()
+
+        async def volcar():
+            await buffer.agregar(MensajeChat(incidencia_id=self.incidencia.id, autor_id=self.agricultor.id, contenido='Válido'), 'chat_1', {'type': 'chat_message'})
+            await buffer.agregar(MensajeChat(incidencia_id=self.incidencia.id + 1000, autor_id=self.agricultor.id, contenido='Huérfano'), 'chat_1', {'type': 'chat_message'})
+        with self.assertLogs('core.consumers', 'ERROR'):
+            async_to_sync(volcar)()
+        self.assertEqual(list(MensajeChat.objects.values_list('contenido', flat=True)), ['Válido'])
+
+    @override_settings(INSTRUMENTACION=True)
+    def test_mide_cada_mensaje_con_sus_consultas(self):
+        instrumentacion._histogramas = None
+        self._enviar(['Hola', 'Sigue la fuga'])
+        rutas = {fila['ruta']: fila for fila in instrumentacion.get_histogramas().resumen()}
+        self.assertEqual(rutas['WS ChatConsumer']['peticiones'], 2)
+        # El INSERT se ejecuta en un hilo del EjecutorDB y aun así se atribuye al mensaje
+        self.assertEqual(rutas['WS ChatConsumer']['sql_consultas_media'], 1)
+
+
+class EjecutorDBTests(SimpleTestCase):
+    def test_limita_trabajos_en_vuelo_y_mide_la_espera(self):
+        ejecutor = EjecutorDB(hilos=2, max_pendientes=2)
+        en_vuelo = []
+        maximo = []
+
+        def trabajo():
+            en_vuelo.append(1)
+            maximo.append(len(en_vuelo))
+            time.sleep(0.01)
+            en_vuelo.pop()
+
+        async def lanzar():
+            await asyncio.gather(*(ejecutor.ejecutar(trabajo) for _ in range(6)))
+        async_to_sync(lanzar)()
+
+        metricas = ejecutor.metricas()
+        self.assertEqual(metricas['completados'], 6)
+        self.assertEqual(metricas['en_cola'], 0)
+        self.assertLessEqual(max(maximo), 2)
+        self.assertGreater(metricas['espera_max_ms'], 0)
+
+
+class SQLiteChannelLayerTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.ruta = f'{self.directorio}/channels.sqlite3'
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def test_group_send_llega_a_otro_proceso(self):
+        # Dos instancias sobre el mismo archivo equivalen a dos workers
+        emisor = SQLiteChannelLayer(ruta=self.ruta)
+        receptor = SQLiteChannelLayer(ruta=self.ruta)
+
+        async def probar():
+            canal = await receptor.new_channel()
+            await receptor.group_add('chat_1', canal)
+            await emisor.group_send('chat_1', {'type': 'chat_message', 'message': 'hola'})
+            return await asyncio.wait_for(receptor.receive(canal), timeout=5)
+        self.assertEqual(async_to_sync(probar)(), {'type': 'chat_message', 'message': 'hola'})
+
+    def test_capacidad_y_expiracion_de_grupos(self):
+        layer = SQLiteChannelLayer(ruta=self.ruta, capacity=1, group_expiry=0)
+
+        async def probar():
+            await layer.send('tarea', {'type': 'uno'})
+            with self.assertRaises(ChannelFull):
+                await layer.send('tarea', {'type': 'dos'})
+            self.assertEqual(await layer.receive('tarea'), {'type': 'uno'})
+
+            # Con group_expiry=0 la pertenencia caduca al instante
+            canal = await layer.new_channel()
+            await layer.group_add('chat_1', canal)
+            await layer.group_send('chat_1', {'type': 'perdido'})
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(layer.receive(canal), timeout=0.2)
+        async_to_sync(probar)()
+
+    def test_cola_local_llena_no_pierde_mensajes(self):
+        emisor = SQLiteChannelLayer(ruta=self.ruta, capacity=1)
+        receptor = SQLiteChannelLayer(ruta=self.ruta, capacity=1)
+
+        async def probar():
+            canal = await receptor.new_channel()
+            await emisor.send(canal, {'type': 'uno'})
+            self.assertEqual(await asyncio.wait_for(receptor.receive(canal), timeout=5), {'type': 'uno'})
+
+            # El lector pasa 'dos' a la cola local, que se llena; 'tres' se queda en la tabla
+            await emisor.send(canal, {'type': 'dos'})
+            while not receptor._colas[canal].full():
+                await asyncio.sleep(0.01)
+            await emisor.send(canal, {'type': 'tres'})
+            with self.assertRaises(ChannelFull):
+                await emisor.send(canal, {'type': 'cuatro'})
+
+            self.assertEqual(await asyncio.wait_for(receptor.receive(canal), timeout=5), {'type': 'dos'})
+            self.assertEqual(await asyncio.wait_for(receptor.receive(canal), timeout=5), {'type': 'tres'})
+        async_to_sync(probar)()
+
+
+class SaludTests(BaseAPITestCase):
+    def test_salud_no_requiere_autenticacion(self):
+        response = self.client.get('/api/salud/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['estado'], 'ok')
+        self.assertEqual(response.data['pid'], os.getpid())
+
+
+class MensajeChatHistorialTests(BaseAPITestCase):
+    def test_ultimos_mensajes_y_paginas_anteriores(self):
+        incidencia = self.crear_incidencia()
+        mensajes = [
+            MensajeChat.objects.create(incidencia=incidencia, autor=self.agricultor, contenido=f'Mensaje {i}')
+            for i in range(7)
+        ]
+        self.client.force_authenticate(self.agricultor)
+        url = f'/api/incidencias/{incidencia.id}/mensajes/'
+
+        # Permiso + página con select_related del autor, sin conteos extra
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'limit': 3})
+        self.assertEqual([m['id'] for m in response.data['results']], [m.id for m in mensajes[4:]])
+        self.assertEqual(response.data['results'][0]['autor_username'], 'agricultor')
+
+        vistos = response.data['results']
+        while response.data['before']:
+            response = self.client.get(url, {'limit': 3, 'before': response.data['before']})
+            vistos = response.data['results'] + vistos
+        self.assertEqual([m['id'] for m in vistos], [m.id for m in mensajes])
+
+
+class FotoDerivadosTests(BaseAPITestCase):
+    def _jpeg_rotado(self):
+        # 800x400 con orientación EXIF 6: debe verse en vertical
+        imagen = Image.new('RGB', (800, 400), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        salida = BytesIO()
+        imagen.save(salida, format='JPEG', exif=exif)
+        return salida.getvalue()
+
+    def test_subida_genera_derivados_sin_exif(self):
+        self.autenticar(self.agricultor)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidencias/', {
+                'descripcion': 'Fuga',
+                'foto': SimpleUploadedFile('foto.jpg', self._jpeg_rotado(), content_type='image/jpeg'),
+                'latitud': '14.6349', 'longitud': '-90.5069',
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        incidencia = Incidencia.objects.get(pk=response.data['id'])
+        with default_storage.open(incidencia.foto_miniatura.name) as archivo:
+            miniatura = Image.open(archivo)
+            miniatura.load()
+        self.assertEqual(miniatura.format, 'WEBP')
+        self.assertEqual(miniatura.size, (160, 320))
+        self.assertFalse(miniatura.getexif())
+        with default_storage.open(incidencia.foto_detalle.name) as archivo:
+            self.assertEqual(Image.open(archivo).size, (400, 800))
+
+        self.autenticar(self.admin)
+        detalle = self.client.get(f'/api/incidencias/{incidencia.id}/')
+        self.assertTrue(detalle.data['foto_miniatura'].endswith('_miniatura.webp'))
+
+    def test_cambiar_la_foto_regenera_los_derivados(self):
+        self.autenticar(self.agricultor)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/incidencias/', {
+                'descripcion': 'Fuga',
+                'foto': SimpleUploadedFile('foto.jpg', self._jpeg_rotado(), content_type='image/jpeg'),
+                'latitud': '14.6349', 'longitud': '-90.5069',
+            }, format='multipart')
+        incidencia_id = response.data['id']
+        anterior = Incidencia.objects.get(pk=incidencia_id).foto_miniatura.name
+
+        nueva = BytesIO()
+        Image.new('RGB', (300, 600), 'blue').save(nueva, format='JPEG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(f'/api/incidencias/{incidencia_id}/', {
+                'foto': SimpleUploadedFile('nueva.jpg', nueva.getvalue(), content_type='image/jpeg'),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['foto_miniatura'])
+        for callback in callbacks:
+            callback()
+
+        incidencia = Incidencia.objects.get(pk=incidencia_id)
+        self.assertNotEqual(incidencia.foto_miniatura.name, anterior)
+        with default_storage.open(incidencia.foto_miniatura.name) as archivo:
+            self.assertEqual(Image.open(archivo).size, (160, 320))
+
+    def test_comando_rellena_fotos_existentes(self):
+        nombre = default_storage.save('incidencias_fotos/vieja.jpg', BytesIO(self._jpeg_rotado()))
+        incidencia = self.crear_incidencia(foto=nombre)
+        salida = StringIO()
+        call_command('generar_derivados_fotos', stdout=salida)
+        incidencia.refresh_from_db()
+        self.assertTrue(incidencia.foto_miniatura.name)
+        self.assertTrue(incidencia.foto_detalle.name)
+        self.assertIn('1 incidencias', salida.getvalue())
+
+
+class SubidaFotoTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        salida = BytesIO()
+        Image.new('RGB', (64, 64), 'blue').save(salida, format='JPEG')
+        self.contenido = salida.getvalue()
+        self.autenticar(self.agricultor)
+
+    def _iniciar(self, sha256=None):
+        response = self.client.post('/api/subidas/', {
+            'nombre': '../foto.jpg',
+            'tamano': len(self.contenido),
+            'sha256': sha256 or hashlib.sha256(self.contenido).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def _parte(self, subida_id, offset, datos):
+        return self.client.generic(
+            'PATCH', f'/api/subidas/{subida_id}/', datos,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_subida_reanudable_y_adjunta_a_incidencia(self):
+        subida_id = self._iniciar()
+        mitad = len(self.contenido) // 2
+        response = self._parte(subida_id, 0, self.contenido[:mitad])
+        self.assertEqual(response.data['recibidos'], mitad)
+        self.assertEqual(response['Upload-Offset'], str(mitad))
+
+        # Reintento con un offset antiguo: se rechaza e indica desde dónde seguir
+        response = self._parte(subida_id, 0, self.contenido)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['recibidos'], mitad)
+
+        self.assertEqual(self.client.get(f'/api/subidas/{subida_id}/').data['recibidos'], mitad)
+        self._parte(subida_id, mitad, self.contenido[mitad:])
+        response = self.client.post(f'/api/subidas/{subida_id}/completar/')
+        self.assertTrue(response.data['completada'])
+
+        response = self.client.post('/api/incidencias/', {
+            'descripcion': 'Fuga', 'latitud': '14.6349', 'longitud': '-90.5069', 'subida': subida_id,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        incidencia = Incidencia.objects.get(pk=response.data['id'])
+        self.assertTrue(incidencia.foto.name.startswith('incidencias_fotos/foto'))
+        with default_storage.open(incidencia.foto.name) as archivo:
+            self.assertEqual(archivo.read(), self.contenido)
+        self.assertFalse(SubidaFoto.objects.filter(pk=subida_id).exists())
+
+    def test_sha256_incorrecto_reinicia_la_subida(self):
+        subida_id = self._iniciar(sha256='0' * 64)
+        self._parte(subida_id, 0, self.contenido)
+        response = self.client.post(f'/api/subidas/{subida_id}/completar/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(SubidaFoto.objects.get(pk=subida_id).recibidos, 0)
+
+    def test_subida_ajena_o_incompleta_no_se_adjunta(self):
+        subida_id = self._iniciar()
+        datos = {'descripcion': 'Fuga', 'latitud': '14.6349', 'longitud': '-90.5069', 'subida': subida_id}
+        # Sin completar
+        self.assertEqual(self.client.post('/api/incidencias/', datos, format='json').status_code, 400)
+
+        self._parte(subida_id, 0, self.contenido)
+        self.client.post(f'/api/subidas/{subida_id}/completar/')
+        otro = Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR')
+        self.autenticar(otro)
+        self.assertEqual(self.client.post('/api/incidencias/', datos, format='json').status_code, 400)
+
+
+class IncidenciaAreaTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Ciudad de Guatemala, a ~700 m, Antigua (~25 km) y Quetzaltenango (~110 km)
+        self.centro = self.crear_incidencia(latitud='14.6349', longitud='-90.5069')
+        self.cerca = self.crear_incidencia(latitud='14.6400', longitud='-90.5110')
+        self.antigua = self.crear_incidencia(latitud='14.5586', longitud='-90.7295')
+        self.xela = self.crear_incidencia(latitud='14.8347', longitud='-91.5180')
+        self.autenticar(self.admin)
+
+    def _ids(self, params):
+        response = self.client.get('/api/incidencias/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {inc['id'] for inc in response.data['results']}
+
+    def test_geohash_se_mantiene_al_guardar(self):
+        self.assertEqual(self.centro.geohash, geo.codificar(14.6349, -90.5069))
+        self.centro.latitud, self.centro.longitud = '14.8347', '-91.5180'
+        self.centro.save(update_fields=['latitud', 'longitud'])
+        self.centro.refresh_from_db()
+        self.assertEqual(self.centro.geohash, self.xela.geohash)
+
+    def test_bbox(self):
+        self.assertEqual(self._ids({'bbox': '-90.8,14.5,-90.4,14.7'}), {self.centro.id, self.cerca.id, self.antigua.id})
+        self.assertEqual(self._ids({'bbox': '-90.52,14.63,-90.50,14.635'}), {self.centro.id})
+        self.assertEqual(self.client.get('/api/incidencias/', {'bbox': '1,2,3'}).status_code, 400)
+
+    def test_near_con_radio(self):
+        self.assertEqual(self._ids({'near': '14.6349,-90.5069', 'radius': '1000'}), {self.centro.id, self.cerca.id})
+        self.assertEqual(self._ids({'near': '14.6349,-90.5069', 'radius': '30000'}), {self.centro.id, self.cerca.id, self.antigua.id})
+        # La caja del radio incluye la esquina, pero la distancia exacta la descarta
+        self.assertEqual(self._ids({'near': '14.6349,-90.5069', 'radius': '500'}), {self.centro.id})
+
+    def test_consulta_usa_el_indice_geohash(self):
+        queryset = FiltroArea()._en_caja(Incidencia.objects.all(), 14.63, -90.52, 14.64, -90.50)
+        self.assertIn('inc_geohash_idx', queryset.explain())
+
+
+class BusquedaTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.valvula = self.crear_incidencia(descripcion='Válvula atascada en el canal norte')
+        self.fuga = self.crear_incidencia(descripcion='Fuga en la tubería del sector 3', fontanero_asignado=self.fontanero)
+        self.chat = self.crear_incidencia(descripcion='Sin agua en la parcela')
+        MensajeChat.objects.create(incidencia=self.chat, autor=self.agricultor, contenido='Creo que es la valvula de entrada')
+        otro = Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR')
+        self.ajena = self.crear_incidencia(descripcion='Válvula rota', agricultor_reporta=otro)
+
+    def _ids(self, usuario, q, **params):
+        self.autenticar(usuario)
+        response = self.client.get('/api/incidencias/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [inc['id'] for inc in response.data['results']]
+
+    def test_sin_tildes_con_prefijos_y_ordenada_por_relevancia(self):
+        # La coincidencia en la descripción pesa más que la de un mensaje de chat
+        self.assertEqual(self._ids(self.admin, 'valvula')[-1], self.chat.id)
+        self.assertEqual(set(self._ids(self.admin, 'VALVULA')), {self.valvula.id, self.chat.id, self.ajena.id})
+        self.assertEqual(self._ids(self.admin, 'fuga tuberia'), [self.fuga.id])
+        self.assertEqual(self._ids(self.admin, 'fugas'), [])
+        # La sintaxis de FTS5 del texto se ignora: solo cuentan las palabras
+        self.assertEqual(self._ids(self.admin, '"fug* (tub'), [self.fuga.id])
+        self.assertEqual(self._ids(self.admin, '***'), [])
+
+    def test_resultados_limitados_al_rol_y_a_los_filtros(self):
+        self.assertEqual(set(self._ids(self.agricultor, 'válvula')), {self.valvula.id, self.chat.id})
+        self.assertEqual(self._ids(self.fontanero, 'válvula'), [])
+        self.assertEqual(self._ids(self.admin, 'válvula', estado='RESUELTO'), [])
+        self.assertEqual(len(self._ids(self.admin, 'válvula', page_size=1)), 1)
+
+    def test_indice_se_mantiene_y_se_reconstruye(self):
+        self.fuga.solucion = 'Se cambió el codo dañado'
+        self.fuga.save()
+        self.assertEqual(self._ids(self.admin, 'codo'), [self.fuga.id])
+        self.chat.delete()
+        self.assertNotIn(self.chat.id, self._ids(self.admin, 'valvula'))
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM core_busqueda')
+        self.assertEqual(self._ids(self.admin, 'codo'), [])
+        call_command('reconstruir_busqueda', stdout=StringIO())
+        self.assertEqual(self._ids(self.admin, 'codo'), [self.fuga.id])
+
+
+class ExportacionTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.resuelta = self.crear_incidencia(fontanero_asignado=self.fontanero, estado='RESUELTO', solucion='Cambio de válvula, "urgente"')
+        Incidencia.objects.filter(pk=self.resuelta.pk).update(fecha_resolucion=self.resuelta.fecha_creacion + timedelta(hours=3))
+        self.pendiente = self.crear_incidencia(descripcion='Fuga\nen dos líneas')
+        otro = Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR')
+        self.ajena = self.crear_incidencia(agricultor_reporta=otro)
+        for incidencia, texto in ((self.resuelta, 'Voy en camino'), (self.resuelta, 'Listo'), (self.ajena, 'Privado')):
+            MensajeChat.objects.create(incidencia=incidencia, autor=self.fontanero, contenido=texto)
+
+    async def _descargar(self, usuario, ruta, **params):
+        token = await sync_to_async(lambda: str(MyTokenObtainPairSerializer.get_token(usuario).access_token))()
+        response = await self.async_client.get(ruta, params, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        # Contenido asíncrono: bajo ASGI se envía por bloques sin acumularse
+        self.assertTrue(response.streaming and response.is_async)
+        return response, b''.join([bloque async for bloque in response.streaming_content]).decode()
+
+    async def test_csv_de_incidencias_con_filtros_usuarios_y_tiempos(self):
+        response, cuerpo = await self._descargar(
+            self.admin, '/api/incidencias/exportar/', estado='RESUELTO', usuarios='1', tiempos='1'
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="incidencias-', response['Content-Disposition'])
+        filas = list(csv.DictReader(StringIO(cuerpo)))
+        self.assertEqual(len(filas), 1)
+        self.assertEqual(filas[0]['id'], str(self.resuelta.id))
+        self.assertEqual(filas[0]['solucion'], 'Cambio de válvula, "urgente"')
+        self.assertEqual(filas[0]['fontanero_asignado_username'], 'fontanero')
+        self.assertEqual(filas[0]['tiempo_resolucion_horas'], '3.0')
+
+    async def test_ndjson_respeta_el_rol_y_csv_vacio_con_cabecera(self):
+        _, cuerpo = await self._descargar(self.agricultor, '/api/incidencias/exportar/', formato='ndjson')
+        filas = [json.loads(linea) for linea in cuerpo.splitlines()]
+        self.assertEqual({fila['id'] for fila in filas}, {self.resuelta.id, self.pendiente.id})
+        self.assertEqual(next(f for f in filas if f['id'] == self.pendiente.id)['descripcion'], 'Fuga\nen dos líneas')
+
+        _, cuerpo = await self._descargar(self.fontanero, '/api/incidencias/exportar/', estado='PENDIENTE')
+        self.assertEqual(cuerpo.splitlines(), [','.join(exportacion.incidencias(Incidencia.objects.all()).query.values_select)])
+
+    async def test_transcripciones_de_chat(self):
+        _, cuerpo = await self._descargar(self.agricultor, '/api/incidencias/exportar_chat/', usuarios='1')
+        filas = list(csv.DictReader(StringIO(cuerpo)))
+        self.assertEqual([fila['contenido'] for fila in filas], ['Voy en camino', 'Listo'])
+        self.assertEqual(filas[0]['autor_username'], 'fontanero')
+
+        _, cuerpo = await self._descargar(self.admin, '/api/incidencias/exportar_chat/', formato='ndjson')
+        self.assertEqual(len(cuerpo.splitlines()), 3)
+
+    def test_parametros_invalidos(self):
+        self.autenticar(self.admin)
+        self.assertEqual(self.client.get('/api/incidencias/exportar/', {'formato': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/incidencias/exportar/', {'fecha_creacion__gte': 'ayer'}).status_code, 400)
+
+    def test_filtro_por_fecha_en_el_listado(self):
+        Incidencia.objects.filter(pk=self.pendiente.pk).update(fecha_creacion=timezone.now() - timedelta(days=10))
+        self.autenticar(self.admin)
+        desde = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get('/api/incidencias/', {'fecha_creacion__gte': desde})
+        self.assertEqual({inc['id'] for inc in response.data['results']}, {self.resuelta.id, self.ajena.id})
+
+
+class ImportacionTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+
+    def _archivo(self, nombre, contenido):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+        return ruta
+
+    def test_importa_usuarios_con_contrasenas_cifradas_en_procesos(self):
+        ruta = self._archivo('usuarios.csv', (
+            'username,rol,password,email\n'
+            'ana,agricultor,clave-ana,ana@example.com\n'
+            'beto,FONTANERO,clave-beto,\n'
+            'carla,ADMINISTRADOR,clave-carla,\n'
+            'dani,AGRICULTOR,,\n'
+        ))
+        salida = StringIO()
+        call_command('importar_datos', 'usuarios', ruta, lote=3, procesos=2, stdout=salida)
+        self.assertIn('4 filas de usuarios importadas en 2 lotes', salida.getvalue())
+
+        ana = Usuario.objects.get(username='ana')
+        self.assertEqual((ana.rol, ana.email), ('AGRICULTOR', 'ana@example.com'))
+        self.assertTrue(ana.check_password('clave-ana'))
+        self.assertTrue(Usuario.objects.get(username='beto').check_password('clave-beto'))
+        self.assertTrue(Usuario.objects.get(username='carla').is_staff)
+        self.assertFalse(Usuario.objects.get(username='dani').has_usable_password())
+        self.assertTrue(Importacion.objects.get(archivo=ruta).completada)
+
+    def test_validacion_sin_escribir(self):
+        ruta = self._archivo('usuarios.ndjson', (
+            '{"username": "ana", "rol": "AGRICULTOR"}\n'
+            '{"username": "ana", "rol": "AGRICULTOR"}\n'
+            '{"username": "admin", "rol": "FONTANERO"}\n'
+            '{"username": "eva", "rol": "JARDINERO", "email": "no-es-email"}\n'
+            'esto no es json\n'
+        ))
+        errores = StringIO()
+        with self.assertRaisesMessage(CommandError, '4 filas no válidas'):
+            call_command('importar_datos', 'usuarios', ruta, validar=True, stdout=StringIO(), stderr=errores)
+        self.assertIn("Línea 2: el usuario 'ana' está repetido en el archivo", errores.getvalue())
+        self.assertIn("Línea 3: el usuario 'admin' ya existe", errores.getvalue())
+        self.assertIn("Línea 4: rol 'JARDINERO' no válido", errores.getvalue())
+        self.assertIn("email 'no-es-email' no válido", errores.getvalue())
+        self.assertIn('Línea 5: la línea no es un objeto JSON', errores.getvalue())
+        self.assertFalse(Usuario.objects.filter(username='ana').exists())
+        self.assertFalse(Importacion.objects.exists())
+
+    def test_importa_incidencias_historicas(self):
+        ruta = self._archivo('incidencias.ndjson', '\n'.join(json.dumps(fila) for fila in [
+            {'descripcion': 'Compuerta atascada', 'latitud': 14.6349, 'longitud': -90.5069,
+             'agricultor_reporta_username': 'agricultor', 'fecha_creacion': '2024-03-01T08:00:00-06:00'},
+            {'descripcion': 'Fuga en el canal', 'latitud': '14.7', 'longitud': '-90.4', 'estado': 'RESUELTO',
+             'solucion': 'Sellado', 'agricultor_reporta_username': 'agricultor', 'fontanero_asignado_username': 'fontanero',
+             'fecha_creacion': '2024-03-02T08:00:00-06:00', 'fecha_resolucion': '2024-03-02T14:00:00-06:00'},
+        ]) + '\n')
+        call_command('importar_datos', 'incidencias', ruta, stdout=StringIO())
+
+        fuga = Incidencia.objects.get(descripcion='Fuga en el canal')
+        self.assertEqual(fuga.geohash, geo.codificar(fuga.latitud, fuga.longitud))
+        self.assertEqual(fuga.fecha_creacion.year, 2024)
+        self.assertEqual(fuga.fecha_resolucion - fuga.fecha_creacion, timedelta(hours=6))
+        self.assertEqual(fuga.fontanero_asignado, self.fontanero)
+        # Los rollups y el índice de búsqueda incluyen las incidencias importadas
+        self.autenticar(self.admin)
+        datos = self.client.get('/api/estadisticas/', {'desde': '2024-03-01', 'hasta': '2024-03-31'}).json()
+        self.assertEqual(datos['tiempo_promedio_resolucion_horas'], 6.0)
+        resultados = self.client.get('/api/incidencias/', {'q': 'compuerta'}).json()['results']
+        self.assertEqual([r['descripcion'] for r in resultados], ['Compuerta atascada'])
+
+    def test_reanuda_tras_un_lote_con_errores(self):
+        filas = ['descripcion,latitud,longitud,agricultor_reporta_username,fontanero_asignado_username']
+        filas += [f'Incidencia {n},14.6,-90.5,agricultor,' for n in range(4)]
+        filas += ['Incidencia 4,14.6,-90.5,agricultor,agricultor', 'Incidencia 5,14.6,-90.5,agricultor,']
+        ruta = self._archivo('incidencias.csv', '\n'.join(filas) + '\n')
+
+        errores = StringIO()
+        with self.assertRaisesMessage(CommandError, 'se detuvo la importación'):
+            call_command('importar_datos', 'incidencias', ruta, lote=2, stdout=StringIO(), stderr=errores)
+        self.assertIn("Línea 6: el usuario 'agricultor' no es FONTANERO", errores.getvalue())
+        # Los dos primeros lotes quedan confirmados
+        self.assertEqual(Incidencia.objects.count(), 4)
+        self.assertEqual(Importacion.objects.get(archivo=ruta).filas, 4)
+
+        filas[5] = 'Incidencia 4,14.6,-90.5,agricultor,fontanero'
+        self._archivo('incidencias.csv', '\n'.join(filas) + '\n')
+        salida = StringIO()
+        call_command('importar_datos', 'incidencias', ruta, lote=2, stdout=salida)
+        self.assertIn('Reanudada tras 4 filas', salida.getvalue())
+        self.assertEqual(
+            sorted(Incidencia.objects.values_list('descripcion', flat=True)),
+            [f'Incidencia {n}' for n in range(6)],
+        )
+        self.assertTrue(Importacion.objects.get(archivo=ruta).completada)
+
+
+class ArchivoTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        ahora = timezone.now()
+        self.vieja = self.crear_incidencia(descripcion='Compuerta rota', fontanero_asignado=self.fontanero, estado='RESUELTO')
+        self.reciente = self.crear_incidencia(fontanero_asignado=self.fontanero, estado='RESUELTO')
+        self.pendiente = self.crear_incidencia()
+        Incidencia.objects.filter(pk=self.vieja.pk).update(
+            fecha_creacion=ahora - timedelta(days=430), fecha_resolucion=ahora - timedelta(days=425)
+        )
+        Incidencia.objects.filter(pk=self.reciente.pk).update(fecha_resolucion=ahora - timedelta(days=30))
+        Incidencia.objects.filter(pk=self.pendiente.pk).update(fecha_creacion=ahora - timedelta(days=800))
+        for autor, texto in ((self.agricultor, 'Se sale el agua'), (self.fontanero, 'Cambiada la compuerta')):
+            MensajeChat.objects.create(incidencia=self.vieja, autor=autor, contenido=texto)
+        Notificacion.objects.create(destinatario=self.agricultor, mensaje='Resuelta', incidencia=self.vieja, leida=True)
+        Notificacion.objects.create(destinatario=self.fontanero, mensaje='Asignada', incidencia=self.vieja)
+
+    def test_archiva_las_resueltas_antiguas_con_su_chat(self):
+        salida = StringIO()
+        call_command('archivar', meses=12, stdout=salida)
+        self.assertIn('Archivadas 1 incidencias, 2 mensajes y 2 notificaciones', salida.getvalue())
+
+        self.assertFalse(Incidencia.objects.filter(pk=self.vieja.pk).exists())
+        self.assertFalse(MensajeChat.objects.filter(incidencia_id=self.vieja.pk).exists())
+        self.assertFalse(Notificacion.objects.filter(incidencia_id=self.vieja.pk).exists())
+        self.assertEqual(set(Incidencia.objects.values_list('id', flat=True)), {self.reciente.id, self.pendiente.id})
+        archivada = IncidenciaArchivada.objects.get(pk=self.vieja.pk)
+        self.assertEqual((archivada.mensajes, archivada.fontanero_asignado_id), (2, self.fontanero.id))
+
+        # Las estadísticas reconstruidas siguen contando lo archivado
+        estadisticas.reconstruir()
+        self.assertEqual(EstadisticaResolucionDiaria.objects.aggregate(total=Sum('resueltas'))['total'], 2)
+        # Una segunda pasada no encuentra nada más que archivar
+        call_command('archivar', meses=12, stdout=salida)
+        self.assertEqual(IncidenciaArchivada.objects.count(), 1)
+
+    def test_simulacion_sin_escribir(self):
+        salida = StringIO()
+        call_command('archivar', meses=12, simular=True, stdout=salida)
+        self.assertIn('Se archivarían 1 incidencias, 2 mensajes y 2 notificaciones', salida.getvalue())
+        self.assertFalse(IncidenciaArchivada.objects.exists())
+        self.assertTrue(Incidencia.objects.filter(pk=self.vieja.pk).exists())
+
+    def test_consulta_de_solo_lectura_por_rol(self):
+        call_command('archivar', meses=12, stdout=StringIO())
+        ruta = f'/api/archivo/incidencias/{self.vieja.id}/'
+
+        self.autenticar(self.agricultor)
+        listado = self.client.get('/api/archivo/incidencias/').json()
+        self.assertEqual([fila['id'] for fila in listado['results']], [self.vieja.id])
+        self.assertNotIn('datos', listado['results'][0])
+        detalle = self.client.get(ruta).json()
+        self.assertEqual(detalle['fontanero_asignado_username'], 'fontanero')
+        self.assertEqual(detalle['incidencia']['descripcion'], 'Compuerta rota')
+        self.assertTrue(detalle['incidencia']['foto'].startswith('http://testserver/'))
+        self.assertEqual([m['contenido'] for m in detalle['mensajes']], ['Se sale el agua', 'Cambiada la compuerta'])
+        # Solo sus propias notificaciones
+        self.assertEqual([n['mensaje'] for n in detalle['notificaciones']], ['Resuelta'])
+        self.assertEqual(self.client.delete(ruta).status_code, 405)
+        # Ya no aparece en la búsqueda de incidencias activas
+        self.assertEqual(self.client.get('/api/incidencias/', {'q': 'compuerta'}).json()['results'], [])
+
+        self.autenticar(self.admin)
+        self.assertEqual(len(self.client.get(ruta).json()['notificaciones']), 2)
+        self.autenticar(Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR'))
+        self.assertEqual(self.client.get(ruta).status_code, 404)
+        self.assertEqual(self.client.get('/api/archivo/incidencias/').json()['results'], [])
+
+
+class MapaClustersTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Tres incidencias en Ciudad de Guatemala y una en Antigua
+        self.crear_incidencia(latitud='14.6349', longitud='-90.5069')
+        self.crear_incidencia(latitud='14.6351', longitud='-90.5071', estado='RESUELTO')
+        self.crear_incidencia(latitud='14.6350', longitud='-90.5070', agricultor_reporta=self.admin)
+        self.crear_incidencia(latitud='14.5586', longitud='-90.7295')
+        self.parametros = {'bbox': '-91.0,14.4,-90.2,14.9', 'zoom': 10}
+
+    def _clusters(self, usuario):
+        self.autenticar(usuario)
+        response = self.client.get('/api/incidencias/clusters/', self.parametros)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_agrupa_por_celda_con_desglose(self):
+        datos = self._clusters(self.admin)
+        grupos = sorted(datos['clusters'], key=lambda grupo: -grupo['total'])
+        self.assertEqual([grupo['total'] for grupo in grupos], [3, 1])
+        self.assertEqual(grupos[0]['por_estado'], {'PENDIENTE': 2, 'EN_PROCESO': 0, 'RESUELTO': 1})
+        self.assertAlmostEqual(grupos[0]['latitud'], 14.635, places=3)
+
+    def test_respeta_el_alcance_del_rol(self):
+        self.assertEqual(sum(grupo['total'] for grupo in self._clusters(self.agricultor)['clusters']), 3)
+        self.assertEqual(self._clusters(self.fontanero)['clusters'], [])
+
+    def test_teselas_en_cache_se_invalidan_al_cambiar(self):
+        self._clusters(self.admin)
+        datos = self._clusters(self.admin)
+        self.assertGreater(datos['teselas_en_cache'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.crear_incidencia(latitud='14.5590', longitud='-90.7290')
+        datos = self._clusters(self.admin)
+        self.assertEqual(datos['teselas_en_cache'], 0)
+        self.assertEqual(sum(grupo['total'] for grupo in datos['clusters']), 5)
+
+    def test_zoom_demasiado_alto_para_el_area(self):
+        self.autenticar(self.admin)
+        response = self.client.get('/api/incidencias/clusters/', {'bbox': '-91.0,14.4,-90.2,14.9', 'zoom': 18})
+        self.assertEqual(response.status_code, 400)
+
+
+class PerfilSQLiteTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_conexion_con_pragmas_de_produccion(self):
+        if connection.settings_dict.get('OPTIONS', {}).get('transaction_mode') != 'IMMEDIATE':
+            self.skipTest('SQLITE_PERFIL distinto de produccion')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_conexiones_de_peticiones_asgi_se_cierran(self):
+        cerradas = {}
+
+        def peticion(handler):
+            # Cada petición síncrona bajo ASGI corre en un hilo nuevo, con su conexión
+            conexion = connections['default']
+            conexion.ensure_connection()
+            with mock.patch.object(conexion, 'close') as close:
+                request_finished.send(sender=handler)
+            cerradas[handler] = close.called
+
+        for handler in (ASGIHandler, WSGIHandler):
+            hilo = threading.Thread(target=peticion, args=(handler,))
+            hilo.start()
+            hilo.join()
+        self.assertEqual(cerradas, {ASGIHandler: True, WSGIHandler: False})
+
+
+class SembrarDatosTests(BaseAPITestCase):
+    def test_siembra_datos_consistentes(self):
+        call_command(
+            'sembrar_datos', usuarios=20, incidencias=60, mensajes=200, notificaciones=30, stdout=StringIO()
+        )
+        incidencias = Incidencia.objects.filter(agricultor_reporta__username__startswith='bench_')
+        self.assertEqual(incidencias.count(), 60)
+        self.assertFalse(incidencias.filter(geohash='').exists())
+        # Las fechas se reparten en el pasado y los rollups cuadran con la tabla
+        primera = incidencias.order_by('fecha_creacion').first().fecha_creacion
+        self.assertGreater(primera, timezone.now() - timedelta(days=366))
+        self.assertLess(primera, timezone.now() - timedelta(days=1))
+        self.assertEqual(MensajeChat.objects.filter(incidencia__in=incidencias).count(), 200)
+        self.autenticar(self.admin)
+        response = self.client.get('/api/estadisticas/')
+        self.assertEqual(sum(fila['total'] for fila in response.data['incidencias_por_estado']), Incidencia.objects.count())
+
+
+@override_settings(INSTRUMENTACION=True, INSTRUMENTACION_UMBRAL_MS=10000)
+class InstrumentacionTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        instrumentacion._histogramas = None
+        self.crear_incidencia()
+        self.autenticar(self.admin)
+
+    def test_cabecera_server_timing(self):
+        response = self.client.get('/api/incidencias/')
+        cabecera = response['Server-Timing']
+        # Usuario del token y listado
+        for tramo in ('sql;dur=', 'desc="2 consultas"', 'vista;dur=', 'serializador;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(tramo, cabecera)
+
+    def test_histogramas_por_ruta_solo_para_administradores(self):
+        for _ in range(3):
+            self.client.get('/api/incidencias/')
+        response = self.client.get('/api/metricas/rutas/')
+        rutas = {fila['ruta']: fila for fila in response.data['rutas']}
+        self.assertEqual(rutas['GET incidencia-list']['peticiones'], 3)
+        self.assertEqual(sum(rutas['GET incidencia-list']['histograma']), 3)
+
+        self.autenticar(self.agricultor)
+        self.assertEqual(self.client.get('/api/metricas/rutas/').status_code, 403)
+
+    @override_settings(INSTRUMENTACION_UMBRAL_MS=0)
+    def test_registra_peticiones_lentas_con_sus_consultas(self):
+        with self.assertLogs('core.instrumentacion', 'WARNING') as registro:
+            self.client.get(f'/api/incidencias/{Incidencia.objects.get().id}/')
+        self.assertIn('GET incidencia-detail', registro.output[0])
+        self.assertIn('SELECT', registro.output[0])
+
+    @override_settings(INSTRUMENTACION=False)
+    def test_desactivada_no_anade_cabecera(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/incidencias/'))
+
+
+@unittest.skipUnless(settings.VISTAS_ASYNC, 'Con VISTAS_ASYNC=False las rutas las sirven las vistas de DRF')
+class VistasAsyncTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.incidencia = self.crear_incidencia(fontanero_asignado=self.fontanero, estado='EN_PROCESO')
+        self.crear_incidencia()
+        notificar(self.agricultor, 'Aviso de prueba')
+        call_command('reconstruir_estadisticas', stdout=StringIO())
+
+    def _token(self, usuario):
+        return f'Bearer {MyTokenObtainPairSerializer.get_token(usuario).access_token}'
+
+    def _sync(self, vista, ruta, usuario, **kwargs):
+        request = APIRequestFactory().get(ruta)
+        force_authenticate(request, usuario)
+        response = vista(request, **kwargs)
+        response.render()
+        return response
+
+    def test_rutas_servidas_por_vistas_asincronas(self):
+        for ruta in ('/api/dashboard-summary/', '/api/estadisticas/', '/api/notificaciones/no_leidas/', f'/api/incidencias/{self.incidencia.id}/'):
+            self.assertTrue(asyncio.iscoroutinefunction(resolve(ruta).func), ruta)
+
+    def test_respuestas_iguales_a_las_vistas_sincronas(self):
+        casos = [
+            (DashboardSummaryView.as_view(), '/api/dashboard-summary/', {}),
+            (EstadisticasView.as_view(), '/api/estadisticas/', {}),
+            (NotificacionViewSet.as_view({'get': 'no_leidas'}), '/api/notificaciones/no_leidas/', {}),
+            (IncidenciaViewSet.as_view({'get': 'retrieve'}), f'/api/incidencias/{self.incidencia.id}/', {'pk': self.incidencia.id}),
+        ]
+        for usuario in (self.admin, self.fontanero, self.agricultor):
+            for vista, ruta, kwargs in casos:
+                sincrona = self._sync(vista, ruta, usuario, **kwargs)
+                asincrona = self.client.get(ruta, HTTP_AUTHORIZATION=self._token(usuario))
+                self.assertEqual(asincrona.status_code, sincrona.status_code, (usuario.rol, ruta))
+                self.assertEqual(asincrona.json(), json.loads(sincrona.content), (usuario.rol, ruta))
+
+    def test_autenticacion_y_permisos(self):
+        sin_token = self.client.get('/api/dashboard-summary/')
+        self.assertEqual(sin_token.status_code, 401)
+        self.assertEqual(sin_token['WWW-Authenticate'], 'Bearer realm="api"')
+        self.assertEqual(self.client.get('/api/dashboard-summary/', HTTP_AUTHORIZATION='Bearer x').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.agricultor))
+        self.assertEqual(self.client.get('/api/estadisticas/').status_code, 403)
+        self.assertEqual(self.client.post('/api/dashboard-summary/').status_code, 405)
+        self.assertEqual(self.client.get('/api/estadisticas/', {'desde': 'ayer'}).status_code, 403)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.admin))
+        self.assertEqual(self.client.get('/api/estadisticas/', {'desde': 'ayer'}).status_code, 400)
+
+    def test_errores_con_el_exception_handler_configurado(self):
+        def manejador(exc, contexto):
+            response = exception_handler(exc, contexto)
+            response.data['ruta'] = contexto['request'].path
+            return response
+
+        with mock.patch.object(api_settings, 'EXCEPTION_HANDLER', manejador):
+            self.autenticar(self.agricultor)
+            response = self.client.get('/api/estadisticas/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['ruta'], '/api/estadisticas/')
+
+    def test_detalle_fuera_del_alcance_del_rol(self):
+        ajena = self.crear_incidencia(agricultor_reporta=Usuario.objects.create_user(username='otro', password='x', rol='AGRICULTOR'))
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.agricultor))
+        self.assertEqual(self.client.get(f'/api/incidencias/{ajena.id}/').status_code, 404)
+
+    def test_escrituras_del_detalle_siguen_en_el_viewset(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.admin))
+        response = self.client.patch(f'/api/incidencias/{self.incidencia.id}/', {'descripcion': 'Fuga reparada'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.incidencia.refresh_from_db()
+        self.assertEqual(self.incidencia.descripcion, 'Fuga reparada')
+
+    @override_settings(INSTRUMENTACION=True, INSTRUMENTACION_UMBRAL_MS=10000)
+    async def test_cadena_asincrona_con_instrumentacion(self):
+        response = await self.async_client.get(
+            '/api/notificaciones/no_leidas/', headers={'Authorization': await sync_to_async(self._token)(self.agricultor)}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'no_leidas': 1})
+        # Usuario y conteo: las dos consultas se cuentan aunque se ejecuten fuera del event loop
+        self.assertIn('desc="2 consultas"', response['Server-Timing'])
+
+
+class JWTSinEstadoTests(BaseAPITestCase):
+    def setUp(self):
+        super().setUp()
+        # Como con JWT_SIN_ESTADO=True: las vistas de DRF fijan sus clases de autenticación al importarse
+        clases = ('core.autenticacion.JWTSinEstadoAuthentication',)
+        self.enterContext(override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_AUTHENTICATION_CLASSES': clases}))
+        self.enterContext(mock.patch.object(APIView, 'authentication_classes', [autenticacion.JWTSinEstadoAuthentication]))
+        self.incidencia = self.crear_incidencia(fontanero_asignado=self.fontanero, estado='EN_PROCESO')
+
+    def _token(self, usuario):
+        return f'Bearer {MyTokenObtainPairSerializer.get_token(usuario).access_token}'
+
+    def _consultas(self, *args, **kwargs):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(*args, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return [consulta['sql'] for consulta in consultas.captured_queries]
+
+    def test_peticiones_sin_consultar_el_usuario(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.agricultor))
+        primera = self._consultas('/api/incidencias/')
+        segunda = self._consultas('/api/incidencias/')
+        # Solo la primera petición lee el estado del usuario; las siguientes salen de la caché
+        self.assertEqual(len(segunda), len(primera) - 1)
+        self.assertFalse(any('"core_usuario"."rol"' in sql and 'JOIN' not in sql for sql in segunda))
+        self.assertEqual(self.client.get('/api/incidencias/').json()['results'][0]['id'], self.incidencia.id)
+
+    def test_escrituras_con_el_usuario_del_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.agricultor))
+        response = self.client.post(f'/api/incidencias/{self.incidencia.id}/mensajes/', {'incidencia': self.incidencia.id, 'contenido': 'Hola'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['autor_username'], 'agricultor')
+        self.assertEqual(self.client.patch(f'/api/incidencias/{self.incidencia.id}/update_status/', {'estado': 'PENDIENTE'}, format='json').status_code, 403)
+
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.fontanero))
+        response = self.client.patch(f'/api/incidencias/{self.incidencia.id}/update_status/', {'estado': 'PENDIENTE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MensajeChat.objects.get().autor, self.agricultor)
+
+    def test_bajas_y_cambios_de_rol(self):
+        self.client.credentials(HTTP_AUTHORIZATION=self._token(self.agricultor))
+        self.assertEqual(self.client.get('/api/estadisticas/').status_code, 403)
+
+        # Guardar el usuario invalida su entrada en la caché de este proceso
+        self.agricultor.rol = 'ADMINISTRADOR'
+        self.agricultor.is_staff = True
+        self.agricultor.save()
+        self.assertEqual(self.client.get('/api/estadisticas/').status_code, 200)
+
+        # Un UPDATE sin señales se aplica cuando caduca la entrada
+        Usuario.objects.filter(pk=self.agricultor.pk).update(is_active=False)
+        self.assertEqual(self.client.get('/api/estadisticas/').status_code, 200)
+        with override_settings(JWT_USUARIOS_CACHE_S=0):
+            autenticacion.olvidar(self.agricultor.pk)
+            self.assertEqual(self.client.get('/api/estadisticas/').status_code, 401)
@@ -1,24 +1,38 @@
 # Archivo: core/urls.py
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
-from .views import UsuarioViewSet, IncidenciaViewSet, NotificacionViewSet, EstadisticasView, MensajeChatViewSet, DashboardSummaryView
+from .views import UsuarioViewSet, IncidenciaViewSet, IncidenciaArchivadaViewSet, NotificacionViewSet, EstadisticasView, MensajeChatViewSet, DashboardSummaryView, MetricasEjecutorDBView, MetricasRutasView, SaludView, SubidaFotoViewSet
+from . import vistas_async
 
 # El router principal
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet)
 router.register(r'incidencias', IncidenciaViewSet, basename='incidencia')
 router.register(r'notificaciones', NotificacionViewSet, basename='notificaciones')
+router.register(r'subidas', SubidaFotoViewSet, basename='subidas')
+router.register(r'archivo/incidencias', IncidenciaArchivadaViewSet, basename='incidencia-archivada')
 
 # Router anidado para los mensajes de chat dentro de las incidencias
 incidencias_router = routers.NestedSimpleRouter(router, r'incidencias', lookup='incidencia')
 incidencias_router.register(r'mensajes', MensajeChatViewSet, basename='incidencia-mensajes')
 
+# Versiones asíncronas de las lecturas más frecuentes, con los mismos nombres de ruta.
+# Van antes que el router y las vistas de DRF para tener prioridad sobre ellos.
+rutas_async = [
+    path('incidencias/<int:pk>/', vistas_async.incidencia_detalle, name='incidencia-detail'),
+    path('notificaciones/no_leidas/', vistas_async.notificaciones_no_leidas, name='notificaciones-no-leidas'),
+    path('estadisticas/', vistas_async.estadisticas, name='estadisticas'),
+    path('dashboard-summary/', vistas_async.dashboard_summary, name='dashboard-summary'),
+]
 
-
-urlpatterns = [
+urlpatterns = (rutas_async if settings.VISTAS_ASYNC else []) + [
     path('', include(router.urls)),
     path('', include(incidencias_router.urls)),
     path('estadisticas/', EstadisticasView.as_view(), name='estadisticas'),
     path('dashboard-summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
+    path('metricas/db-executor/', MetricasEjecutorDBView.as_view(), name='metricas-db-executor'),
+    path('metricas/rutas/', MetricasRutasView.as_view(), name='metricas-rutas'),
+    path('salud/', SaludView.as_view(), name='salud'),
 ]
\ No newline at end of file
@@ -1,18 +1,29 @@
 # Archivo: core/views.py
 from rest_framework import viewsets, permissions
-from .models import Usuario, Incidencia, Notificacion, MensajeChat
-from .serializers import UsuarioSerializer, IncidenciaSerializer, NotificacionSerializer, MensajeChatSerializer
+from .models import Usuario, Incidencia, IncidenciaArchivada, Notificacion, MensajeChat, EstadisticaEstadoDiaria, EstadisticaResolucionDiaria, SubidaFoto
+from .serializers import UsuarioSerializer, IncidenciaSerializer, IncidenciaArchivadaSerializer, IncidenciaListSerializer, NotificacionSerializer, MensajeChatSerializer, SubidaFotoSerializer, url_foto
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django_filters.rest_framework import DjangoFilterBackend
 from .serializers import MyTokenObtainPairSerializer
+from .pagination import IncidenciaArchivadaCursorPagination, IncidenciaCursorPagination, MensajeChatPagination
+from .filtros import FiltroArea
+from .autenticacion import usuario_de
+from .notificaciones import contar_no_leidas
+from . import archivo, busqueda, exportacion, fotos, instrumentacion, mapa, outbox, subidas
+from .ejecutor_db import get_ejecutor_db
 
 from rest_framework.views import APIView
-from django.db.models import Count, Avg, F
-from django.db.models.functions import Cast
-from django.db.models import DurationField
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F, Func, Q, Subquery, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
 
 # --- AÑADE ESTA NUEVA CLASE DE PERMISO ---
@@ -58,7 +69,31 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(rol=rol.upper())
         return queryset
 
-    
+
+def incidencias_visibles(user):
+    """
+    Filtra automáticamente las incidencias según el rol del usuario.
+    - Administradores: Ven todas las incidencias.
+    - Fontaneros: Ven solo las incidencias que tienen asignadas.
+    - Agricultores: Ven solo las incidencias que han reportado.
+    Compartido por IncidenciaViewSet y su detalle asíncrono (core/vistas_async.py).
+    """
+    # select_related evita una consulta extra por usuario al serializar el detalle
+    incidencias = Incidencia.objects.select_related('agricultor_reporta', 'fontanero_asignado')
+    if user.rol == 'ADMINISTRADOR':
+        # Los administradores pueden ver todas las incidencias
+        return incidencias.all().order_by('-fecha_creacion', '-id')
+    elif user.rol == 'FONTANERO':
+        # Los fontaneros solo ven las incidencias asignadas a ellos
+        return incidencias.filter(fontanero_asignado_id=user.id).order_by('-fecha_creacion', '-id')
+    elif user.rol == 'AGRICULTOR':
+        # Los agricultores solo ven las incidencias que ellos reportaron
+        return incidencias.filter(agricultor_reporta_id=user.id).order_by('-fecha_creacion', '-id')
+
+    # En caso de un rol no esperado, no devolver nada.
+    return Incidencia.objects.none()
+
+
 class IncidenciaViewSet(viewsets.ModelViewSet):
     # queryset = Incidencia.objects.all().order_by('-fecha_creacion')
     serializer_class = IncidenciaSerializer
@@ -66,33 +101,75 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     # --- PARA USO DE FILTROS ---
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['estado', 'fontanero_asignado'] # <-- Define los campos filtrables
+    filter_backends = [DjangoFilterBackend, FiltroArea]
+    filterset_fields = {  # <-- Define los campos filtrables
+        'estado': ['exact'],
+        'fontanero_asignado': ['exact'],
+        # ?fecha_creacion__gte=2025-01-01&fecha_creacion__lte=2025-02-01
+        'fecha_creacion': ['gte', 'lte'],
+    }
+    # ?bbox= y ?near=lat,lng&radius= usan el índice geohash (ver core/filtros.py)
+
+    # --- PAGINACIÓN POR CURSOR ORDENADA POR (fecha_creacion, id) ---
+    pagination_class = IncidenciaCursorPagination
 
     def get_queryset(self):
+        return incidencias_visibles(self.request.user)
+
+    def list(self, request, *args, **kwargs):
         """
-        Este método filtra automáticamente las incidencias según el rol del usuario.
-        - Administradores: Ven todas las incidencias.
-        - Fontaneros: Ven solo las incidencias que tienen asignadas.
-        - Agricultores: Ven solo las incidencias que han reportado.
+        Listado con la representación ligera: una sola consulta con JOIN a los
+        usuarios, sin instanciar modelos ni serializers por fila.
+        Con ?q= devuelve las incidencias que coinciden ordenadas por relevancia.
         """
-        user = self.request.user
-        if user.rol == 'ADMINISTRADOR':
-            # Los administradores pueden ver todas las incidencias
-            return Incidencia.objects.all().order_by('-fecha_creacion')
-        elif user.rol == 'FONTANERO':
-            # Los fontaneros solo ven las incidencias asignadas a ellos
-            return Incidencia.objects.filter(fontanero_asignado=user).order_by('-fecha_creacion')
-        elif user.rol == 'AGRICULTOR':
-            # Los agricultores solo ven las incidencias que ellos reportaron
-            return Incidencia.objects.filter(agricultor_reporta=user).order_by('-fecha_creacion')
-        
-        # En caso de un rol no esperado, no devolver nada.
-        return Incidencia.objects.none()
+        queryset = self.filter_queryset(self.get_queryset())
+        texto = request.query_params.get('q', '').strip()
+        if texto:
+            return self._buscar(request, queryset, texto)
+        filas = IncidenciaListSerializer.proyectar(queryset)
+
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            serializer = IncidenciaListSerializer(page, request=request)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = IncidenciaListSerializer(filas, request=request)
+        return Response(serializer.data)
 
+    def _buscar(self, request, queryset, texto):
+        """
+        Búsqueda de texto completo (core/busqueda.py) dentro de las incidencias
+        visibles para el usuario y de los demás filtros. Devuelve una sola página
+        de page_size resultados, los más relevantes, sin cursor.
+        """
+        ids = busqueda.buscar(queryset, texto, self.paginator.get_page_size(request))
+        filas = {fila['id']: fila for fila in IncidenciaListSerializer.proyectar(queryset.filter(id__in=ids))}
+        ordenadas = [filas[incidencia_id] for incidencia_id in ids if incidencia_id in filas]
+        serializer = IncidenciaListSerializer(ordenadas, request=request)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
+
+    # Los rollups de estadísticas se actualizan con las señales de Incidencia (core/estadisticas.py):
+    # cada escritura va en una transacción para que la incidencia y sus contadores se confirmen juntos
     def perform_create(self, serializer):
         # Asigna automáticamente el usuario autenticado como el que reporta la incidencia
-        serializer.save(agricultor_reporta=self.request.user)
+        with transaction.atomic():
+            incidencia = serializer.save(agricultor_reporta=usuario_de(self.request.user))
+        # Los derivados de la foto se generan en segundo plano tras confirmar la transacción
+        transaction.on_commit(lambda: fotos.programar_derivados(incidencia.id, incidencia.foto.name))
+
+    def perform_update(self, serializer):
+        foto_anterior = serializer.instance.foto.name
+        with transaction.atomic():
+            incidencia = serializer.save()
+            if incidencia.foto.name != foto_anterior:
+                # Los derivados de la foto anterior dejan de servirse hasta que se generen los nuevos
+                Incidencia.objects.filter(pk=incidencia.pk).update(foto_miniatura=None, foto_detalle=None)
+                incidencia.foto_miniatura = incidencia.foto_detalle = None
+                transaction.on_commit(lambda: fotos.programar_derivados(incidencia.id, incidencia.foto.name))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
 
     # --- AÑADE ESTA NUEVA ACCIÓN ---
     @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAdminUser])
@@ -114,14 +191,16 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
 
         incidencia.fontanero_asignado = fontanero
         incidencia.estado = Incidencia.Estado.EN_PROCESO # Opcional: cambiar estado a "En Proceso" al asignar
-        incidencia.save()
+        with transaction.atomic():
+            incidencia.save()
 
-        #--- LÓGICA PARA NOTIFICAR AL FONTANERO ---
-        Notificacion.objects.create(
-            destinatario=fontanero,
-            mensaje=f"Se te ha asignado la incidencia #{incidencia.id}.",
-            incidencia=incidencia
-        )
+            #--- LÓGICA PARA NOTIFICAR AL FONTANERO (la crea y la empuja el worker del outbox) ---
+            outbox.encolar(
+                'notificacion',
+                destinatario_id=fontanero.id,
+                mensaje=f"Se te ha asignado la incidencia #{incidencia.id}.",
+                incidencia_id=incidencia.id,
+            )
 
         serializer = self.get_serializer(incidencia)
         return Response(serializer.data)
@@ -136,7 +215,7 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
         incidencia = self.get_object()
 
         # Verificación de permisos: solo el fontanero asignado o un admin pueden cambiar el estado.
-        if request.user != incidencia.fontanero_asignado and not request.user.is_staff:
+        if request.user.id != incidencia.fontanero_asignado_id and not request.user.is_staff:
             return Response({'error': 'No tienes permiso para actualizar esta incidencia.'}, status=status.HTTP_403_FORBIDDEN)
 
         nuevo_estado = request.data.get('estado')
@@ -150,22 +229,127 @@ class IncidenciaViewSet(viewsets.ModelViewSet):
             if not solucion_texto:
                 return Response({'error': 'La descripción de la solución es obligatoria para resolver la incidencia.'}, status=status.HTTP_400_BAD_REQUEST)
             incidencia.solucion = solucion_texto
-        
 
-        incidencia.save()
+        with transaction.atomic():
+            incidencia.save()
 
-        # --- LÓGICA PARA NOTIFICAR AL AGRICULTOR ---
-        agricultor = incidencia.agricultor_reporta
-        Notificacion.objects.create(
-            destinatario=agricultor,
-            mensaje=f"El estado de tu incidencia #{incidencia.id} ha sido actualizado a {nuevo_estado}.",
-            incidencia=incidencia
-        )
+            # --- LÓGICA PARA NOTIFICAR AL AGRICULTOR (la crea y la empuja el worker del outbox) ---
+            outbox.encolar(
+                'notificacion',
+                destinatario_id=incidencia.agricultor_reporta_id,
+                mensaje=f"El estado de tu incidencia #{incidencia.id} ha sido actualizado a {nuevo_estado}.",
+                incidencia_id=incidencia.id,
+            )
 
         serializer = self.get_serializer(incidencia)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        """
+        Descarga en streaming de las incidencias visibles, con los mismos filtros que el listado.
+        Parámetros: formato=csv|ndjson, usuarios=1 (usernames), tiempos=1 (horas de resolución).
+        Ej: /api/incidencias/exportar/?formato=csv&estado=RESUELTO&tiempos=1
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.FORMATOS:
+            return Response({'error': "El formato debe ser 'csv' o 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+        filas = exportacion.incidencias(
+            self.filter_queryset(self.get_queryset()),
+            usuarios=self._opcion(request, 'usuarios'),
+            tiempos=self._opcion(request, 'tiempos'),
+        )
+        return exportacion.respuesta(filas, formato, 'incidencias')
+
+    @action(detail=False, methods=['get'])
+    def exportar_chat(self, request):
+        """
+        Transcripciones de chat de las incidencias visibles que cumplen los filtros
+        del listado, agrupadas por incidencia y en orden cronológico.
+        Parámetros: formato=csv|ndjson, usuarios=1 (username del autor).
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.FORMATOS:
+            return Response({'error': "El formato debe ser 'csv' o 'ndjson'."}, status=status.HTTP_400_BAD_REQUEST)
+        filas = exportacion.mensajes(
+            self.filter_queryset(self.get_queryset()),
+            usuarios=self._opcion(request, 'usuarios'),
+        )
+        return exportacion.respuesta(filas, formato, 'chat')
+
+    @staticmethod
+    def _opcion(request, nombre):
+        return request.query_params.get(nombre, '').lower() in ('1', 'true', 'si', 'sí')
+
+    @action(detail=False, methods=['get'])
+    def clusters(self, request):
+        """
+        Clusters de incidencias para el mapa, con el mismo alcance por rol que el listado.
+        Ej: /api/incidencias/clusters/?bbox=-91.0,14.4,-90.2,14.9&zoom=10
+        Cada cluster trae total, centroide y desglose por estado.
+        """
+        try:
+            min_lng, min_lat, max_lng, max_lat = (float(parte) for parte in request.query_params.get('bbox', '').split(','))
+            zoom = int(request.query_params.get('zoom', ''))
+        except ValueError:
+            return Response(
+                {'error': 'Se requieren bbox=min_lng,min_lat,max_lng,max_lat y zoom.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= max_lng <= 180 and 0 <= zoom <= mapa.ZOOM_MAX):
+            return Response({'error': 'bbox o zoom fuera de rango.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # La caché se separa por alcance: lo que ve cada rol (y cada usuario no administrador)
+        user = request.user
+        alcance = 'todas' if user.rol == 'ADMINISTRADOR' else f'{user.rol}:{user.id}'
+        try:
+            grupos, teselas_en_cache = mapa.clusters(
+                self.get_queryset(), alcance, min_lat, min_lng, max_lat, max_lng, zoom
+            )
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'zoom': zoom, 'clusters': grupos, 'teselas_en_cache': teselas_en_cache})
     
     
+class IncidenciaArchivadaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Consulta de solo lectura de las incidencias archivadas (ver core/archivo.py),
+    con el mismo reparto por rol que IncidenciaViewSet. El listado no descomprime
+    nada; el detalle añade la incidencia completa, su chat y las notificaciones.
+    Ej: /api/archivo/incidencias/?fecha_resolucion__gte=2024-01-01
+    """
+    serializer_class = IncidenciaArchivadaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'fontanero_asignado': ['exact'],
+        'fecha_resolucion': ['gte', 'lte'],
+        'fecha_creacion': ['gte', 'lte'],
+    }
+    pagination_class = IncidenciaArchivadaCursorPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        archivadas = IncidenciaArchivada.objects.select_related('agricultor_reporta', 'fontanero_asignado')
+        if self.action == 'list':
+            archivadas = archivadas.defer('datos')
+        if user.rol == 'ADMINISTRADOR':
+            return archivadas.order_by('-fecha_resolucion', '-id')
+        elif user.rol == 'FONTANERO':
+            return archivadas.filter(fontanero_asignado_id=user.id).order_by('-fecha_resolucion', '-id')
+        elif user.rol == 'AGRICULTOR':
+            return archivadas.filter(agricultor_reporta_id=user.id).order_by('-fecha_resolucion', '-id')
+        return IncidenciaArchivada.objects.none()
+
+    def retrieve(self, request, *args, **kwargs):
+        archivada = self.get_object()
+        datos = archivo.detalle(archivada, request.user)
+        # Las fotos se guardan por nombre: la URL se construye como en el listado de incidencias
+        for campo in ('foto', 'foto_miniatura', 'foto_detalle'):
+            datos['incidencia'][campo] = url_foto(request, datos['incidencia'][campo])
+        return Response({**self.get_serializer(archivada).data, **datos})
+
+
 class NotificacionViewSet(viewsets.ModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
@@ -175,21 +359,66 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         """
         Devuelve solo las notificaciones del usuario autenticado.
         """
-        return self.request.user.notificaciones.all()
+        return Notificacion.objects.filter(destinatario_id=self.request.user.id)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Sin parámetros devuelve la lista completa (acotada por la retención).
+        Con ?since=<cursor> devuelve solo las notificaciones nuevas o modificadas
+        desde ese cursor, junto con el cursor para la siguiente sincronización.
+        Ej: /api/notificaciones/?since=2025-09-04T18:23:00.000000Z
+        """
+        since = request.query_params.get('since')
+        if since is None:
+            return super().list(request, *args, **kwargs)
+
+        desde = parse_datetime(since)
+        if desde is None:
+            return Response({'error': 'El parámetro since no es un cursor válido.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.get_queryset().filter(fecha_actualizacion__gt=desde).order_by('fecha_actualizacion')
+        notificaciones = list(queryset)
+        cursor = notificaciones[-1].fecha_actualizacion if notificaciones else desde
+        return Response({
+            'results': self.get_serializer(notificaciones, many=True).data,
+            'cursor': cursor.isoformat(),
+            'no_leidas': contar_no_leidas(request.user.id),
+        })
+
+    @action(detail=False, methods=['get'])
+    def no_leidas(self, request):
+        """
+        Contador de notificaciones no leídas, resuelto con el índice
+        (destinatario, leida, fecha_creacion).
+        """
+        return Response({'no_leidas': contar_no_leidas(request.user.id)})
     
     @action(detail=True, methods=['patch'])
     def marcar_leida(self, request, pk=None):
         """
         Acción para marcar una notificación como leída.
         """
-        notificacion = self.get_object()
+        # Un único UPDATE, limitado a las notificaciones del propio usuario
+        actualizadas = self.get_queryset().filter(pk=pk).update(leida=True, fecha_actualizacion=timezone.now())
+        if not actualizadas:
+            return Response({'error': 'Notificación no encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'Notificación marcada como leída'})
+
+    @action(detail=False, methods=['patch'])
+    def marcar_todas_leidas(self, request):
+        """
+        Marca como leídas todas las notificaciones del usuario, o solo las
+        indicadas en el body: {"ids": [1, 2, 3]}. Se resuelve con un único UPDATE.
+        """
+        queryset = self.get_queryset().filter(leida=False)
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list):
+                return Response({'error': 'ids debe ser una lista.'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(id__in=ids)
 
-        if notificacion.destinatario == request.user:
-            notificacion.leida = True
-            notificacion.save()
-            return Response({'status': 'Notificación marcada como leída'})
-        else:
-            return Response({'error': 'No tienes permiso para modificar esta notificación.'}, status=status.HTTP_403_FORBIDDEN)
+        actualizadas = queryset.update(leida=True, fecha_actualizacion=timezone.now())
+        return Response({'actualizadas': actualizadas, 'no_leidas': contar_no_leidas(request.user.id)})
 
 
 class MyTokenObtainPairView(TokenObtainPairView):
@@ -208,40 +437,105 @@ class EstadisticasView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, *args, **kwargs):
-        total_incidencias = Incidencia.objects.count()
-        
-        # Conteo de incidencias por estado
-        incidencias_por_estado = Incidencia.objects.values('estado').annotate(total=Count('estado')).order_by('estado')
-        
-        # Tiempo promedio de resolución en horas (desde creación a actualización de estado RESUELTO)
-        tiempo_resolucion = Incidencia.objects.filter(estado='RESUELTO').annotate(
-            tiempo_transcurrido=Cast(F('fecha_actualizacion') - F('fecha_creacion'), DurationField())
-        ).aggregate(
-            promedio_horas=Avg('tiempo_transcurrido')
-        )
+        """
+        Lee los rollups diarios (ver core/estadisticas.py), así que el coste depende
+        del número de días del rango y no del histórico de incidencias.
+        Parámetros opcionales:
+          - desde / hasta (YYYY-MM-DD): rango por fecha de creación para los conteos
+            por estado y por fecha de resolución para los tiempos y el top de fontaneros.
+          - agrupacion: 'dia' (por defecto) o 'semana' para la serie temporal.
+        """
+        rango, agrupacion, error = self.parametros(request.query_params)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Convertir timedelta a un formato más legible (ej. horas)
-        promedio_timedelta = tiempo_resolucion.get('promedio_horas')
-        promedio_horas = promedio_timedelta.total_seconds() / 3600 if promedio_timedelta else 0
+        resoluciones, consultas = self.consultas(rango)
+        filas = {nombre: list(queryset) for nombre, queryset in consultas.items()}
+        tiempo_resolucion = resoluciones.aggregate(**self.agregado_resolucion())
+        return Response(self.componer(filas, tiempo_resolucion, agrupacion))
 
-        # Fontaneros con más incidencias resueltas
-        fontaneros_top = Usuario.objects.filter(
-            rol='FONTANERO', 
-            incidencias_asignadas__estado='RESUELTO'
-        ).annotate(
-            incidencias_resueltas=Count('incidencias_asignadas')
-        ).order_by('-incidencias_resueltas')[:5] # Top 5
+    @staticmethod
+    def parametros(query_params):
+        """
+        Devuelve (rango, agrupacion, error) a partir de los parámetros de la petición.
+        """
+        rango = Q()
+        for nombre, lookup in (('desde', 'fecha__gte'), ('hasta', 'fecha__lte')):
+            valor = query_params.get(nombre)
+            if valor:
+                fecha = parse_date(valor)
+                if fecha is None:
+                    return None, None, f'El parámetro {nombre} debe tener el formato YYYY-MM-DD.'
+                rango &= Q(**{lookup: fecha})
+        agrupacion = query_params.get('agrupacion', 'dia')
+        if agrupacion not in ('dia', 'semana'):
+            return None, None, "La agrupación debe ser 'dia' o 'semana'."
+        return rango, agrupacion, None
+
+    @staticmethod
+    def consultas(rango):
+        """
+        Consultas de filas del informe, sin evaluar, para que la vista síncrona y la
+        asíncrona (core/vistas_async.py) ejecuten exactamente las mismas. Devuelve
+        también el queryset de resoluciones sobre el que se calcula agregado_resolucion().
+        """
+        estados = EstadisticaEstadoDiaria.objects.filter(rango)
+        resoluciones = EstadisticaResolucionDiaria.objects.filter(rango)
+        return resoluciones, {
+            # Conteo de incidencias por estado
+            'por_estado': estados.values('estado').annotate(total=Sum('total')).filter(total__gt=0).order_by('estado'),
+            # Fontaneros con más incidencias resueltas
+            'fontaneros_top': resoluciones.filter(
+                fontanero__rol='FONTANERO'
+            ).values('fontanero__username').annotate(
+                incidencias_resueltas=Sum('resueltas')
+            ).filter(incidencias_resueltas__gt=0).order_by('-incidencias_resueltas')[:5], # Top 5
+            # Serie temporal de incidencias creadas y resueltas
+            'creadas': estados.values('fecha').annotate(total=Sum('total')),
+            'resueltas': resoluciones.values('fecha').annotate(total=Sum('resueltas')),
+        }
 
-        datos = {
+    @staticmethod
+    def agregado_resolucion():
+        # Tiempo promedio de resolución, a partir de la suma y el conteo acumulados
+        return {'segundos': Sum('segundos_resolucion'), 'resueltas': Sum('resueltas')}
+
+    @classmethod
+    def componer(cls, filas, tiempo_resolucion, agrupacion):
+        incidencias_por_estado = filas['por_estado']
+        total_incidencias = sum(fila['total'] for fila in incidencias_por_estado)
+
+        # Tiempo promedio de resolución en horas
+        promedio_horas = 0
+        if tiempo_resolucion['resueltas']:
+            promedio_horas = tiempo_resolucion['segundos'] / tiempo_resolucion['resueltas'] / 3600
+
+        serie = {}
+        for fila in filas['creadas']:
+            periodo = cls._periodo(fila['fecha'], agrupacion)
+            serie.setdefault(periodo, {'creadas': 0, 'resueltas': 0})['creadas'] += fila['total']
+        for fila in filas['resueltas']:
+            periodo = cls._periodo(fila['fecha'], agrupacion)
+            serie.setdefault(periodo, {'creadas': 0, 'resueltas': 0})['resueltas'] += fila['total']
+
+        return {
             'total_incidencias': total_incidencias,
-            'incidencias_por_estado': list(incidencias_por_estado),
+            'incidencias_por_estado': incidencias_por_estado,
             'tiempo_promedio_resolucion_horas': round(promedio_horas, 2),
             'top_fontaneros': [
-                {'username': f.username, 'incidencias_resueltas': f.incidencias_resueltas} for f in fontaneros_top
-            ]
+                {'username': f['fontanero__username'], 'incidencias_resueltas': f['incidencias_resueltas']} for f in filas['fontaneros_top']
+            ],
+            'serie_temporal': [
+                {'periodo': periodo.isoformat(), **valores} for periodo, valores in sorted(serie.items())
+            ],
         }
-        
-        return Response(datos)
+
+    @staticmethod
+    def _periodo(fecha, agrupacion):
+        # Las semanas se identifican por su lunes
+        if agrupacion == 'semana':
+            return fecha - timedelta(days=fecha.weekday())
+        return fecha
     
 class CanViewChat(permissions.BasePermission):
     """
@@ -249,14 +543,23 @@ class CanViewChat(permissions.BasePermission):
     """
     def has_permission(self, request, view):
         incidencia_id = view.kwargs.get('incidencia_pk')
-        try:
-            incidencia = Incidencia.objects.get(id=incidencia_id)
-            es_agricultor = incidencia.agricultor_reporta == request.user
-            es_fontanero = incidencia.fontanero_asignado == request.user
-            es_admin = request.user.rol == 'ADMINISTRADOR'
-            return es_agricultor or es_fontanero or es_admin
-        except Incidencia.DoesNotExist:
+        return self.puede_ver(request.user, incidencia_id)
+
+    @staticmethod
+    def puede_ver(user, incidencia_id):
+        """
+        Regla compartida con ChatConsumer. Solo lee los ids de los participantes,
+        sin instanciar la incidencia ni sus usuarios.
+        """
+        participantes = Incidencia.objects.filter(id=incidencia_id).values_list(
+            'agricultor_reporta_id', 'fontanero_asignado_id'
+        ).first()
+        if participantes is None:
             return False
+        es_agricultor = participantes[0] == user.id
+        es_fontanero = participantes[1] == user.id
+        es_admin = user.rol == 'ADMINISTRADOR'
+        return es_agricultor or es_fontanero or es_admin
             
 
 class MensajeChatViewSet(viewsets.ModelViewSet):
@@ -267,6 +570,7 @@ class MensajeChatViewSet(viewsets.ModelViewSet):
     queryset = MensajeChat.objects.none() 
     serializer_class = MensajeChatSerializer
     permission_classes = [permissions.IsAuthenticated, CanViewChat]
+    pagination_class = MensajeChatPagination
 
     def get_queryset(self):
         """
@@ -274,16 +578,9 @@ class MensajeChatViewSet(viewsets.ModelViewSet):
         especificada en la URL.
         """
         incidencia_id = self.kwargs.get('incidencia_pk')
-        
-        # --- Añadimos prints para depuración ---
-        print(f"--- API: Buscando historial de chat para incidencia ID: {incidencia_id} ---")
-        
         if incidencia_id:
-            queryset = MensajeChat.objects.filter(incidencia_id=incidencia_id)
-            print(f"--- API: Encontrados {queryset.count()} mensajes. ---")
-            return queryset
-        
-        print("--- API: No se proporcionó incidencia_id, devolviendo queryset vacío. ---")
+            # select_related evita una consulta por mensaje al serializar autor_username
+            return MensajeChat.objects.filter(incidencia_id=incidencia_id).select_related('autor')
         return MensajeChat.objects.none()
     
     def perform_create(self, serializer):
@@ -292,7 +589,152 @@ class MensajeChatViewSet(viewsets.ModelViewSet):
         """
         incidencia_id = self.kwargs.get('incidencia_pk')
         incidencia = Incidencia.objects.get(pk=incidencia_id)
-        serializer.save(autor=self.request.user, incidencia=incidencia)
+        serializer.save(autor=usuario_de(self.request.user), incidencia=incidencia)
+
+
+class SubidaFotoViewSet(viewsets.ModelViewSet):
+    """
+    Subida de fotos por partes y reanudable:
+      1. POST /api/subidas/ con nombre, tamano y sha256 -> id
+      2. PATCH /api/subidas/<id>/ con los bytes en el cuerpo y la cabecera
+         Upload-Offset; responde con el nuevo offset. Tras un corte, GET
+         /api/subidas/<id>/ indica 'recibidos' para continuar desde ahí.
+      3. POST /api/subidas/<id>/completar/ verifica el SHA-256.
+      4. POST /api/incidencias/ con subida=<id> en lugar de foto.
+    """
+    serializer_class = SubidaFotoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        return SubidaFoto.objects.filter(usuario_id=self.request.user.id)
+
+    def perform_create(self, serializer):
+        subida = serializer.save(usuario_id=self.request.user.id)
+        subidas.iniciar(subida)
+
+    def perform_destroy(self, instance):
+        subidas.borrar_parcial(instance.id)
+        instance.delete()
+
+    def partial_update(self, request, *args, **kwargs):
+        subida = self.get_object()
+        if subida.completada:
+            return Response({'error': 'La subida ya está completada.'}, status=status.HTTP_409_CONFLICT)
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return Response({'error': 'Se requiere la cabecera Upload-Offset.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # request.stream lee el cuerpo crudo por bloques; nunca se accede a request.data
+        try:
+            recibidos = subidas.escribir_parte(subida, offset, request.stream)
+        except subidas.OffsetInvalido as error:
+            recibidos = error.args[0]
+            return Response(
+                {'error': 'El offset no coincide con el último confirmado.', 'recibidos': recibidos},
+                status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(recibidos)}
+            )
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        return Response({'recibidos': recibidos}, headers={'Upload-Offset': str(recibidos)})
+
+    @action(detail=True, methods=['post'])
+    def completar(self, request, pk=None):
+        """
+        Comprueba que llegaron todos los bytes, el SHA-256 declarado y que es una
+        imagen. Si el resumen no coincide se descarta lo recibido.
+        """
+        subida = self.get_object()
+        if subida.completada:
+            return Response(self.get_serializer(subida).data)
+        if subida.recibidos != subida.tamano:
+            return Response(
+                {'error': 'Faltan bytes por subir.', 'recibidos': subida.recibidos},
+                status=status.HTTP_409_CONFLICT
+            )
+        if subidas.sha256(subida) != subida.sha256:
+            subidas.reiniciar(subida)
+            return Response({'error': 'El SHA-256 no coincide; la subida se ha reiniciado.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not subidas.es_imagen(subida):
+            return Response({'error': 'El archivo no es una imagen válida.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        subida.completada = True
+        subida.save(update_fields=['completada'])
+        return Response(self.get_serializer(subida).data)
+
+
+# Momento en que arrancó este proceso (cada worker ASGI tiene el suyo)
+INICIO_PROCESO = time.time()
+
+
+class SaludView(APIView):
+    """
+    Estado del worker que atiende la petición. El supervisor de 'manage.py servir'
+    la consulta en el puerto privado de cada worker para detectar workers colgados.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return Response({
+            'estado': 'ok',
+            'worker': os.environ.get('WORKER_ID'),
+            'pid': os.getpid(),
+            'segundos_activo': round(time.time() - INICIO_PROCESO, 1),
+        })
+
+
+class MetricasRutasView(APIView):
+    """
+    Histogramas de latencia y consultas SQL por ruta de este worker, en la
+    ventana de los últimos INSTRUMENTACION_VENTANA_MINUTOS. Requiere INSTRUMENTACION=True.
+    Accesible solo para administradores.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'activa': settings.INSTRUMENTACION,
+            'worker': os.environ.get('WORKER_ID'),
+            'pid': os.getpid(),
+            'ventana_minutos': settings.INSTRUMENTACION_VENTANA_MINUTOS,
+            'limites_ms': instrumentacion.LIMITES_MS,
+            'rutas': instrumentacion.get_histogramas().resumen(),
+        })
+
+
+class MetricasEjecutorDBView(APIView):
+    """
+    Métricas del ejecutor de base de datos de los WebSockets (cola, espera, hilos).
+    Accesible solo para administradores.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_ejecutor_db().metricas())
+
+
+def conteos_por_estado(campo, campo_estado):
+    """
+    Genera un Count condicional por cada estado de Incidencia, con claves
+    'estado_<ESTADO>', para combinarlos en un solo aggregate().
+    """
+    return {
+        f'estado_{estado}': Count(campo, filter=Q(**{campo_estado: estado}))
+        for estado in Incidencia.Estado.values
+    }
+
+
+class ConteoEscalar(Subquery):
+    """
+    Subconsulta escalar que aggregate() admite junto a los Count de la consulta
+    principal. No depende de las filas agregadas, así que su valor es el mismo
+    aunque la tabla principal esté vacía.
+    """
+    contains_aggregate = True
 
 
 # AÑADE UNA NUEVA VISTA PARA DASHBOARD DE USUARIO
@@ -303,29 +745,66 @@ class DashboardSummaryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user = request.user
+        consulta = self.consulta(request.user)
+        conteos = consulta[0].aggregate(**consulta[1]) if consulta else None
+        return Response(self.componer(request.user, conteos))
+
+    @staticmethod
+    def consulta(user):
+        """
+        (queryset, agregaciones) del resumen según el rol, o None si el rol no
+        tiene resumen. Cada rama se resuelve con una única consulta de
+        agregación condicional.
+        """
+        if user.rol == 'AGRICULTOR':
+            return Incidencia.objects.filter(agricultor_reporta_id=user.id), {
+                'total_reportadas': Count('id'),
+                **conteos_por_estado('id', 'estado'),
+            }
+        elif user.rol == 'FONTANERO':
+            return Incidencia.objects.filter(fontanero_asignado_id=user.id), {
+                'total_asignadas': Count('id'),
+                'pendientes_de_atender': Count('id', filter=~Q(estado='RESUELTO')),
+                **conteos_por_estado('id', 'estado'),
+            }
+        elif user.rol == 'ADMINISTRADOR':
+            return Incidencia.objects.all(), {
+                'total_incidencias': Count('id'),
+                'pendientes_de_asignar': Count('id', filter=Q(estado='PENDIENTE', fontanero_asignado__isnull=True)),
+                'total_usuarios': ConteoEscalar(
+                    Usuario.objects.order_by().values(n=Func(F('id'), function='COUNT'))
+                ),
+                **conteos_por_estado('id', 'estado'),
+            }
+        return None
+
+    @staticmethod
+    def componer(user, conteos):
         data = {
             'rol': user.rol,
             'username': user.username,
             'summary': {}
         }
-
         if user.rol == 'AGRICULTOR':
             data['summary'] = {
-                'total_reportadas': Incidencia.objects.filter(agricultor_reporta=user).count(),
-                'pendientes': Incidencia.objects.filter(agricultor_reporta=user, estado='PENDIENTE').count(),
-                'en_proceso': Incidencia.objects.filter(agricultor_reporta=user, estado='EN_PROCESO').count(),
+                'total_reportadas': conteos['total_reportadas'],
+                'pendientes': conteos['estado_PENDIENTE'],
+                'en_proceso': conteos['estado_EN_PROCESO'],
             }
         elif user.rol == 'FONTANERO':
             data['summary'] = {
-                'total_asignadas': Incidencia.objects.filter(fontanero_asignado=user).count(),
-                'pendientes_de_atender': Incidencia.objects.filter(fontanero_asignado=user).exclude(estado='RESUELTO').count(),
+                'total_asignadas': conteos['total_asignadas'],
+                'pendientes_de_atender': conteos['pendientes_de_atender'],
             }
         elif user.rol == 'ADMINISTRADOR':
             data['summary'] = {
-                'total_incidencias': Incidencia.objects.count(),
-                'pendientes_de_asignar': Incidencia.objects.filter(estado='PENDIENTE', fontanero_asignado__isnull=True).count(),
-                'total_usuarios': Usuario.objects.count(),
+                'total_incidencias': conteos['total_incidencias'],
+                'pendientes_de_asignar': conteos['pendientes_de_asignar'],
+                'total_usuarios': conteos['total_usuarios'],
             }
-            
-        return Response(data)
+
+        if data['summary']:
+            data['summary']['por_estado'] = {
+                estado: conteos[f'estado_{estado}'] for estado in Incidencia.Estado.values
+            }
+        return data
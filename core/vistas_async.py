@@ -0,0 +1,155 @@
+# Archivo: core/vistas_async.py
+"""
+Versiones asíncronas de las lecturas más frecuentes de la API. Con VISTAS_ASYNC=True
+se sirven en las mismas rutas que sus vistas de DRF (ver core/urls.py):
+  - GET /api/dashboard-summary/
+  - GET /api/estadisticas/
+  - GET /api/notificaciones/no_leidas/
+  - GET /api/incidencias/<id>/ (PUT, PATCH y DELETE siguen en IncidenciaViewSet)
+
+Bajo ASGI una vista síncrona ocupa un hilo durante toda la petición; estas corren en
+el event loop y solo pasan a un hilo mientras dura cada consulta (aaggregate, acount,
+aget y async for del ORM). Las consultas son las mismas que las de las vistas síncronas
+(se comparten sus métodos), y la autenticación y los permisos usan las mismas clases
+de DRF, así que las respuestas coinciden, salvo la API navegable: siempre es JSON.
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, permissions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from .models import Incidencia
+from .notificaciones import acontar_no_leidas
+from .serializers import IncidenciaSerializer
+from .views import DashboardSummaryView, EstadisticasView, IncidenciaViewSet, incidencias_visibles
+
+METODOS_LECTURA = ('GET', 'HEAD')
+
+
+def respuesta(request, datos, status=200, headers=None):
+    """
+    Response de DRF ya preparada para renderizarse como JSON.
+    """
+    return _preparar(request, Response(datos, status=status, headers=headers))
+
+
+def _preparar(request, response):
+    # Lo que haría APIView.finalize_response con el renderer JSON
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = JSONRenderer.media_type
+    response.renderer_context = {'request': request, 'response': response}
+    return response
+
+
+@sync_to_async
+def _autenticar(request):
+    """
+    Recorre DEFAULT_AUTHENTICATION_CLASSES igual que el Request de DRF. La carga
+    del usuario queda dentro de la clase de autenticación, así que se ejecuta en un hilo.
+    """
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        resultado = clase().authenticate(request)
+        if resultado is not None:
+            return resultado[0]
+    return api_settings.UNAUTHENTICATED_USER()
+
+
+def _error(request, exc, kwargs):
+    """
+    Respuesta de error a través de EXCEPTION_HANDLER, con los ajustes previos de
+    APIView.handle_exception. Si el handler no la trata, la excepción sigue su curso.
+    """
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        autenticadores = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        if autenticadores:
+            exc.auth_header = autenticadores[0]().authenticate_header(request)
+        else:
+            exc.status_code = 403
+    contexto = {'view': None, 'args': (), 'kwargs': kwargs, 'request': request}
+    response = api_settings.EXCEPTION_HANDLER(exc, contexto)
+    if response is None:
+        raise exc
+    if isinstance(exc, exceptions.MethodNotAllowed):
+        response['Allow'] = ', '.join(METODOS_LECTURA)
+    return _preparar(request, response)
+
+
+def lectura_async(*clases_permiso):
+    """
+    Decorador de las vistas de este módulo: autentica, comprueba los permisos,
+    admite solo GET/HEAD y convierte las excepciones de la API en la misma
+    respuesta que daría APIView, a través de EXCEPTION_HANDLER.
+    """
+    def decorador(vista):
+        @csrf_exempt
+        @functools.wraps(vista)
+        async def envoltorio(request, *args, **kwargs):
+            try:
+                request.user = await _autenticar(request)
+                for clase in clases_permiso:
+                    if not clase().has_permission(request, None):
+                        if not request.user.is_authenticated:
+                            raise exceptions.NotAuthenticated()
+                        raise exceptions.PermissionDenied()
+                if request.method not in METODOS_LECTURA:
+                    raise exceptions.MethodNotAllowed(request.method)
+                return await vista(request, *args, **kwargs)
+            except Exception as exc:
+                return _error(request, exc, kwargs)
+        return envoltorio
+    return decorador
+
+
+@lectura_async(permissions.IsAuthenticated)
+async def dashboard_summary(request):
+    consulta = DashboardSummaryView.consulta(request.user)
+    conteos = await consulta[0].aaggregate(**consulta[1]) if consulta else None
+    return respuesta(request, DashboardSummaryView.componer(request.user, conteos))
+
+
+@lectura_async(permissions.IsAdminUser)
+async def estadisticas(request):
+    rango, agrupacion, error = EstadisticasView.parametros(request.GET)
+    if error:
+        return respuesta(request, {'error': error}, status=400)
+
+    resoluciones, consultas = EstadisticasView.consultas(rango)
+    filas = {}
+    for nombre, queryset in consultas.items():
+        filas[nombre] = [fila async for fila in queryset]
+    tiempo_resolucion = await resoluciones.aaggregate(**EstadisticasView.agregado_resolucion())
+    return respuesta(request, EstadisticasView.componer(filas, tiempo_resolucion, agrupacion))
+
+
+@lectura_async(permissions.IsAuthenticated)
+async def notificaciones_no_leidas(request):
+    return respuesta(request, {'no_leidas': await acontar_no_leidas(request.user.id)})
+
+
+@lectura_async(permissions.IsAuthenticated)
+async def _leer_incidencia(request, pk):
+    try:
+        incidencia = await incidencias_visibles(request.user).aget(pk=pk)
+    except Incidencia.DoesNotExist:
+        # Mismo mensaje que get_object_or_404 en IncidenciaViewSet.get_object
+        raise exceptions.NotFound(f'No {Incidencia._meta.object_name} matches the given query.')
+    # select_related ya trae a los usuarios: serializar no toca la base de datos
+    serializer = IncidenciaSerializer(incidencia, context={'request': request})
+    return respuesta(request, serializer.data)
+
+
+_incidencia_sync = IncidenciaViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+
+
+@csrf_exempt
+async def incidencia_detalle(request, pk):
+    if request.method in METODOS_LECTURA:
+        return await _leer_incidencia(request, pk)
+    # Las escrituras no cambian: las atiende el ViewSet en un hilo
+    return await sync_to_async(_incidencia_sync)(request, pk=pk)
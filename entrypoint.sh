@@ -3,7 +3,7 @@
 # Salir inmediatamente si un comando falla
 set -e
 
-# Aplicar migraciones de la base de datos
+# Aplicar migraciones de la base de datos (una sola vez, antes de que arranquen los workers)
 echo "Aplicando migraciones de la base de datos..."
 python manage.py migrate
 
@@ -1,35 +1,98 @@
 // Archivo: frontend/src/context/NotificacionContext.js
-import React, { createContext, useState, useContext, useEffect, useCallback } from 'react';
+import React, { createContext, useState, useContext, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 
 const NotificacionContext = createContext();
 
 export const useNotificaciones = () => useContext(NotificacionContext);
 
+// Espera antes de reintentar la conexión del WebSocket (ms)
+const RECONEXION_MS = 5000;
+
 export const NotificacionProvider = ({ children }) => {
     const [notificaciones, setNotificaciones] = useState([]);
     const [noLeidasCount, setNoLeidasCount] = useState(0);
+    const socket = useRef(null);
+    const cursor = useRef(null); // Cursor de la última sincronización (?since=)
 
+    // La API REST solo se usa para la carga inicial y tras cada reconexión
     const fetchNotificaciones = useCallback(async () => {
         const tokenData = JSON.parse(localStorage.getItem('authToken'));
         if (!tokenData) return;
+        const headers = { 'Authorization': `Bearer ${tokenData.access}` };
 
         try {
-            const response = await axios.get('/api/notificaciones/', {
-                headers: { 'Authorization': `Bearer ${tokenData.access}` }
-            });
+            if (cursor.current) {
+                // Reconexión: solo pedimos lo nuevo o modificado desde el último cursor
+                const response = await axios.get('/api/notificaciones/', {
+                    headers, params: { since: cursor.current }
+                });
+                const cambios = response.data.results;
+                setNotificaciones(prev => {
+                    const ids = new Set(cambios.map(n => n.id));
+                    return [...cambios, ...prev.filter(n => !ids.has(n.id))]
+                        .sort((a, b) => new Date(b.fecha_creacion) - new Date(a.fecha_creacion));
+                });
+                setNoLeidasCount(response.data.no_leidas);
+                cursor.current = response.data.cursor;
+                return;
+            }
+
+            const response = await axios.get('/api/notificaciones/', { headers });
             setNotificaciones(response.data);
             const count = response.data.filter(n => !n.leida).length;
             setNoLeidasCount(count);
+            cursor.current = response.data.reduce(
+                (max, n) => (!max || n.fecha_actualizacion > max ? n.fecha_actualizacion : max),
+                null
+            ) || '1970-01-01T00:00:00Z';
         } catch (error) {
             console.error("Error al cargar notificaciones", error);
         }
     }, []);
 
     useEffect(() => {
-        fetchNotificaciones(); // Carga inicial
-        const interval = setInterval(fetchNotificaciones, 30000); // Polling cada 30 segundos
-        return () => clearInterval(interval);
+        let reconexion = null;
+        let cerrado = false;
+
+        const conectar = () => {
+            const tokenData = JSON.parse(localStorage.getItem('authToken'));
+            if (!tokenData) return;
+
+            fetchNotificaciones(); // Carga inicial (o resincronización tras reconectar)
+
+            const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+            const wsUrl = `${protocol}//${window.location.host}/ws/notificaciones/?token=${tokenData.access}`;
+            socket.current = new WebSocket(wsUrl);
+
+            // Cada notificación nueva llega empujada por el servidor con el contador actualizado
+            socket.current.onmessage = (e) => {
+                const data = JSON.parse(e.data);
+                if (data.tipo === 'notificacion') {
+                    setNotificaciones(prev => [data.notificacion, ...prev]);
+                    setNoLeidasCount(data.no_leidas);
+                }
+            };
+
+            socket.current.onclose = () => {
+                if (!cerrado) {
+                    reconexion = setTimeout(conectar, RECONEXION_MS);
+                }
+            };
+
+            socket.current.onerror = (err) => {
+                console.error('Error de WebSocket de notificaciones:', err);
+            };
+        };
+
+        conectar();
+        return () => {
+            cerrado = true;
+            clearTimeout(reconexion);
+            if (socket.current) {
+                socket.current.close();
+            }
+        };
     }, [fetchNotificaciones]);
 
     const marcarComoLeida = async (id) => {
@@ -38,15 +101,31 @@ export const NotificacionProvider = ({ children }) => {
             await axios.patch(`/api/notificaciones/${id}/marcar_leida/`, {}, {
                 headers: { 'Authorization': `Bearer ${tokenData.access}` }
             });
-            fetchNotificaciones(); // Recargar notificaciones
+            // Actualización local, sin volver a descargar la lista
+            setNotificaciones(prev => prev.map(n => n.id === id ? { ...n, leida: true } : n));
+            setNoLeidasCount(prev => Math.max(prev - 1, 0));
         } catch (error) {
             console.error("Error al marcar como leída", error);
         }
     };
 
+    // Marca todas las notificaciones como leídas con una sola petición
+    const marcarTodasComoLeidas = async () => {
+        try {
+            const tokenData = JSON.parse(localStorage.getItem('authToken'));
+            const response = await axios.patch('/api/notificaciones/marcar_todas_leidas/', {}, {
+                headers: { 'Authorization': `Bearer ${tokenData.access}` }
+            });
+            setNotificaciones(prev => prev.map(n => ({ ...n, leida: true })));
+            setNoLeidasCount(response.data.no_leidas);
+        } catch (error) {
+            console.error("Error al marcar todas como leídas", error);
+        }
+    };
+
     return (
-        <NotificacionContext.Provider value={{ notificaciones, noLeidasCount, marcarComoLeida }}>
+        <NotificacionContext.Provider value={{ notificaciones, noLeidasCount, marcarComoLeida, marcarTodasComoLeidas }}>
             {children}
         </NotificacionContext.Provider>
     );
-};
\ No newline at end of file
+};
@@ -79,6 +79,19 @@ const DashboardPage = () => {
         </>
     );
 
+    // Conteo por estado, incluido en el mismo resumen para todos los roles
+    const renderPorEstado = () => {
+        const porEstado = summaryData.summary.por_estado;
+        if (!porEstado) return null;
+        return (
+            <Grid container spacing={3} sx={{ mt: 1 }}>
+                <Grid item xs={12} sm={4}><SummaryCard title="Pendientes" value={porEstado.PENDIENTE} icon={<HourglassEmptyIcon color="warning" sx={{ fontSize: 40 }} />} /></Grid>
+                <Grid item xs={12} sm={4}><SummaryCard title="En Proceso" value={porEstado.EN_PROCESO} icon={<EngineeringIcon color="info" sx={{ fontSize: 40 }} />} /></Grid>
+                <Grid item xs={12} sm={4}><SummaryCard title="Resueltas" value={porEstado.RESUELTO} icon={<AssignmentTurnedInIcon color="success" sx={{ fontSize: 40 }} />} /></Grid>
+            </Grid>
+        );
+    };
+
     const renderDashboardByRole = () => {
         switch (summaryData.rol) {
             case 'ADMINISTRADOR': return renderAdminDashboard();
@@ -99,6 +112,7 @@ const DashboardPage = () => {
                 </Typography>
             </Box>
             {renderDashboardByRole()}
+            {summaryData.rol !== 'AGRICULTOR' && renderPorEstado()}
         </Container>
     );
 };
@@ -29,6 +29,8 @@ const DetalleIncidenciaPage = () => {
 
     // Estado para el chat
     const [chatMessages, setChatMessages] = useState([]);
+    const [chatBefore, setChatBefore] = useState(null); // id para pedir mensajes anteriores
+    const mantenerScroll = useRef(false);
     const [newMessage, setNewMessage] = useState('');
     const chatSocket = useRef(null);
     const chatLogRef = useRef(null);
@@ -63,7 +65,11 @@ const DetalleIncidenciaPage = () => {
                     const chatRes = await axios.get(`/api/incidencias/${id}/mensajes/`, {
                         headers: { 'Authorization': `Bearer ${token}` }
                     });
-                    if (isMounted) setChatMessages(chatRes.data);
+                    // La API devuelve los últimos mensajes: { results, before }
+                    if (isMounted) {
+                        setChatMessages(chatRes.data.results);
+                        setChatBefore(chatRes.data.before);
+                    }
                 } catch (err) {
                     console.log("No se pudo cargar el historial del chat (puede ser por permisos).");
                 }
@@ -124,11 +130,32 @@ const DetalleIncidenciaPage = () => {
     }, [id, fetchIncidencia]);
 
     useEffect(() => {
+        // Al cargar mensajes anteriores no saltamos al final del chat
+        if (mantenerScroll.current) {
+            mantenerScroll.current = false;
+            return;
+        }
         if (chatLogRef.current) {
             chatLogRef.current.scrollTop = chatLogRef.current.scrollHeight;
         }
     }, [chatMessages]);
 
+    const cargarMensajesAnteriores = async () => {
+        if (!chatBefore) return;
+        try {
+            const tokenData = JSON.parse(localStorage.getItem('authToken'));
+            const chatRes = await axios.get(`/api/incidencias/${id}/mensajes/`, {
+                headers: { 'Authorization': `Bearer ${tokenData.access}` },
+                params: { before: chatBefore }
+            });
+            mantenerScroll.current = true;
+            setChatMessages(prev => [...chatRes.data.results, ...prev]);
+            setChatBefore(chatRes.data.before);
+        } catch (err) {
+            console.error("Error al cargar mensajes anteriores", err);
+        }
+    };
+
     const handleAssign = async () => {
         if (!selectedFontanero) {
             showSnackbar('Por favor, selecciona un fontanero.', 'warning');
@@ -219,7 +246,7 @@ const DetalleIncidenciaPage = () => {
                         {incidencia.foto && (
                             <Box sx={{ flex: 1, minWidth: 0 }}>
                                 <Typography variant="subtitle1" gutterBottom><b>Fotografía</b></Typography>
-                                <Box component="img" sx={{ width: '100%', height: { xs: '300px', md: '400px' }, objectFit: 'contain', borderRadius: 1, border: '1px solid', borderColor: 'divider', backgroundColor: '#f5f5f5' }} src={incidencia.foto} alt={`Foto de la incidencia ${incidencia.id}`} />
+                                <Box component="img" sx={{ width: '100%', height: { xs: '300px', md: '400px' }, objectFit: 'contain', borderRadius: 1, border: '1px solid', borderColor: 'divider', backgroundColor: '#f5f5f5' }} src={incidencia.foto_detalle || incidencia.foto} alt={`Foto de la incidencia ${incidencia.id}`} />
                             </Box>
                         )}
                     </Box>
@@ -282,6 +309,11 @@ const DetalleIncidenciaPage = () => {
                 <Paper elevation={3} sx={{ p: 2, mt: 4 }}>
                     <Typography variant="h6" gutterBottom>Chat de la Incidencia</Typography>
                     <Box ref={chatLogRef} sx={{ height: '400px', overflowY: 'auto', border: '1px solid #ccc', borderRadius: '4px', p: 2, mb: 2, backgroundColor: '#f9f9f9' }}>
+                        {chatBefore && (
+                            <Box sx={{ display: 'flex', justifyContent: 'center' }}>
+                                <Button size="small" onClick={cargarMensajesAnteriores}>Cargar mensajes anteriores</Button>
+                            </Box>
+                        )}
                         <List>
                             {chatMessages.map((msg, index) => (
                                 <ListItem key={index} sx={{ justifyContent: msg.autor_username === currentUser.username ? 'flex-end' : 'flex-start' }}>
@@ -1,7 +1,7 @@
 // Archivo: frontend/src/pages/ListaIncidenciasPage.js
 
 import React, { useState, useEffect, useCallback } from 'react';
-import { Container, Typography, List, ListItem, ListItemButton, ListItemText, CircularProgress, Alert, Paper, Divider, Box, ButtonGroup, Button } from '@mui/material';
+import { Container, Typography, List, ListItem, ListItemButton, ListItemText, CircularProgress, Alert, Paper, Divider, Box, ButtonGroup, Button, TextField } from '@mui/material';
 import { Link as RouterLink } from 'react-router-dom';
 import axios from 'axios';
 import { jwtDecode } from 'jwt-decode';
@@ -12,6 +12,8 @@ const ListaIncidenciasPage = () => {
     const [error, setError] = useState('');
     const [currentUser, setCurrentUser] = useState(null);
     const [filtroEstado, setFiltroEstado] = useState(''); // Estado para el filtro
+    const [textoBusqueda, setTextoBusqueda] = useState(''); // Lo que se escribe en el buscador
+    const [busqueda, setBusqueda] = useState(''); // Búsqueda aplicada (?q=)
 
     useEffect(() => {
         const token = JSON.parse(localStorage.getItem('authToken'))?.access;
@@ -21,6 +23,9 @@ const ListaIncidenciasPage = () => {
         }
     }, []);
 
+    const [nextUrl, setNextUrl] = useState(null); // Cursor de la siguiente página
+    const [loadingMore, setLoadingMore] = useState(false);
+
     const fetchIncidencias = useCallback(async () => {
         setLoading(true);
         try {
@@ -31,19 +36,47 @@ const ListaIncidenciasPage = () => {
             if (filtroEstado) {
                 params.append('estado', filtroEstado);
             }
+            if (busqueda) {
+                // Resultados ordenados por relevancia, en una sola página
+                params.append('q', busqueda);
+            }
             
             const response = await axios.get(`/api/incidencias/`, {
                 headers: { 'Authorization': `Bearer ${tokenData.access}` },
                 params: params // Añadimos los parámetros a la petición
             });
-            setIncidencias(response.data);
+            // La API devuelve páginas por cursor: { next, previous, results }
+            setIncidencias(response.data.results);
+            setNextUrl(response.data.next);
         } catch (err) {
             setError('No se pudieron cargar las incidencias.');
             console.error(err);
         } finally {
             setLoading(false);
         }
-    }, [filtroEstado]); // El hook se re-ejecutará si el filtro cambia
+    }, [filtroEstado, busqueda]); // El hook se re-ejecutará si el filtro o la búsqueda cambian
+
+    // Carga la siguiente página usando el cursor devuelto por la API
+    const cargarMas = async () => {
+        if (!nextUrl) return;
+        setLoadingMore(true);
+        try {
+            const tokenData = JSON.parse(localStorage.getItem('authToken'));
+            // Solo reutilizamos los parámetros del enlace (cursor y filtros), no su host
+            const params = new URL(nextUrl).searchParams;
+            const response = await axios.get(`/api/incidencias/`, {
+                headers: { 'Authorization': `Bearer ${tokenData.access}` },
+                params: params
+            });
+            setIncidencias(prev => [...prev, ...response.data.results]);
+            setNextUrl(response.data.next);
+        } catch (err) {
+            setError('No se pudieron cargar más incidencias.');
+            console.error(err);
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     useEffect(() => {
         fetchIncidencias();
@@ -68,6 +101,23 @@ const ListaIncidenciasPage = () => {
                         <Button onClick={() => setFiltroEstado('EN_PROCESO')} variant={filtroEstado === 'EN_PROCESO' ? 'contained' : 'outlined'}>En Proceso</Button>
                         <Button onClick={() => setFiltroEstado('RESUELTO')} variant={filtroEstado === 'RESUELTO' ? 'contained' : 'outlined'}>Resueltos</Button>
                     </ButtonGroup>
+                    <Box
+                        component="form"
+                        onSubmit={(e) => { e.preventDefault(); setBusqueda(textoBusqueda.trim()); }}
+                        sx={{ display: 'flex', gap: 1, mt: 2 }}
+                    >
+                        <TextField
+                            size="small"
+                            fullWidth
+                            label="Buscar en descripciones, soluciones y chat"
+                            value={textoBusqueda}
+                            onChange={(e) => setTextoBusqueda(e.target.value)}
+                        />
+                        <Button type="submit" variant="contained">Buscar</Button>
+                        {busqueda && (
+                            <Button onClick={() => { setTextoBusqueda(''); setBusqueda(''); }}>Limpiar</Button>
+                        )}
+                    </Box>
                 </Paper>
             )}
 
@@ -103,6 +153,14 @@ const ListaIncidenciasPage = () => {
                     )}
                 </List>
             </Paper>
+
+            {nextUrl && (
+                <Box sx={{ display: 'flex', justifyContent: 'center', mt: 2 }}>
+                    <Button variant="outlined" onClick={cargarMas} disabled={loadingMore}>
+                        {loadingMore ? <CircularProgress size={24} /> : 'Cargar más'}
+                    </Button>
+                </Box>
+            )}
         </Container>
     );
 };
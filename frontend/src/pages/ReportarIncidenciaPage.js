@@ -39,6 +39,60 @@ function MapaInteractivo({ initialPosition, onLocationChange }) {
     return markerPosition ? <Marker position={markerPosition}></Marker> : null;
 }
 
+// Subida por partes: cada parte se envía con su offset y, si la conexión se
+// corta, se pregunta al servidor cuántos bytes confirmó y se continúa desde ahí.
+const TAMANO_PARTE = 256 * 1024;
+const MAX_REINTENTOS = 5;
+
+async function sha256Hex(archivo) {
+    const resumen = await crypto.subtle.digest('SHA-256', await archivo.arrayBuffer());
+    return Array.from(new Uint8Array(resumen)).map((b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function subirPorPartes(archivo, headers, onProgreso) {
+    // La subida pendiente de este mismo archivo se reanuda aunque se recargue la página
+    const clave = `subida:${archivo.name}:${archivo.size}:${archivo.lastModified}`;
+    let subida = null;
+    const pendiente = localStorage.getItem(clave);
+    if (pendiente) {
+        try {
+            subida = (await axios.get(`/api/subidas/${pendiente}/`, { headers })).data;
+        } catch (err) {
+            localStorage.removeItem(clave);
+        }
+    }
+    if (!subida) {
+        const sha256 = await sha256Hex(archivo);
+        subida = (await axios.post('/api/subidas/', { nombre: archivo.name, tamano: archivo.size, sha256 }, { headers })).data;
+        localStorage.setItem(clave, subida.id);
+    }
+
+    let offset = subida.recibidos;
+    let reintentos = 0;
+    while (!subida.completada && offset < archivo.size) {
+        try {
+            const response = await axios.patch(`/api/subidas/${subida.id}/`, archivo.slice(offset, offset + TAMANO_PARTE), {
+                headers: { ...headers, 'Content-Type': 'application/offset+octet-stream', 'Upload-Offset': String(offset) }
+            });
+            offset = response.data.recibidos;
+            reintentos = 0;
+            onProgreso(Math.round((offset / archivo.size) * 100));
+        } catch (err) {
+            if (reintentos++ >= MAX_REINTENTOS) throw err;
+            await new Promise((resolve) => setTimeout(resolve, 1000 * reintentos));
+            // El servidor indica el último offset confirmado
+            const estado = await axios.get(`/api/subidas/${subida.id}/`, { headers }).catch(() => null);
+            if (estado) offset = estado.data.recibidos;
+        }
+    }
+
+    if (!subida.completada) {
+        await axios.post(`/api/subidas/${subida.id}/completar/`, null, { headers });
+    }
+    localStorage.removeItem(clave);
+    return subida.id;
+}
+
 const ReportarIncidenciaPage = () => {
     const DEFAULT_CENTER = [14.6349, -90.5069]; // Ubicación por defecto
 
@@ -49,6 +103,7 @@ const ReportarIncidenciaPage = () => {
     const [error, setError] = useState('');
     const [success, setSuccess] = useState('');
     const [loading, setLoading] = useState(false);
+    const [progreso, setProgreso] = useState(null);
     const [mapPosition, setMapPosition] = useState(DEFAULT_CENTER);
 
     useEffect(() => {
@@ -113,16 +168,17 @@ const ReportarIncidenciaPage = () => {
             return;
         }
 
-        if (foto) {
-            formData.append('foto', foto);
-        }
-
         try {
             const tokenData = JSON.parse(localStorage.getItem('authToken'));
+            const authHeaders = { 'Authorization': `Bearer ${tokenData.access}` };
+            if (foto) {
+                setProgreso(0);
+                formData.append('subida', await subirPorPartes(foto, authHeaders, setProgreso));
+            }
             const response = await axios.post('/api/incidencias/', formData, {
                 headers: {
                     'Content-Type': 'multipart/form-data',
-                    'Authorization': `Bearer ${tokenData.access}`
+                    ...authHeaders
                 }
             });
             setSuccess(`Incidencia reportada con éxito (ID: ${response.data.id}).`);
@@ -136,6 +192,7 @@ const ReportarIncidenciaPage = () => {
             console.error('Detalles del error del servidor:', err.response?.data || err.message);
         } finally {
             setLoading(false);
+            setProgreso(null);
         }
     };
 
@@ -202,6 +259,7 @@ const ReportarIncidenciaPage = () => {
                         <input type="file" hidden onChange={handleFileChange} accept="image/*" />
                     </Button>
                     {foto && <Typography variant="body2" sx={{ mt: 1 }}>Archivo seleccionado: {foto.name}</Typography>}
+                    {progreso !== null && <Typography variant="body2" sx={{ mt: 1 }}>Subiendo foto: {progreso}%</Typography>}
 
                     {error && <Alert severity="error" sx={{ mt: 2 }}>{error}</Alert>}
                     {success && <Alert severity="success" sx={{ mt: 2 }}>{success}</Alert>}